@@ -5,6 +5,16 @@ Author: Edwin Bwambale
 from flask import Flask, jsonify, request
 from flask_cors import CORS
 from utils.db import init_db
+from utils.logger import init_logger
+from services.persistence import init_persistence
+from services.traffic_stats import init_traffic_stats
+from services.rule_stats import init_rule_stats
+from services.rule_optimizer import init_rule_optimizer
+from services.decision_cache import init_decision_cache
+from services.conntrack import init_conntrack
+from services.rate_limiter import init_rate_limiter
+from services.log_policy import init_log_policy
+from services.retention import init_retention
 from routes import register_routes
 import os
 
@@ -109,11 +119,62 @@ def create_app():
     # -----------------------------------------------------------------
     # ✅ Initialize Database & Routes
     # -----------------------------------------------------------------
+    try:
+        init_logger(app)
+    except Exception as e:
+        print(f"⚠️ File logger initialization warning: {e}")
+
     try:
         init_db(app)
         print("✅ Database initialized")
     except Exception as e:
         print(f"⚠️ Database initialization warning: {e}")
+
+    try:
+        init_persistence(app)
+        print("✅ Write-behind persistence started")
+    except Exception as e:
+        print(f"⚠️ Persistence initialization warning: {e}")
+
+    try:
+        init_traffic_stats(app)
+    except Exception as e:
+        print(f"⚠️ Traffic stats initialization warning: {e}")
+
+    try:
+        init_rule_stats(app)
+    except Exception as e:
+        print(f"⚠️ Rule stats initialization warning: {e}")
+
+    try:
+        init_rule_optimizer(app)
+    except Exception as e:
+        print(f"⚠️ Rule optimizer initialization warning: {e}")
+
+    try:
+        init_decision_cache(app)
+    except Exception as e:
+        print(f"⚠️ Decision cache initialization warning: {e}")
+
+    try:
+        init_conntrack(app)
+    except Exception as e:
+        print(f"⚠️ Connection tracking initialization warning: {e}")
+
+    try:
+        init_rate_limiter(app)
+    except Exception as e:
+        print(f"⚠️ Rate limiter initialization warning: {e}")
+
+    try:
+        init_log_policy(app)
+    except Exception as e:
+        print(f"⚠️ Log policy initialization warning: {e}")
+
+    try:
+        init_retention(app)
+    except Exception as e:
+        print(f"⚠️ Retention initialization warning: {e}")
     
     try:
         register_routes(app)
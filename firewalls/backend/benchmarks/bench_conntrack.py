@@ -0,0 +1,75 @@
+"""
+Benchmark: decide() throughput with and without connection tracking
+
+Traffic is a set of flows (distinct 5-tuples) whose packets are interleaved,
+so every flow after its first packet is ESTABLISHED. The decision cache is
+turned off to compare tracked flows against full rule evaluation.
+
+Run from the backend directory:
+    python -m benchmarks.bench_conntrack
+    python -m benchmarks.bench_conntrack --rules 10000 --flows 5000 --packets-per-flow 20
+    python -m benchmarks.bench_conntrack --max-flows 1000   # table smaller than the working set
+"""
+import argparse
+import random
+import time
+
+from benchmarks.bench_rule_index import generate_packets, generate_rules
+from services import firewall_engine
+from services.conntrack import conntrack
+from services.decision_cache import decision_cache
+from services.rule_set import RuleSet
+
+
+def generate_flows(flow_count, packets_per_flow, rules, rng):
+    flows = generate_packets(flow_count, rules, rng)
+    for flow in flows:
+        flow["src_port"] = rng.randint(1024, 65535)
+    packets = [flow for flow in flows for _ in range(packets_per_flow)]
+    rng.shuffle(packets)
+    return packets
+
+
+def throughput(rule_set, packets):
+    start = time.perf_counter()
+    results = [firewall_engine.decide(packet, rule_set) for packet in packets]
+    return len(packets) / (time.perf_counter() - start), results
+
+
+def run(rule_count, flow_count, packets_per_flow, max_flows, seed):
+    rng = random.Random(seed)
+    rules = generate_rules(rule_count, rng)
+    rule_set = RuleSet(rules, version=1)
+    packets = generate_flows(flow_count, packets_per_flow, rules, rng)
+    decision_cache.resize(0)
+
+    conntrack.enabled = False
+    untracked, expected = throughput(rule_set, packets)
+
+    conntrack.enabled = True
+    conntrack.max_flows = max_flows
+    conntrack.flush()
+    tracked, results = throughput(rule_set, packets)
+    assert [r.action for r in results] == [r.action for r in expected]
+
+    stats = conntrack.stats()
+    print(f"{'rules':>8} {'flows':>7} {'pkts':>8} {'untracked pps':>14} {'tracked pps':>12} {'speedup':>8}")
+    print(
+        f"{rule_count:>8} {flow_count:>7} {len(packets):>8} {untracked:>14.0f} "
+        f"{tracked:>12.0f} {tracked / untracked:>7.1f}x"
+    )
+    print(
+        f"conntrack: {stats['flows']} flows, {stats['created']} created, "
+        f"{stats['established_hits']} established hits, {stats['evicted']} evicted"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rules", type=int, default=1000)
+    parser.add_argument("--flows", type=int, default=2000)
+    parser.add_argument("--packets-per-flow", type=int, default=10)
+    parser.add_argument("--max-flows", type=int, default=65536)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    run(args.rules, args.flows, args.packets_per_flow, args.max_flows, args.seed)
@@ -0,0 +1,56 @@
+"""
+Benchmark: decide() with and without the decision cache on mock traffic
+
+Packets come from utils.mock_data, which repeats a small set of tuples just
+like the simulator does.
+
+Run from the backend directory:
+    python -m benchmarks.bench_decision_cache
+    python -m benchmarks.bench_decision_cache --rules 10000 --packets 50000 --cache-size 1000
+"""
+import argparse
+import random
+import time
+
+from benchmarks.bench_rule_index import generate_rules
+from services import firewall_engine
+from services.decision_cache import decision_cache
+from services.rule_set import RuleSet
+from utils.mock_data import generate_bulk_packets
+
+
+def time_decide(rule_set, packets):
+    start = time.perf_counter()
+    results = [firewall_engine.decide(packet, rule_set) for packet in packets]
+    return (time.perf_counter() - start) / len(packets), results
+
+
+def run(rule_count, packet_count, cache_size, seed):
+    random.seed(seed)
+    rule_set = RuleSet(generate_rules(rule_count, random.Random(seed)), version=1)
+    packets = generate_bulk_packets(packet_count)
+
+    decision_cache.resize(0)
+    uncached, expected = time_decide(rule_set, packets)
+
+    decision_cache.resize(cache_size)
+    decision_cache.clear()
+    cached, results = time_decide(rule_set, packets)
+    assert [r[:3] for r in results] == [r[:3] for r in expected]
+
+    stats = decision_cache.stats()
+    print(f"{'rules':>8} {'uncached µs/pkt':>16} {'cached µs/pkt':>14} {'speedup':>8} {'hit rate':>9}")
+    print(
+        f"{rule_count:>8} {uncached * 1e6:>16.2f} {cached * 1e6:>14.2f} "
+        f"{uncached / cached:>7.1f}x {stats['hit_rate']:>9.2%}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rules", type=int, default=1000)
+    parser.add_argument("--packets", type=int, default=20000)
+    parser.add_argument("--cache-size", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    run(args.rules, args.packets, args.cache_size, args.seed)
@@ -0,0 +1,107 @@
+"""
+Benchmark: linear first-match scan vs. bucketed RuleIndex lookup
+
+Run from the backend directory:
+    python -m benchmarks.bench_rule_index
+    python -m benchmarks.bench_rule_index --sizes 10 1000 --packets 2000
+"""
+import argparse
+import random
+import time
+
+from services.rule_set import CompiledRule, RuleSet
+
+PROTOCOLS = ["TCP", "UDP", "ICMP", "ANY"]
+COMMON_PORTS = [22, 53, 80, 443, 3306, 8080]
+
+
+def random_ip(rng):
+    return f"10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}"
+
+
+def random_ports(rng):
+    roll = rng.random()
+    if roll < 0.3:
+        return rng.choice(COMMON_PORTS)
+    if roll < 0.8:
+        return rng.randint(1, 65535)
+    if roll < 0.95:
+        lo = rng.randint(1, 65000)
+        return f"{lo}-{lo + rng.randint(1, 2000)}"
+    return None
+
+
+def generate_rules(count, rng):
+    rules = []
+    for rule_id in range(1, count + 1):
+        rules.append(CompiledRule(
+            rule_id,
+            random_ip(rng) if rng.random() < 0.9 else "any",
+            random_ip(rng) if rng.random() < 0.5 else "any",
+            random_ports(rng),
+            rng.choice(PROTOCOLS),
+            rng.choice(["ALLOW", "BLOCK"]),
+        ))
+    return rules
+
+
+def generate_packets(count, rules, rng):
+    packets = []
+    for _ in range(count):
+        if rules and rng.random() < 0.5:
+            # Aim at an existing rule so both paths do real matching work
+            rule = rng.choice(rules)
+            packets.append({
+                "src_ip": rule.src_ip or random_ip(rng),
+                "dest_ip": rule.dest_ip or random_ip(rng),
+                "port": rng.randint(*rng.choice(rule.ports)) if rule.ports else rng.choice(COMMON_PORTS),
+                "protocol": rule.protocol or rng.choice(PROTOCOLS[:3]),
+            })
+        else:
+            packets.append({
+                "src_ip": random_ip(rng),
+                "dest_ip": random_ip(rng),
+                "port": rng.choice(COMMON_PORTS),
+                "protocol": rng.choice(PROTOCOLS[:3]),
+            })
+    return packets
+
+
+def time_per_packet(match, packets):
+    start = time.perf_counter()
+    for packet in packets:
+        match(packet)
+    return (time.perf_counter() - start) / len(packets)
+
+
+def run(sizes, packet_count, seed):
+    rng = random.Random(seed)
+    print(f"{'rules':>8} {'linear µs/pkt':>14} {'indexed µs/pkt':>15} {'speedup':>8}")
+    for size in sizes:
+        rules = generate_rules(size, rng)
+        build_start = time.perf_counter()
+        rule_set = RuleSet(rules, version=1)
+        build_ms = (time.perf_counter() - build_start) * 1000
+        packets = generate_packets(packet_count, rules, rng)
+
+        # Both paths must agree before timing means anything
+        for packet in packets[:500]:
+            assert rule_set.match(packet) is rule_set.match_linear(packet), packet
+
+        # Keep the linear run bounded on very large rule sets
+        linear_packets = packets[: max(50, packet_count * 1000 // max(size, 1))]
+        linear = time_per_packet(rule_set.match_linear, linear_packets)
+        indexed = time_per_packet(rule_set.match, packets)
+        print(
+            f"{size:>8} {linear * 1e6:>14.2f} {indexed * 1e6:>15.2f} "
+            f"{linear / indexed:>7.1f}x  (index build {build_ms:.0f} ms)"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 10000, 100000])
+    parser.add_argument("--packets", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    run(args.sizes, args.packets, args.seed)
@@ -0,0 +1,113 @@
+"""
+Benchmark: concurrent SQLite reads/writes with and without the tuned profile
+
+Writers insert Packet/Log pairs (one small transaction each, like the old
+per-packet path); readers run the dashboard's recent-logs query.
+
+Run from the backend directory:
+    python -m benchmarks.bench_sqlite_profile
+    python -m benchmarks.bench_sqlite_profile --writers 2 --readers 8 --seconds 5
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import create_engine, event, insert, select
+from sqlalchemy.exc import OperationalError
+
+from config import Config
+from models import Log, Packet, db
+from utils.db import sqlite_pragma_listener
+
+
+def make_engine(path, tuned):
+    if tuned:
+        engine = create_engine(
+            f"sqlite:///{path}",
+            pool_size=Config.SQLITE_POOL_SIZE,
+            max_overflow=Config.SQLITE_MAX_OVERFLOW,
+            pool_timeout=Config.SQLITE_POOL_TIMEOUT,
+            connect_args={"check_same_thread": False},
+        )
+        event.listen(engine, "connect", sqlite_pragma_listener(Config.SQLITE_PRAGMAS))
+    else:
+        engine = create_engine(f"sqlite:///{path}")
+    db.metadata.create_all(engine, tables=[Packet.__table__, Log.__table__])
+    return engine
+
+
+def writer_loop(engine, stop, counters):
+    while not stop.is_set():
+        try:
+            with engine.begin() as conn:
+                packet_id = conn.execute(
+                    insert(Packet.__table__).values(
+                        src_ip="10.0.0.1", dest_ip="10.0.0.2", port=80,
+                        protocol="TCP", status="ALLOW", processed_at=datetime.utcnow(),
+                    )
+                ).inserted_primary_key[0]
+                conn.execute(
+                    insert(Log.__table__).values(
+                        packet_id=packet_id, decision="ALLOW",
+                        reason="No matching rule found", timestamp=datetime.utcnow(),
+                    )
+                )
+            counters["writes"] += 1
+        except OperationalError:
+            counters["write_errors"] += 1
+
+
+def reader_loop(engine, stop, counters):
+    query = select(Log.__table__).order_by(Log.__table__.c.timestamp.desc()).limit(50)
+    while not stop.is_set():
+        try:
+            with engine.connect() as conn:
+                conn.execute(query).fetchall()
+            counters["reads"] += 1
+        except OperationalError:
+            counters["read_errors"] += 1
+
+
+def run_profile(tuned, writers, readers, seconds):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(os.path.join(tmp, "bench.db"), tuned)
+        stop = threading.Event()
+        # One Counter per thread (no shared += across threads), summed at the end
+        loops = [writer_loop] * writers + [reader_loop] * readers
+        thread_counters = [Counter() for _ in loops]
+        threads = [
+            threading.Thread(target=loop, args=(engine, stop, counters))
+            for loop, counters in zip(loops, thread_counters)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        engine.dispose()
+    counters = Counter({"writes": 0, "reads": 0, "write_errors": 0, "read_errors": 0})
+    for thread_counter in thread_counters:
+        counters.update(thread_counter)
+    return {key: value / seconds if not key.endswith("errors") else value
+            for key, value in counters.items()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    print(f"{'profile':>8} {'writes/s':>10} {'reads/s':>10} {'write errs':>11} {'read errs':>10}")
+    for name, tuned in (("default", False), ("tuned", True)):
+        r = run_profile(tuned, args.writers, args.readers, args.seconds)
+        print(
+            f"{name:>8} {r['writes']:>10.0f} {r['reads']:>10.0f} "
+            f"{r['write_errors']:>11} {r['read_errors']:>10}"
+        )
@@ -0,0 +1,176 @@
+"""
+Benchmark: JSON vs the binary wire format for packet results
+
+Synthetic results shaped like process_packet's output (mock traffic, a few
+rules, a mix of decisions) are encoded the way each endpoint sends them:
+
+- PACKET_RESULT   one WebSocket frame per packet (raw subscribers)
+- PACKET_BATCH    one WebSocket frame per --batch results (batched subscribers)
+- simulate-batch  the /api/packets/simulate-batch response body
+
+reporting bytes per packet and encode time per packet. Every binary frame is
+decoded once and checked against the JSON message before timing.
+
+Run from the backend directory:
+    python -m benchmarks.bench_wire_format
+    python -m benchmarks.bench_wire_format --packets 50000 --batch 500
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from services.ws_batcher import window_counters
+from utils.mock_data import generate_mock_packet
+from utils.wire_format import decode, encode_batch, encode_batch_response, encode_result
+
+
+def make_results(count, rng):
+    """Results in the PACKET_RESULT shape the WebSocket endpoint publishes."""
+    start = datetime(2025, 10, 27, 6, 0, 0)
+    results = []
+    for i in range(count):
+        packet = generate_mock_packet()
+        rule_id = rng.choice([None, None, 1, 2, 3])
+        decision = "ALLOW" if rule_id is None else rng.choice(["ALLOW", "BLOCK"])
+        if rng.random() < 0.05:
+            rule_id, decision = None, "RATE_LIMITED"
+        reason = (
+            "No matching rule found" if rule_id is None and decision == "ALLOW"
+            else f"Rate limit exceeded for {packet['src_ip']}" if decision == "RATE_LIMITED"
+            else f"Matched rule #{rule_id} ({decision})"
+        )
+        timestamp = (start + timedelta(microseconds=i * 997)).isoformat()
+        results.append({
+            "type": "PACKET_RESULT",
+            "ticket": i + 1,
+            "rule_version": 7,
+            "packet": {
+                "id": i + 1,
+                "src_ip": packet["src_ip"],
+                "dest_ip": packet["dest_ip"],
+                "port": packet["port"],
+                "protocol": packet["protocol"],
+                "status": decision,
+                "flow_state": rng.choice(["NEW", "ESTABLISHED"]),
+                "timestamp": timestamp,
+            },
+            "log": {
+                "packet_id": i + 1,
+                "rule_id": rule_id,
+                "decision": decision,
+                "reason": reason,
+                "timestamp": timestamp,
+            },
+        })
+    return results
+
+
+def make_batches(results, size):
+    batches = []
+    for offset in range(0, len(results), size):
+        chunk = [{k: v for k, v in result.items() if k != "type"} for result in results[offset:offset + size]]
+        batches.append({
+            "type": "PACKET_BATCH",
+            "window": {
+                "start": chunk[0]["packet"]["timestamp"],
+                "end": chunk[-1]["packet"]["timestamp"],
+                "duration_ms": 100.0,
+            },
+            "count": len(chunk),
+            "counters": window_counters(chunk),
+            "results": chunk,
+        })
+    return batches
+
+
+def make_batch_responses(results, size):
+    """(JSON body, encode_batch_response args) pairs for simulate-batch."""
+    responses = []
+    for offset in range(0, len(results), size):
+        rows = [
+            {
+                "index": index,
+                "packet_id": result["packet"]["id"],
+                "decision": result["log"]["decision"],
+                "rule_id": result["log"]["rule_id"],
+                "reason": result["log"]["reason"],
+                "flow_state": result["packet"]["flow_state"],
+            }
+            for index, result in enumerate(results[offset:offset + size])
+        ]
+        body = {
+            "status": "success",
+            "message": f"Processed {len(rows)} of {len(rows)} packets",
+            "data": {
+                "rule_version": 7,
+                "received": len(rows),
+                "accepted": len(rows),
+                "rejected": 0,
+                "counts": {},
+                "elapsed_ms": 12.5,
+                "packets_per_second": 40000,
+                "results": rows,
+                "errors": [],
+            },
+        }
+        responses.append((body, (7, len(rows), rows, [], 0.0125)))
+    return responses
+
+
+def measure(encode, items, repeat):
+    """Best-of-repeat total encode time and total bytes."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        payloads = [encode(item) for item in items]
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, sum(len(payload if isinstance(payload, bytes) else payload.encode()) for payload in payloads)
+
+
+def report(name, packets, json_cost, binary_cost):
+    (json_time, json_bytes), (binary_time, binary_bytes) = json_cost, binary_cost
+    print(
+        f"{name:>15} {json_bytes / packets:>9.1f} {binary_bytes / packets:>9.1f} "
+        f"{json_bytes / binary_bytes:>6.1f}x {json_time / packets * 1e6:>9.2f} "
+        f"{binary_time / packets * 1e6:>9.2f} {json_time / binary_time:>6.1f}x"
+    )
+
+
+def run(packets, batch, repeat, seed):
+    rng = random.Random(seed)
+    random.seed(seed)
+    results = make_results(packets, rng)
+    batches = make_batches(results, batch)
+    responses = make_batch_responses(results, batch)
+
+    # The binary frames must decode to what the JSON path sends
+    assert decode(encode_result(results[0])) == results[0]
+    expected = {k: v for k, v in batches[0].items() if k != "counters"}
+    assert decode(encode_batch(batches[0]))["results"] == expected["results"]
+    assert decode(encode_batch_response(*responses[0][1]))["results"] == responses[0][0]["data"]["results"]
+
+    print(f"{packets} packets, batches of {batch}, best of {repeat}")
+    print(
+        f"{'':>15} {'json B/pkt':>9} {'bin B/pkt':>9} {'ratio':>7} "
+        f"{'json µs':>9} {'bin µs':>9} {'speed':>7}"
+    )
+    report("PACKET_RESULT", packets,
+           measure(json.dumps, results, repeat), measure(encode_result, results, repeat))
+    report("PACKET_BATCH", packets,
+           measure(json.dumps, batches, repeat), measure(encode_batch, batches, repeat))
+    report("simulate-batch", packets,
+           measure(lambda item: json.dumps(item[0]), responses, repeat),
+           measure(lambda item: encode_batch_response(*item[1]), responses, repeat))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--packets", type=int, default=20000)
+    parser.add_argument("--batch", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    run(args.packets, args.batch, args.repeat, args.seed)
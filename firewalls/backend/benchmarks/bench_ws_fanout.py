@@ -0,0 +1,163 @@
+"""
+Benchmark: WebSocket broadcast with hundreds of clients, one of them slow
+
+Clients are in-process stand-ins with the same send()/close() interface as a
+flask-sock socket; the slow one sleeps on every send. The original broadcast
+(send to each client in turn while holding the clients lock) is compared
+with services.ws_fanout, reporting how long the producer is stalled per
+broadcast, how long clients connecting mid-run wait to register, delivery
+lag on the healthy clients and what happened to the slow one.
+
+Run from the backend directory:
+    python -m benchmarks.bench_ws_fanout
+    python -m benchmarks.bench_ws_fanout --clients 500 --slow-delay 0.05 --policy disconnect
+"""
+import argparse
+import json
+import threading
+import time
+
+from services.ws_fanout import FanOut
+
+
+class FakeClient:
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.received = 0
+        self.lags = []
+        self.closed = False
+
+    def send(self, payload):
+        if self.closed:
+            raise ConnectionError("closed")
+        if self.delay:
+            time.sleep(self.delay)
+        self.received += 1
+        self.lags.append(time.monotonic() - json.loads(payload)["sent_at"])
+
+    def close(self):
+        self.closed = True
+
+
+class LegacyBroadcaster:
+    """The original websocket_service.broadcast_message, for comparison."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clients = set()
+
+    def register(self, ws):
+        with self.lock:
+            self.clients.add(ws)
+
+    def broadcast(self, message):
+        message_json = json.dumps(message)
+        disconnected = []
+        with self.lock:
+            for client in list(self.clients):
+                try:
+                    client.send(message_json)
+                except Exception:
+                    disconnected.append(client)
+            for dead in disconnected:
+                self.clients.discard(dead)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * pct / 100), len(values) - 1)]
+
+
+def drive(broadcaster, messages, interval):
+    """
+    Broadcast at a fixed rate while another thread keeps connecting new
+    clients. Returns per-broadcast producer stalls and per-join waits.
+    """
+    stalls = []
+    join_wait = []
+    done = threading.Event()
+
+    def joiner():
+        while not done.wait(interval * 5):
+            start = time.perf_counter()
+            broadcaster.register(FakeClient())
+            join_wait.append(time.perf_counter() - start)
+
+    thread = threading.Thread(target=joiner)
+    thread.start()
+    for i in range(messages):
+        start = time.perf_counter()
+        broadcaster.broadcast({"type": "PACKET_RESULT", "seq": i, "sent_at": time.monotonic()})
+        elapsed = time.perf_counter() - start
+        stalls.append(elapsed)
+        time.sleep(max(interval - elapsed, 0))
+    done.set()
+    thread.join()
+    return stalls, join_wait
+
+
+def report(name, stalls, join_wait, fast, slow, elapsed):
+    lags = [lag for client in fast for lag in client.lags]
+    print(
+        f"{name:>8} {elapsed:>8.2f}s {percentile(stalls, 50) * 1000:>9.2f} "
+        f"{max(stalls) * 1000:>9.2f} {max(join_wait, default=0) * 1000:>9.2f} "
+        f"{percentile(lags, 50) * 1000:>9.2f} {percentile(lags, 99) * 1000:>9.2f} "
+        f"{min(client.received for client in fast):>8} {slow.received:>6}"
+    )
+
+
+def run(client_count, messages, interval, slow_delay, queue_size, policy):
+    print(
+        f"{client_count} clients (1 slow, {slow_delay * 1000:.0f} ms/send), "
+        f"{messages} messages every {interval * 1000:.1f} ms"
+    )
+    print(
+        f"{'':>8} {'total':>9} {'p50 stall':>9} {'max stall':>9} {'max join':>9} "
+        f"{'p50 lag':>9} {'p99 lag':>9} {'fast min':>8} {'slow':>6}   (ms / messages)"
+    )
+
+    legacy = LegacyBroadcaster()
+    fast = [FakeClient() for _ in range(client_count - 1)]
+    slow = FakeClient(slow_delay)
+    for client in fast + [slow]:
+        legacy.register(client)
+    start = time.perf_counter()
+    stalls, join_wait = drive(legacy, messages, interval)
+    report("legacy", stalls, join_wait, fast, slow, time.perf_counter() - start)
+
+    fanout = FanOut(queue_size=queue_size, policy=policy)
+    fast = [FakeClient() for _ in range(client_count - 1)]
+    slow = FakeClient(slow_delay)
+    channels = [fanout.register(client) for client in fast + [slow]]
+    start = time.perf_counter()
+    stalls, join_wait = drive(fanout, messages, interval)
+    # Let the healthy clients drain before measuring
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline and min(c.received for c in fast) < messages:
+        time.sleep(0.01)
+    report("fanout", stalls, join_wait, fast, slow, time.perf_counter() - start)
+
+    stats = fanout.stats()
+    slow_channel = channels[-1]
+    print(
+        f"fanout: slow client {'disconnected' if slow_channel.closed else 'connected'}, "
+        f"{stats['dropped']} dropped (policy {policy}, queue {queue_size}), "
+        f"max lag {stats['max_lag_ms']:.1f} ms"
+    )
+    for channel in channels:
+        fanout.unregister(channel, reason="disconnected")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=300)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--interval", type=float, default=0.01)
+    parser.add_argument("--slow-delay", type=float, default=0.02)
+    parser.add_argument("--queue-size", type=int, default=64)
+    parser.add_argument("--policy", choices=("drop_oldest", "disconnect"), default="drop_oldest")
+    args = parser.parse_args()
+    run(args.clients, args.messages, args.interval, args.slow_delay, args.queue_size, args.policy)
@@ -37,4 +37,140 @@ class Config:
         os.environ.get("DATABASE_URL")
         or f"sqlite:///{BASE_DIR}/firewallx.db"
     )
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Packet batch API
+    BATCH_MAX_PACKETS = int(os.environ.get("BATCH_MAX_PACKETS", 10000))
+
+    # Write-behind persistence of Packet/Log rows ("async" or "sync")
+    PERSISTENCE_MODE = os.environ.get("PERSISTENCE_MODE", "async")
+    PERSISTENCE_QUEUE_SIZE = int(os.environ.get("PERSISTENCE_QUEUE_SIZE", 10000))
+    PERSISTENCE_BATCH_SIZE = int(os.environ.get("PERSISTENCE_BATCH_SIZE", 500))
+    PERSISTENCE_FLUSH_INTERVAL = float(os.environ.get("PERSISTENCE_FLUSH_INTERVAL", 0.5))
+    PERSISTENCE_PUT_TIMEOUT = float(os.environ.get("PERSISTENCE_PUT_TIMEOUT", 1.0))
+
+    # SQLite engine profile: "tuned" applies SQLITE_PRAGMAS to every connection
+    # and sizes the pool; "default" leaves SQLAlchemy/SQLite defaults alone
+    SQLITE_PROFILE = os.environ.get("SQLITE_PROFILE", "tuned")
+    SQLITE_PRAGMAS = {
+        # Only takes effect on a new database (lets retention use incremental_vacuum)
+        "auto_vacuum": os.environ.get("SQLITE_AUTO_VACUUM", "INCREMENTAL"),
+        "journal_mode": os.environ.get("SQLITE_JOURNAL_MODE", "WAL"),
+        "synchronous": os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL"),
+        "mmap_size": int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)),
+        "cache_size": int(os.environ.get("SQLITE_CACHE_SIZE", -64000)),  # negative = KiB
+        "busy_timeout": int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 5000)),
+        "temp_store": os.environ.get("SQLITE_TEMP_STORE", "MEMORY"),
+    }
+    SQLITE_POOL_SIZE = int(os.environ.get("SQLITE_POOL_SIZE", 10))
+    SQLITE_MAX_OVERFLOW = int(os.environ.get("SQLITE_MAX_OVERFLOW", 10))
+    SQLITE_POOL_TIMEOUT = int(os.environ.get("SQLITE_POOL_TIMEOUT", 10))
+
+    # Log listing: hard cap on ?limit= per page; rows fetched per export chunk
+    LOGS_PAGE_MAX = int(os.environ.get("LOGS_PAGE_MAX", 500))
+    LOGS_EXPORT_CHUNK_SIZE = int(os.environ.get("LOGS_EXPORT_CHUNK_SIZE", 1000))
+
+    # Traffic stats: max buckets returned by /api/stats/traffic
+    STATS_MAX_POINTS = int(os.environ.get("STATS_MAX_POINTS", 2000))
+
+    # Per-rule hit counters: seconds between flushes of in-memory counts
+    RULE_STATS_FLUSH_INTERVAL = float(os.environ.get("RULE_STATS_FLUSH_INTERVAL", 5.0))
+
+    # Rule matcher: "index" (bucketed index) or "optimized" (linear scan in
+    # hit-frequency order). Strict keeps every overlapping pair in id order,
+    # so even the reported rule id never changes.
+    RULE_MATCHER = os.environ.get("RULE_MATCHER", "index")
+    RULE_OPTIMIZER_STRICT = os.environ.get("RULE_OPTIMIZER_STRICT", "false").lower() == "true"
+    RULE_OPTIMIZER_INTERVAL = float(os.environ.get("RULE_OPTIMIZER_INTERVAL", 60.0))
+
+    # Decision cache: max cached (src_ip, dest_ip, port, protocol) tuples, 0 = off
+    DECISION_CACHE_SIZE = int(os.environ.get("DECISION_CACHE_SIZE", 10000))
+
+    # Connection tracking (opt-in): established flows skip rule evaluation.
+    # Packets without a src_port share one flow per (protocol, src_ip,
+    # dest_ip, port), the decision cache's key, so it mainly pays off for
+    # traffic that carries source ports. Turning CONNTRACK_LOG_ESTABLISHED
+    # off also skips persisting established packets.
+    CONNTRACK_ENABLED = os.environ.get("CONNTRACK_ENABLED", "false").lower() == "true"
+    CONNTRACK_MAX_FLOWS = int(os.environ.get("CONNTRACK_MAX_FLOWS", 65536))
+    CONNTRACK_LOG_ESTABLISHED = os.environ.get("CONNTRACK_LOG_ESTABLISHED", "true").lower() == "true"
+    CONNTRACK_TIMEOUTS = {
+        "TCP": float(os.environ.get("CONNTRACK_TCP_TIMEOUT", 300)),
+        "UDP": float(os.environ.get("CONNTRACK_UDP_TIMEOUT", 60)),
+        "ICMP": float(os.environ.get("CONNTRACK_ICMP_TIMEOUT", 30)),
+    }
+
+    # Per-source token-bucket rate limiting ahead of rule evaluation.
+    # RATE_LIMIT_SUBNET_PREFIX (e.g. 24) adds a shared bucket per subnet.
+    # Rates must be > 0 and bursts >= 1 (use RATE_LIMIT_ENABLED to turn it off).
+    RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "false").lower() == "true"
+    RATE_LIMIT_PPS = float(os.environ.get("RATE_LIMIT_PPS", 100))
+    RATE_LIMIT_BURST = float(os.environ.get("RATE_LIMIT_BURST", 200))
+    RATE_LIMIT_SUBNET_PREFIX = int(os.environ.get("RATE_LIMIT_SUBNET_PREFIX", 0))
+    RATE_LIMIT_SUBNET_PPS = float(os.environ.get("RATE_LIMIT_SUBNET_PPS", 1000))
+    RATE_LIMIT_SUBNET_BURST = float(os.environ.get("RATE_LIMIT_SUBNET_BURST", 2000))
+    RATE_LIMIT_MAX_BUCKETS = int(os.environ.get("RATE_LIMIT_MAX_BUCKETS", 100000))
+    RATE_LIMIT_SUMMARY_INTERVAL = float(os.environ.get("RATE_LIMIT_SUMMARY_INTERVAL", 5.0))
+
+    # Logging policy: "all" (one row per decision), "sample" (LOG_ALWAYS
+    # decisions always, others 1-in-LOG_SAMPLE_RATE) or "aggregate" (identical
+    # events within LOG_AGGREGATE_WINDOW seconds become one weighted row)
+    LOG_POLICY = os.environ.get("LOG_POLICY", "all")
+    LOG_SAMPLE_RATE = int(os.environ.get("LOG_SAMPLE_RATE", 10))
+    LOG_ALWAYS = [a.strip().upper() for a in os.environ.get("LOG_ALWAYS", "BLOCK").split(",") if a.strip()]
+    LOG_AGGREGATE_WINDOW = float(os.environ.get("LOG_AGGREGATE_WINDOW", 5.0))
+    LOG_AGGREGATE_MAX_KEYS = int(os.environ.get("LOG_AGGREGATE_MAX_KEYS", 10000))
+
+    # File logger (static/logs/firewallx.log): batched background writes,
+    # rotation by size and/or age (seconds, 0 = off), gzip of rotated files.
+    # LOG_FULL_POLICY is "drop" or "block" (wait up to LOG_BLOCK_TIMEOUT).
+    LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", 10000))
+    LOG_FLUSH_BYTES = int(os.environ.get("LOG_FLUSH_BYTES", 64 * 1024))
+    LOG_FLUSH_INTERVAL = float(os.environ.get("LOG_FLUSH_INTERVAL", 1.0))
+    LOG_MAX_BYTES = int(os.environ.get("LOG_MAX_BYTES", 10 * 1024 * 1024))
+    LOG_ROTATE_INTERVAL = int(os.environ.get("LOG_ROTATE_INTERVAL", 0))
+    LOG_BACKUP_COUNT = int(os.environ.get("LOG_BACKUP_COUNT", 5))
+    LOG_GZIP = os.environ.get("LOG_GZIP", "true").lower() == "true"
+    LOG_FULL_POLICY = os.environ.get("LOG_FULL_POLICY", "drop")
+    LOG_BLOCK_TIMEOUT = float(os.environ.get("LOG_BLOCK_TIMEOUT", 1.0))
+
+    # WebSocket fan-out: messages queued per client; when a client falls that
+    # far behind, "drop_oldest" discards its oldest message, "disconnect" drops it
+    WS_SEND_QUEUE_SIZE = int(os.environ.get("WS_SEND_QUEUE_SIZE", 256))
+    WS_SLOW_CLIENT_POLICY = os.environ.get("WS_SLOW_CLIENT_POLICY", "drop_oldest")
+
+    # Batched WebSocket delivery: results are coalesced into one PACKET_BATCH
+    # frame per WS_BATCH_WINDOW_MS, or sooner once WS_BATCH_MAX are waiting
+    WS_BATCH_WINDOW_MS = float(os.environ.get("WS_BATCH_WINDOW_MS", 100))
+    WS_BATCH_MAX = int(os.environ.get("WS_BATCH_MAX", 500))
+
+    # Packet simulator: seconds between packets for the /ws start_simulation
+    # loop and POST /api/packets/simulate-stream without a rate
+    SIMULATION_INTERVAL = float(os.environ.get("SIMULATION_INTERVAL", 2.0))
+
+    # Load generator (simulate-stream with a rate): caps on the target rate and
+    # worker processes, and how far (seconds) work may fall behind schedule
+    # before it is dropped instead of sent late
+    LOADGEN_MAX_RATE = int(os.environ.get("LOADGEN_MAX_RATE", 200000))
+    LOADGEN_MAX_WORKERS = int(os.environ.get("LOADGEN_MAX_WORKERS", os.cpu_count() or 1))
+    LOADGEN_MAX_LAG = float(os.environ.get("LOADGEN_MAX_LAG", 1.0))
+
+    # Data retention: packets/logs older than RETENTION_DAYS are deleted (after
+    # being folded into rollups, and archived to RETENTION_ARCHIVE_DIR as
+    # gzipped NDJSON if set) in small batches every RETENTION_INTERVAL seconds.
+    # Minute rollups are kept RETENTION_MINUTE_ROLLUP_DAYS, hour rollups
+    # RETENTION_HOUR_ROLLUP_DAYS (0 = forever). The schedule is opt-in since it
+    # deletes data; POST /api/admin/retention/run works either way.
+    RETENTION_ENABLED = os.environ.get("RETENTION_ENABLED", "false").lower() == "true"
+    RETENTION_DAYS = float(os.environ.get("RETENTION_DAYS", 30))
+    RETENTION_MINUTE_ROLLUP_DAYS = float(os.environ.get("RETENTION_MINUTE_ROLLUP_DAYS", 7))
+    RETENTION_HOUR_ROLLUP_DAYS = float(os.environ.get("RETENTION_HOUR_ROLLUP_DAYS", 0))
+    RETENTION_INTERVAL = float(os.environ.get("RETENTION_INTERVAL", 3600))
+    RETENTION_INITIAL_DELAY = float(os.environ.get("RETENTION_INITIAL_DELAY", 60))
+    RETENTION_BATCH_SIZE = int(os.environ.get("RETENTION_BATCH_SIZE", 1000))
+    RETENTION_BATCH_PAUSE = float(os.environ.get("RETENTION_BATCH_PAUSE", 0.05))
+    RETENTION_VACUUM_PAGES = int(os.environ.get("RETENTION_VACUUM_PAGES", 2000))
+    RETENTION_ARCHIVE_DIR = os.environ.get("RETENTION_ARCHIVE_DIR", "")
+
+    # Rule analysis: max conflicting pairs listed by /api/rules/analysis
+    RULE_ANALYSIS_MAX_CONFLICTS = int(os.environ.get("RULE_ANALYSIS_MAX_CONFLICTS", 1000))
@@ -7,6 +7,8 @@ from utils.db import db
 from .rule import Rule
 from .packet import Packet
 from .log import Log
+from .traffic_rollup import TrafficRollup
+from .rule_stat import RuleStat
 
-__all__ = ["db", "Rule", "Packet", "Log"]
+__all__ = ["db", "Rule", "Packet", "Log", "TrafficRollup", "RuleStat"]
 
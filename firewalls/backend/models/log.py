@@ -7,13 +7,20 @@ from utils.db import db
 
 class Log(db.Model):
     __tablename__ = "logs"
+    __table_args__ = (
+        db.Index("ix_logs_timestamp", "timestamp"),
+        db.Index("ix_logs_packet_id", "packet_id"),
+        db.Index("ix_logs_rule_id_timestamp", "rule_id", "timestamp"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     packet_id = db.Column(db.Integer, db.ForeignKey("packets.id"))
     rule_id = db.Column(db.Integer, db.ForeignKey("rules.id"), nullable=True)
-    decision = db.Column(db.String(10))  # ALLOW / BLOCK
+    decision = db.Column(db.String(16))  # ALLOW / BLOCK / RATE_LIMITED
     reason = db.Column(db.String(255))
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    rolled_up = db.Column(db.Boolean, nullable=True)  # counted in traffic_rollups
+    weight = db.Column(db.Integer, default=1)  # decisions this row stands for (sampling/aggregation)
 
     def to_dict(self):
         return {
@@ -22,6 +29,7 @@ class Log(db.Model):
             "rule_id": self.rule_id,
             "decision": self.decision,
             "reason": self.reason,
+            "weight": self.weight or 1,
             "timestamp": self.timestamp.isoformat(),
         }
 
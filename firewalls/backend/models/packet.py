@@ -7,6 +7,9 @@ from utils.db import db
 
 class Packet(db.Model):
     __tablename__ = "packets"
+    __table_args__ = (
+        db.Index("ix_packets_processed_at", "processed_at"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     src_ip = db.Column(db.String(64))
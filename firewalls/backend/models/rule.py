@@ -3,26 +3,69 @@ Firewall Rule model
 """
 from datetime import datetime
 from utils.db import db
+from utils.ip_utils import normalize_ip_spec, parse_ip_spec
+from utils.port_utils import format_port_ranges, parse_port_spec
 
 
 class Rule(db.Model):
     __tablename__ = "rules"
 
     id = db.Column(db.Integer, primary_key=True)
-    src_ip = db.Column(db.String(64), default="any")
+    src_ip = db.Column(db.String(64), default="any")  # any / IP / CIDR / range
     dest_ip = db.Column(db.String(64), default="any")
-    port = db.Column(db.Integer, nullable=True)
+    port = db.Column(db.Integer, nullable=True)  # single port (NULL = any or see ports)
+    ports = db.Column(db.String(255), nullable=True)  # ranges/sets, e.g. "80,443,1024-65535"
     protocol = db.Column(db.String(16), default="ANY")
     action = db.Column(db.String(10), default="ALLOW")  # ALLOW or BLOCK
     description = db.Column(db.String(255))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Integer bounds of src_ip / dest_ip (NULL = any), kept in sync by apply_ip_specs
+    src_ip_start = db.Column(db.BigInteger, nullable=True)
+    src_ip_end = db.Column(db.BigInteger, nullable=True)
+    dest_ip_start = db.Column(db.BigInteger, nullable=True)
+    dest_ip_end = db.Column(db.BigInteger, nullable=True)
+
+    def apply_ip_specs(self):
+        """
+        Normalize src_ip/dest_ip and store their integer ranges.
+        Raises ValueError if either spec is malformed.
+        """
+        src = parse_ip_spec(self.src_ip)
+        dest = parse_ip_spec(self.dest_ip)
+        self.src_ip = normalize_ip_spec(self.src_ip)
+        self.dest_ip = normalize_ip_spec(self.dest_ip)
+        self.src_ip_start, self.src_ip_end = src if src else (None, None)
+        self.dest_ip_start, self.dest_ip_end = dest if dest else (None, None)
+
+    def apply_port_spec(self, spec):
+        """
+        Store a port spec: a single port goes in `port`, ranges and sets in `ports`.
+        Raises ValueError if the spec is malformed.
+        """
+        ranges = parse_port_spec(spec)
+        if ranges is not None and len(ranges) == 1 and ranges[0][0] == ranges[0][1]:
+            self.port, self.ports = ranges[0][0], None
+        elif ranges is None:
+            self.port, self.ports = None, None
+        else:
+            self.port, self.ports = None, format_port_ranges(ranges)
+
+    def port_ranges(self):
+        """Effective port ranges as a tuple of (lo, hi), or None for any port."""
+        if self.ports:
+            return parse_port_spec(self.ports)
+        if self.port is not None:
+            return ((self.port, self.port),)
+        return None
+
     def to_dict(self):
         return {
             "id": self.id,
             "src_ip": self.src_ip,
             "dest_ip": self.dest_ip,
             "port": self.port,
+            "ports": self.ports or (str(self.port) if self.port is not None else "any"),
             "protocol": self.protocol,
             "action": self.action,
             "description": self.description,
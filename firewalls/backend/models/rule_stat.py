@@ -0,0 +1,19 @@
+"""
+Per-rule hit counters (flushed periodically from memory)
+"""
+from utils.db import db
+
+
+class RuleStat(db.Model):
+    __tablename__ = "rule_stats"
+
+    rule_id = db.Column(db.Integer, primary_key=True)  # rules.id (row removed with the rule)
+    hit_count = db.Column(db.BigInteger, nullable=False, default=0)
+    last_hit_at = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self):
+        return {
+            "rule_id": self.rule_id,
+            "hit_count": self.hit_count,
+            "last_hit_at": self.last_hit_at.isoformat() if self.last_hit_at else None,
+        }
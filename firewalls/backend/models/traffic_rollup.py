@@ -0,0 +1,35 @@
+"""
+Pre-aggregated traffic counters (per-minute / per-hour rollups)
+"""
+from utils.db import db
+
+
+class TrafficRollup(db.Model):
+    __tablename__ = "traffic_rollups"
+    __table_args__ = (
+        db.UniqueConstraint(
+            "bucket", "bucket_start", "decision", "protocol", "port", "rule_id",
+            name="uq_traffic_rollups_key",
+        ),
+        db.Index("ix_traffic_rollups_bucket_start", "bucket", "bucket_start"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    bucket = db.Column(db.String(8), nullable=False)  # minute / hour
+    bucket_start = db.Column(db.DateTime, nullable=False)
+    decision = db.Column(db.String(16), nullable=False)
+    protocol = db.Column(db.String(16), nullable=False)
+    port = db.Column(db.Integer, nullable=False)
+    rule_id = db.Column(db.Integer, nullable=False, default=0)  # 0 = no rule matched
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    def to_dict(self):
+        return {
+            "bucket": self.bucket,
+            "bucket_start": self.bucket_start.isoformat(),
+            "decision": self.decision,
+            "protocol": self.protocol,
+            "port": self.port,
+            "rule_id": self.rule_id or None,
+            "count": self.count,
+        }
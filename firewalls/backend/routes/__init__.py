@@ -5,6 +5,9 @@ Register blueprints
 from .packet_routes import packet_bp
 from .rule_routes import rule_bp
 from .log_routes import log_bp
+from .stats_routes import stats_bp
+from .flow_routes import flow_bp
+from .admin_routes import admin_bp
 from flask import jsonify
 
 def register_routes(app):
@@ -17,6 +20,9 @@ def register_routes(app):
     app.register_blueprint(packet_bp, url_prefix="/api/packets")
     app.register_blueprint(rule_bp, url_prefix="/api/rules")
     app.register_blueprint(log_bp, url_prefix="/api/logs")
+    app.register_blueprint(stats_bp, url_prefix="/api/stats")
+    app.register_blueprint(flow_bp, url_prefix="/api/flows")
+    app.register_blueprint(admin_bp, url_prefix="/api/admin")
 
     # ✅ Health check endpoint (no manual OPTIONS logic needed)
     @app.route("/api/health", methods=["GET"])
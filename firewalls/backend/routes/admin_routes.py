@@ -0,0 +1,29 @@
+"""
+Maintenance endpoints (data retention)
+"""
+from flask import Blueprint, request, jsonify
+from services.retention import retention
+from utils.response import success_response, error_response
+
+admin_bp = Blueprint("admin_bp", __name__)
+
+@admin_bp.before_request
+def handle_admin_options():
+    if request.method == 'OPTIONS':
+        response = jsonify({'status': 'OK'})
+        response.headers.add('Access-Control-Allow-Origin', 'http://localhost:5173')
+        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
+        response.headers.add('Access-Control-Allow-Methods', 'GET,POST,OPTIONS')
+        return response
+
+@admin_bp.route("/retention", methods=["GET"])
+def retention_status():
+    """Retention settings, progress of a running job and timings of recent runs"""
+    return success_response("Retention status", retention.status())
+
+@admin_bp.route("/retention/run", methods=["POST"])
+def run_retention():
+    """Start a retention pass now (in the background)"""
+    if not retention.run_async():
+        return error_response("A retention run is already in progress", 409)
+    return success_response("Retention run started", retention.status(), 202)
@@ -0,0 +1,42 @@
+"""
+Connection tracking endpoints
+"""
+from flask import Blueprint, request, jsonify
+from services.conntrack import conntrack
+from utils.response import success_response, error_response
+
+flow_bp = Blueprint("flow_bp", __name__)
+
+@flow_bp.before_request
+def handle_flow_options():
+    if request.method == 'OPTIONS':
+        response = jsonify({'status': 'OK'})
+        response.headers.add('Access-Control-Allow-Origin', 'http://localhost:5173')
+        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
+        response.headers.add('Access-Control-Allow-Methods', 'GET,DELETE,OPTIONS')
+        return response
+
+def _flow_filters(args):
+    return {
+        "protocol": args.get("protocol", "").upper() or None,
+        "src_ip": args.get("src_ip") or None,
+        "dest_ip": args.get("dest_ip") or None,
+        "decision": args.get("decision", "").upper() or None,
+    }
+
+@flow_bp.route("/", methods=["GET"])
+def get_flows():
+    """Tracked flows, most recently seen first (?limit=&protocol=&src_ip=&dest_ip=&decision=)"""
+    try:
+        limit = min(max(int(request.args.get("limit", 100)), 1), 1000)
+    except ValueError:
+        return error_response("'limit' must be an integer", 400)
+
+    flows = conntrack.flows(limit=limit, **_flow_filters(request.args))
+    return success_response("Flows retrieved", flows, meta=conntrack.stats())
+
+@flow_bp.route("/", methods=["DELETE"])
+def flush_flows():
+    """Drop tracked flows (all, or those matching the same filters as GET)"""
+    removed = conntrack.flush(**_flow_filters(request.args))
+    return success_response(f"Flushed {removed} flows", {"flushed": removed})
@@ -1,9 +1,19 @@
 """
 Packet log retrieval endpoints
 """
-from flask import Blueprint, request, jsonify
+import csv
+import io
+import json
+from datetime import datetime
+
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
+from sqlalchemy import func, select, tuple_
+
 from models.log import Log
-from utils.response import success_response
+from models.packet import Packet
+from utils.db import db
+from utils.response import success_response, error_response
+from utils.time_utils import parse_time
 
 log_bp = Blueprint("log_bp", __name__)
 
@@ -16,8 +26,138 @@ def handle_log_options():
         response.headers.add('Access-Control-Allow-Methods', 'GET,OPTIONS')
         return response
 
+def build_log_filters(args):
+    """SQL filters shared by log listing and export (?decision, ?rule_id, ?since, ?until)."""
+    filters = []
+    decision = args.get("decision")
+    if decision:
+        filters.append(Log.decision == decision.upper())
+    rule_id = args.get("rule_id")
+    if rule_id:
+        if rule_id.lower() == "none":
+            filters.append(Log.rule_id.is_(None))
+        elif rule_id.isdigit():
+            filters.append(Log.rule_id == int(rule_id))
+        else:
+            raise ValueError("Invalid 'rule_id', expected an integer or 'none'")
+    if args.get("since"):
+        filters.append(Log.timestamp >= parse_time(args["since"], "since"))
+    if args.get("until"):
+        filters.append(Log.timestamp < parse_time(args["until"], "until"))
+    return filters
+
+
+def parse_log_cursor(value):
+    """'<timestamp>,<id>' from meta.next_before -> (datetime, id)."""
+    timestamp, _, log_id = value.rpartition(",")
+    try:
+        return datetime.fromisoformat(timestamp), int(log_id)
+    except ValueError:
+        raise ValueError("Invalid 'before' cursor, expected '<timestamp>,<id>' from meta.next_before")
+
+
 @log_bp.route("/", methods=["GET"])
 def get_logs():
-    """Fetch recent packet processing logs"""
-    logs = [l.to_dict() for l in Log.query.order_by(Log.timestamp.desc()).limit(50)]
-    return success_response("Recent logs", logs)
+    """
+    Fetch packet processing logs, newest first, one keyset page at a time.
+    ?limit= (capped), ?before= (cursor from meta.next_before) and the
+    filters ?decision=, ?rule_id=, ?since=, ?until=.
+    """
+    max_limit = current_app.config.get("LOGS_PAGE_MAX", 500)
+    try:
+        limit = int(request.args.get("limit", 50))
+    except ValueError:
+        return error_response("limit must be an integer", 400)
+    limit = min(max(limit, 1), max_limit)
+    try:
+        filters = build_log_filters(request.args)
+        if request.args.get("before"):
+            # The cursor carries its own sort key, so it stays valid after
+            # retention deletes the row it came from
+            filters.append(tuple_(Log.timestamp, Log.id) < tuple_(*parse_log_cursor(request.args["before"])))
+    except ValueError as e:
+        return error_response(str(e), 400)
+
+    rows = Log.query.filter(*filters).order_by(Log.timestamp.desc(), Log.id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    logs = [l.to_dict() for l in rows[:limit]]
+    return success_response(
+        "Recent logs",
+        logs,
+        meta={
+            "limit": limit,
+            "has_more": has_more,
+            "next_before": f"{logs[-1]['timestamp']},{logs[-1]['id']}" if has_more else None,
+        },
+    )
+
+
+EXPORT_LOG_COLUMNS = [
+    Log.id, Log.packet_id, Log.rule_id, Log.decision, Log.reason, Log.timestamp,
+    func.coalesce(Log.weight, 1).label("weight"),
+]
+EXPORT_PACKET_COLUMNS = [
+    Packet.src_ip, Packet.dest_ip, Packet.port, Packet.protocol, Packet.processed_at,
+]
+
+
+def _export_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+@log_bp.route("/export", methods=["GET"])
+def export_logs():
+    """
+    Stream every matching log as NDJSON (default) or CSV without loading the
+    table into memory. ?format=ndjson|csv, ?include=packet joins packet
+    columns, and the ?decision/?rule_id/?since/?until filters of GET /api/logs
+    apply.
+    """
+    export_format = request.args.get("format", "ndjson").lower()
+    if export_format not in ("ndjson", "csv"):
+        return error_response("Unsupported format, use 'ndjson' or 'csv'", 400)
+    try:
+        filters = build_log_filters(request.args)
+    except ValueError as e:
+        return error_response(str(e), 400)
+
+    include_packet = "packet" in request.args.get("include", "").split(",")
+    columns = EXPORT_LOG_COLUMNS + (EXPORT_PACKET_COLUMNS if include_packet else [])
+    query = select(*columns).where(*filters).order_by(Log.id.asc())
+    if include_packet:
+        query = query.outerjoin(Packet, Packet.id == Log.packet_id)
+
+    chunk_size = current_app.config.get("LOGS_EXPORT_CHUNK_SIZE", 1000)
+    names = [c.key for c in EXPORT_LOG_COLUMNS] + [
+        f"packet_{c.key}" for c in (EXPORT_PACKET_COLUMNS if include_packet else [])
+    ]
+
+    def generate():
+        result = db.session.execute(query.execution_options(yield_per=chunk_size))
+        if export_format == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(names)
+            for rows in result.partitions():
+                for row in rows:
+                    writer.writerow([_export_value(v) for v in row])
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            if buffer.tell():
+                yield buffer.getvalue()
+        else:
+            for rows in result.partitions():
+                yield "".join(
+                    json.dumps(dict(zip(names, map(_export_value, row)))) + "\n"
+                    for row in rows
+                )
+        result.close()
+
+    mimetype = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    filename = f"firewallx-logs.{'csv' if export_format == 'csv' else 'ndjson'}"
+    return Response(
+        stream_with_context(generate()),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
@@ -1,11 +1,28 @@
 """
 Packet simulation endpoints
 """
-from flask import Blueprint, request, jsonify
-from services.packet_parser import parse_packet
-from services.firewall_engine import evaluate_packet
+import json
+import time
+from collections import Counter
+
+from flask import Blueprint, Response, current_app, request, jsonify
+from services.packet_parser import parse_packet, parse_packets
+from services.decision_cache import decision_cache
+from services.conntrack import conntrack
+from services.log_policy import log_policy
+from services.firewall_engine import (
+    decide_batch, persist_weight, process_packet, save_results_bulk,
+)
+from services.persistence import PersistenceBackpressure, PersistenceError, writer
+from services.rate_limiter import RATE_LIMITED, rate_limiter
+from services.rule_stats import rule_hits
+from services.rule_set import get_rule_set
 from services.simulator import PacketSimulator
+from services.ws_batcher import result_batcher
+from services.ws_fanout import fanout
+from utils.logger import file_logger
 from utils.response import success_response, error_response
+from utils.wire_format import BINARY_MIMETYPE, ENCODINGS, encode_batch_response
 
 packet_bp = Blueprint("packet_bp", __name__)
 
@@ -33,18 +50,161 @@ def simulate_packet():
     if isinstance(parsed, tuple):
         return parsed
 
-    decision, reason = evaluate_packet(parsed)
+    try:
+        record = process_packet(parsed)
+    except PersistenceBackpressure as e:
+        return error_response("Packet pipeline is saturated, retry later", 503, e)
+    except PersistenceError as e:
+        return error_response("Failed to persist packet", 500, e)
+
+    log = record["log"]
+    if log["decision"] == RATE_LIMITED:
+        message = "Packet dropped by rate limiting"
+    else:
+        message = f"Packet {log['decision'].lower()}ed successfully"
     return success_response(
-        f"Packet {decision.lower()}ed successfully",
-        {"decision": decision, "reason": reason, "packet": parsed},
+        message,
+        {
+            "decision": log["decision"],
+            "reason": log["reason"],
+            "rule_id": log["rule_id"],
+            "rule_version": record["rule_version"],
+            "packet_id": record["packet"]["id"],
+            "log_id": log["id"],
+            "ticket": record["ticket"],
+            "flow_state": record["packet"]["flow_state"],
+            "packet": parsed,
+        },
     )
 
+def _read_batch_body():
+    """Packets from a JSON array, {"packets": [...]} or an NDJSON body."""
+    if request.mimetype in ("application/x-ndjson", "application/ndjson"):
+        items = []
+        for line_no, line in enumerate(request.get_data(as_text=True).splitlines(), 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                items.append(json.loads(line))
+            except json.JSONDecodeError:
+                raise ValueError(f"Invalid JSON on line {line_no}")
+        return items
+
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get("packets")
+    if not isinstance(data, list):
+        raise ValueError("Expected a JSON array of packets or an NDJSON body")
+    return data
+
+
+def _response_encoding():
+    """?format=json|binary wins; otherwise the Accept header picks (JSON by default)."""
+    requested = request.args.get("format")
+    if requested is not None:
+        if requested not in ENCODINGS:
+            raise ValueError(f"Unknown format '{requested}', use one of {', '.join(ENCODINGS)}")
+        return requested
+    best = request.accept_mimetypes.best_match(["application/json", BINARY_MIMETYPE])
+    return "binary" if best == BINARY_MIMETYPE else "json"
+
+
+@packet_bp.route("/simulate-batch", methods=["POST"])
+def simulate_batch():
+    """Evaluate many packets against one rule snapshot and persist them in one transaction"""
+    started = time.perf_counter()
+    try:
+        encoding = _response_encoding()
+        items = _read_batch_body()
+    except ValueError as e:
+        return error_response(str(e), 400)
+
+    max_packets = current_app.config.get("BATCH_MAX_PACKETS", 10000)
+    if len(items) > max_packets:
+        return error_response(f"Batch too large ({len(items)} > {max_packets} packets)", 413)
+
+    accepted, errors = parse_packets(items)
+    packets = [packet for _, packet in accepted]
+
+    rule_set = get_rule_set()
+    decisions = decide_batch(packets, rule_set)
+    weights = [persist_weight(packet, result) for packet, result in zip(packets, decisions)]
+    try:
+        saved_ids = iter(save_results_bulk(
+            [dict(packet, weight=weight) for packet, weight in zip(packets, weights) if weight],
+            [result for result, weight in zip(decisions, weights) if weight],
+        ))
+    except Exception as e:
+        return error_response("Failed to persist batch", 500, e)
+    packet_ids = [next(saved_ids) if weight else None for weight in weights]
+
+    elapsed = time.perf_counter() - started
+    results = [
+        {
+            "index": index,
+            "packet_id": packet_id,
+            "decision": result.action,
+            "rule_id": result.rule_id,
+            "reason": result.reason,
+            "flow_state": result.state,
+        }
+        for (index, _), packet_id, result in zip(accepted, packet_ids, decisions)
+    ]
+    if encoding == "binary":
+        return Response(
+            encode_batch_response(rule_set.version, len(items), results, errors, elapsed),
+            mimetype=BINARY_MIMETYPE,
+        )
+    return success_response(
+        f"Processed {len(results)} of {len(items)} packets",
+        {
+            "rule_version": rule_set.version,
+            "received": len(items),
+            "accepted": len(results),
+            "rejected": len(errors),
+            "counts": dict(Counter(result.action for result in decisions)),
+            "elapsed_ms": round(elapsed * 1000, 2),
+            "packets_per_second": round(len(items) / elapsed) if elapsed > 0 else None,
+            "results": results,
+            "errors": errors,
+        },
+    )
+
+
+@packet_bp.route("/pipeline-stats", methods=["GET"])
+def pipeline_stats():
+    """Runtime counters of the packet processing pipeline"""
+    return success_response("Pipeline stats retrieved", {
+        "persistence": writer.stats(),
+        "rule_stats": rule_hits.stats(),
+        "decision_cache": decision_cache.stats(),
+        "conntrack": conntrack.stats(),
+        "rate_limiter": rate_limiter.stats(),
+        "log_policy": log_policy.stats(),
+        "file_logger": file_logger.stats(),
+        "websocket": fanout.stats(),
+        "websocket_batches": result_batcher.stats(),
+    })
+
+
 @packet_bp.route("/simulate-stream", methods=["POST"])
 def start_simulation():
-    """Start mock packet simulation stream"""
+    """
+    Start mock packet simulation stream. An optional JSON body turns it into
+    a load generator: {"rate", "duration", "workers", "sink", "traffic"}
+    """
+    options = request.get_json(silent=True) or {}
+    if not isinstance(options, dict):
+        return error_response("Expected a JSON object of load generator options", 400)
+    unknown = set(options) - {"rate", "duration", "workers", "sink", "traffic"}
+    if unknown:
+        return error_response(f"Unknown option(s): {', '.join(sorted(unknown))}", 400)
     try:
-        message = simulator.start()
+        message = simulator.start(**options)
         return success_response(message)
+    except (ValueError, TypeError) as e:
+        return error_response(str(e), 400)
     except Exception as e:
         return error_response(f"Failed to start simulation: {str(e)}", 500)
 
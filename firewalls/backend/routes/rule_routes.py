@@ -1,9 +1,16 @@
 """
 Firewall rule management endpoints
 """
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from models.rule import Rule
+from models.rule_stat import RuleStat
+from services.packet_parser import validate_ip_spec
+from services.rule_analysis import analyze_rules, prune_rules
+from services.rule_optimizer import optimizer
+from services.rule_set import get_rule_set, reload_rules
+from services.rule_stats import rule_hits, rule_stats_map
 from utils.db import db
+from utils.port_utils import parse_port_spec
 from utils.response import success_response, error_response
 
 rule_bp = Blueprint("rule_bp", __name__)
@@ -20,25 +27,91 @@ def handle_rule_options():
 @rule_bp.route("/", methods=["GET"])
 def get_rules():
     rules = [r.to_dict() for r in Rule.query.all()]
+    if "stats" in request.args.get("include", "").split(","):
+        stats = rule_stats_map()
+        for rule in rules:
+            stat = stats.get(rule["id"], {"hit_count": 0, "last_hit_at": None})
+            rule["stats"] = {
+                "hit_count": stat["hit_count"],
+                "last_hit_at": stat["last_hit_at"].isoformat() if stat["last_hit_at"] else None,
+            }
     return success_response("Rules retrieved", rules)
 
+@rule_bp.route("/analysis", methods=["GET"])
+def get_rule_analysis():
+    """
+    Shadowed / redundant / conflicting rules of the active rule set
+    (?mode=prune also returns the minimal equivalent rule list)
+    """
+    mode = request.args.get("mode", "report")
+    if mode not in ("report", "prune"):
+        return error_response("Invalid 'mode', use 'report' or 'prune'", 400)
+
+    rule_set = get_rule_set()
+    data = analyze_rules(rule_set, current_app.config.get("RULE_ANALYSIS_MAX_CONFLICTS", 1000))
+    if mode == "prune":
+        kept, removed = prune_rules(rule_set)
+        kept_ids = [rule.id for rule in kept]
+        rows = {r.id: r for r in Rule.query.filter(Rule.id.in_(kept_ids))} if kept_ids else {}
+        data["prune"] = {
+            "removed": [
+                {"rule_id": rule_id, "reason": reason, "by": by}
+                for rule_id, reason, by in removed
+            ],
+            "rules": [rows[rule_id].to_dict() for rule_id in kept_ids if rule_id in rows],
+        }
+    return success_response("Rule analysis complete", data)
+
+@rule_bp.route("/optimization", methods=["GET"])
+def get_rule_optimization():
+    """
+    Frequency-optimized scan order and expected comparisons per packet
+    (?refresh=1 recomputes from the latest hit counts, ?strict=1 keeps rule ids stable)
+    """
+    strict = request.args.get("strict")
+    if strict is not None:
+        plan = optimizer.preview(strict=strict.lower() in ("1", "true", "yes"))
+    elif request.args.get("refresh") or optimizer.current_plan(get_rule_set()) is None:
+        plan = optimizer.refresh()
+    else:
+        plan = optimizer.plan
+    data = plan.to_dict()
+    data["matcher"] = "optimized" if optimizer.enabled else "index"
+    return success_response("Rule ordering computed", data)
+
 @rule_bp.route("/", methods=["POST"])
 def create_rule():
     data = request.get_json()
     if not data:
         return error_response("Missing JSON body", 400)
 
+    for field in ("src_ip", "dest_ip"):
+        if not validate_ip_spec(data.get(field, "any")):
+            return error_response(
+                f"Invalid {field}: use 'any', an IP, CIDR (10.0.0.0/8) or range (a-b)", 400
+            )
+
+    port_spec = data.get("ports", data.get("port"))
+    try:
+        parse_port_spec(port_spec)
+    except (ValueError, TypeError):
+        return error_response(
+            "Invalid port: use a port, a range (1024-65535) or a list (80,443,8000-8100)", 400
+        )
+
     try:
         rule = Rule(
             src_ip=data.get("src_ip", "any"),
             dest_ip=data.get("dest_ip", "any"),
-            port=data.get("port"),
             protocol=data.get("protocol", "ANY").upper(),
             action=data.get("action", "ALLOW").upper(),
             description=data.get("description", ""),
         )
+        rule.apply_ip_specs()
+        rule.apply_port_spec(port_spec)
         db.session.add(rule)
         db.session.commit()
+        reload_rules()
         return success_response("Rule created successfully", rule.to_dict(), 201)
     except Exception as e:
         db.session.rollback()
@@ -51,5 +124,8 @@ def delete_rule(id):
         return error_response("Rule not found", 404)
 
     db.session.delete(rule)
+    RuleStat.query.filter_by(rule_id=id).delete()
     db.session.commit()
+    reload_rules()
+    rule_hits.forget(id)
     return success_response(f"Rule #{id} deleted")
@@ -0,0 +1,68 @@
+"""
+Traffic statistics endpoints (served from pre-aggregated rollups)
+"""
+from datetime import datetime, timedelta
+
+from flask import Blueprint, current_app, request, jsonify
+from services.traffic_stats import BUCKETS, GROUP_COLUMNS, traffic_series
+from utils.response import success_response, error_response
+from utils.time_utils import parse_time
+
+stats_bp = Blueprint("stats_bp", __name__)
+
+DEFAULT_WINDOWS = {
+    "minute": timedelta(hours=1),
+    "hour": timedelta(days=1),
+}
+
+@stats_bp.before_request
+def handle_stats_options():
+    if request.method == 'OPTIONS':
+        response = jsonify({'status': 'OK'})
+        response.headers.add('Access-Control-Allow-Origin', 'http://localhost:5173')
+        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
+        response.headers.add('Access-Control-Allow-Methods', 'GET,OPTIONS')
+        return response
+
+@stats_bp.route("/traffic", methods=["GET"])
+def get_traffic():
+    """
+    Time-bucketed traffic counts: ?from=&to= (ISO 8601), ?bucket=minute|hour,
+    ?group_by=decision|protocol|port|rule
+    """
+    bucket = request.args.get("bucket", "minute")
+    if bucket not in BUCKETS:
+        return error_response("Invalid 'bucket', use 'minute' or 'hour'", 400)
+    group_by = request.args.get("group_by", "decision")
+    if group_by not in GROUP_COLUMNS:
+        return error_response(f"Invalid 'group_by', use one of {', '.join(GROUP_COLUMNS)}", 400)
+
+    try:
+        end = parse_time(request.args["to"], "to") if request.args.get("to") else datetime.utcnow()
+        start = (
+            parse_time(request.args["from"], "from")
+            if request.args.get("from") else end - DEFAULT_WINDOWS[bucket]
+        )
+    except ValueError as e:
+        return error_response(str(e), 400)
+    if start >= end:
+        return error_response("'from' must be before 'to'", 400)
+
+    max_points = current_app.config.get("STATS_MAX_POINTS", 2000)
+    if (end - start) / BUCKETS[bucket] > max_points:
+        return error_response(
+            f"Range too large for '{bucket}' buckets (max {max_points} points)", 400
+        )
+
+    series = traffic_series(start, end, bucket, group_by)
+    return success_response(
+        "Traffic statistics",
+        {
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "bucket": bucket,
+            "group_by": group_by,
+            "series": series,
+            "total": sum(point["total"] for point in series),
+        },
+    )
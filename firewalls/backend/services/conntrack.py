@@ -0,0 +1,245 @@
+"""
+Connection tracking: fast path for established flows
+
+Flows are keyed on the 5-tuple (protocol, src_ip, src_port, dest_ip,
+dest_port); packets without a src_port collapse onto one flow per 4-tuple.
+The first packet of a flow is evaluated against the rules (state NEW) and its
+decision is pinned to the flow; later packets seen before the flow times out
+are ESTABLISHED and reuse that decision without touching the rule set. A flow
+decided under an older rule set version is re-evaluated on its next packet.
+
+Expiry runs on a hashed timer wheel advanced by normal traffic (no extra
+thread): each flow sits in the slot of its expiry tick and is only moved
+again when the wheel reaches that slot, so a hit never has to reschedule it.
+The table is capped at max_flows; when full, the least recently seen flow is
+evicted.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+# Idle timeouts per protocol (seconds); "ANY" covers everything else
+DEFAULT_TIMEOUTS = {"TCP": 300.0, "UDP": 60.0, "ICMP": 30.0, "ANY": 60.0}
+
+
+class Flow:
+    __slots__ = (
+        "key", "action", "rule_id", "reason", "version",
+        "packets", "first_seen", "last_seen", "expires", "slot_tick",
+    )
+
+    def __init__(self, key, decision, now, expires):
+        self.key = key
+        self.action = decision.action
+        self.rule_id = decision.rule_id
+        self.reason = decision.reason
+        self.version = decision.version
+        self.packets = 1
+        self.first_seen = now
+        self.last_seen = now
+        self.expires = expires
+        self.slot_tick = None
+
+    def to_dict(self, now, wall_now):
+        protocol, src_ip, src_port, dest_ip, dest_port = self.key
+        return {
+            "protocol": protocol,
+            "src_ip": src_ip,
+            "src_port": src_port,
+            "dest_ip": dest_ip,
+            "dest_port": dest_port,
+            "state": "ESTABLISHED" if self.packets > 1 else "NEW",
+            "decision": self.action,
+            "rule_id": self.rule_id,
+            "rule_version": self.version,
+            "packets": self.packets,
+            "first_seen": time.strftime(
+                "%Y-%m-%dT%H:%M:%S", time.gmtime(wall_now - (now - self.first_seen))
+            ),
+            "last_seen": time.strftime(
+                "%Y-%m-%dT%H:%M:%S", time.gmtime(wall_now - (now - self.last_seen))
+            ),
+            "expires_in": round(max(self.expires - now, 0.0), 1),
+        }
+
+
+def flow_key(packet_data):
+    return (
+        packet_data["protocol"],
+        packet_data["src_ip"],
+        packet_data.get("src_port"),
+        packet_data["dest_ip"],
+        packet_data["port"],
+    )
+
+
+class ConnTrack:
+
+    def __init__(self, max_flows=65536, timeouts=None, tick=1.0, slots=4096,
+                 enabled=False, log_established=True):
+        self.max_flows = max_flows
+        self.timeouts = dict(timeouts or DEFAULT_TIMEOUTS)
+        self.tick = tick
+        self.enabled = enabled
+        self.log_established = log_established
+        self._slots = [set() for _ in range(slots)]
+        self._flows = OrderedDict()  # key -> Flow, least recently seen first
+        self._cursor = int(time.monotonic() / tick)
+        self._lock = threading.Lock()
+        self._stats = {
+            "created": 0,
+            "established_hits": 0,
+            "expired": 0,
+            "evicted": 0,
+            "revalidated": 0,
+            "flushed": 0,
+        }
+
+    def init_app(self, app):
+        config = app.config
+        self.enabled = config.get("CONNTRACK_ENABLED", self.enabled)
+        self.max_flows = config.get("CONNTRACK_MAX_FLOWS", self.max_flows)
+        self.log_established = config.get("CONNTRACK_LOG_ESTABLISHED", self.log_established)
+        self.timeouts.update(config.get("CONNTRACK_TIMEOUTS", {}))
+
+    # ---------------------------------------------------------
+    # Packet path
+    # ---------------------------------------------------------
+    def lookup(self, key, version):
+        """The live flow for key decided under version, counted as a hit; else None."""
+        now = time.monotonic()
+        with self._lock:
+            self._advance(now)
+            flow = self._flows.get(key)
+            if flow is None:
+                return None
+            if flow.expires <= now:
+                self._remove(flow)
+                self._stats["expired"] += 1
+                return None
+            if flow.version != version:
+                if version > flow.version:
+                    self._remove(flow)
+                    self._stats["revalidated"] += 1
+                return None
+            flow.packets += 1
+            flow.last_seen = now
+            flow.expires = now + self.timeouts.get(key[0], self.timeouts["ANY"])
+            self._flows.move_to_end(key)
+            self._stats["established_hits"] += 1
+            return flow
+
+    def record(self, key, decision):
+        """Start tracking a flow with the decision reached for its first packet."""
+        now = time.monotonic()
+        with self._lock:
+            existing = self._flows.get(key)
+            if existing is not None:
+                if existing.version >= decision.version:
+                    return existing  # another thread got there first
+                self._remove(existing)
+            while len(self._flows) >= self.max_flows:
+                _, oldest = self._flows.popitem(last=False)
+                self._slots[oldest.slot_tick % len(self._slots)].discard(oldest.key)
+                self._stats["evicted"] += 1
+            flow = Flow(key, decision, now, now + self.timeouts.get(key[0], self.timeouts["ANY"]))
+            self._flows[key] = flow
+            self._schedule(flow, self._cursor)
+            self._stats["created"] += 1
+            return flow
+
+    # ---------------------------------------------------------
+    # Timer wheel
+    # ---------------------------------------------------------
+    def _schedule(self, flow, cursor):
+        """Put flow in the slot of its expiry tick (never one already processed)."""
+        flow.slot_tick = max(int(flow.expires / self.tick), cursor + 1)
+        self._slots[flow.slot_tick % len(self._slots)].add(flow.key)
+
+    def _remove(self, flow):
+        del self._flows[flow.key]
+        self._slots[flow.slot_tick % len(self._slots)].discard(flow.key)
+
+    def _advance(self, now):
+        """Process every slot whose tick has passed (at most one lap per call)."""
+        target = int(now / self.tick)
+        if target <= self._cursor:
+            return
+        last = min(target, self._cursor + len(self._slots))
+        for tick in range(self._cursor + 1, last + 1):
+            slot = self._slots[tick % len(self._slots)]
+            if not slot:
+                continue
+            due = [key for key in slot if self._flows[key].slot_tick <= target]
+            for key in due:
+                slot.discard(key)
+                flow = self._flows[key]
+                if flow.expires <= now:
+                    del self._flows[key]
+                    self._stats["expired"] += 1
+                else:
+                    self._schedule(flow, target)
+        self._cursor = target
+
+    # ---------------------------------------------------------
+    # Management API
+    # ---------------------------------------------------------
+    def flows(self, limit=100, protocol=None, src_ip=None, dest_ip=None, decision=None):
+        """Most recently seen flows first, as dicts."""
+        now = time.monotonic()
+        wall_now = time.time()
+        with self._lock:
+            self._advance(now)
+            result = []
+            for flow in reversed(self._flows.values()):
+                if not self._selected(flow, protocol, src_ip, dest_ip, decision):
+                    continue
+                result.append(flow.to_dict(now, wall_now))
+                if len(result) >= limit:
+                    break
+        return result
+
+    def flush(self, protocol=None, src_ip=None, dest_ip=None, decision=None):
+        """Drop matching flows (all by default); returns how many were removed."""
+        with self._lock:
+            doomed = [
+                flow for flow in self._flows.values()
+                if self._selected(flow, protocol, src_ip, dest_ip, decision)
+            ]
+            for flow in doomed:
+                self._remove(flow)
+            self._stats["flushed"] += len(doomed)
+        return len(doomed)
+
+    @staticmethod
+    def _selected(flow, protocol, src_ip, dest_ip, decision):
+        key = flow.key
+        return (
+            (protocol is None or key[0] == protocol)
+            and (src_ip is None or key[1] == src_ip)
+            and (dest_ip is None or key[3] == dest_ip)
+            and (decision is None or flow.action == decision)
+        )
+
+    def stats(self):
+        with self._lock:
+            self._advance(time.monotonic())
+            stats = dict(self._stats)
+            stats.update({
+                "enabled": self.enabled,
+                "flows": len(self._flows),
+                "max_flows": self.max_flows,
+                "log_established": self.log_established,
+                "timeouts": dict(self.timeouts),
+            })
+        return stats
+
+
+# Process-wide flow table used by the firewall engine
+conntrack = ConnTrack()
+
+
+def init_conntrack(app):
+    """Configure the flow table from CONNTRACK_* settings."""
+    conntrack.init_app(app)
+    return conntrack
@@ -0,0 +1,104 @@
+"""
+Bounded LRU cache of firewall decisions
+
+Traffic repeats the same (src_ip, dest_ip, port, protocol) tuples heavily, so
+decide() remembers the (action, rule_id, reason) it reached for each tuple.
+Entries belong to one rule set version: the first lookup against a newer
+version clears the whole cache, so a create/delete can never serve a stale
+decision.
+"""
+import threading
+from collections import OrderedDict
+
+
+class DecisionCache:
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self.version = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    def init_app(self, app):
+        self.resize(app.config.get("DECISION_CACHE_SIZE", self.max_size))
+
+    def resize(self, max_size):
+        with self._lock:
+            self.max_size = max_size
+            while len(self._entries) > max(max_size, 0):
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    @staticmethod
+    def key(packet_data):
+        return (
+            packet_data["src_ip"],
+            packet_data["dest_ip"],
+            packet_data["port"],
+            packet_data["protocol"],
+        )
+
+    def get(self, key, version):
+        """Cached (action, rule_id, reason) for key under version, or None."""
+        with self._lock:
+            if version != self.version:
+                if self.version is None or version > self.version:
+                    self._invalidate(version)
+                self._stats["misses"] += 1
+                return None
+            value = self._entries.get(key)
+            if value is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return value
+
+    def put(self, key, version, value):
+        with self._lock:
+            if version != self.version:
+                if self.version is not None and version < self.version:
+                    return  # decided against an older snapshot; don't cache it
+                self._invalidate(version)
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _invalidate(self, version):
+        if self._entries:
+            self._entries.clear()
+            self._stats["invalidations"] += 1
+        self.version = version
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                "size": len(self._entries),
+                "capacity": self.max_size,
+                "version": self.version,
+            })
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else None
+        return stats
+
+
+# Process-wide cache used by the firewall engine
+decision_cache = DecisionCache()
+
+
+def init_decision_cache(app):
+    """Size the cache from DECISION_CACHE_SIZE (0 disables it)."""
+    decision_cache.init_app(app)
+    return decision_cache
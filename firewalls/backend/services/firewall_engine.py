@@ -1,11 +1,147 @@
 """
 Firewall engine core logic
 """
-from models.rule import Rule
+from datetime import datetime
+
+from sqlalchemy import insert
+
 from models.packet import Packet
 from models.log import Log
+from services.conntrack import conntrack, flow_key
+from services.decision_cache import decision_cache
+from services.log_policy import log_policy
+from services.persistence import Receipt, row_ids, writer
+from services.rate_limiter import RATE_LIMITED, rate_limiter
+from services.rule_stats import rule_hits
+from services.rule_optimizer import optimizer
+from services.rule_set import Decision, get_rule_set
+from services.traffic_stats import apply_rollups, rollup_counts
 from utils.db import db
-from utils.logger import log_event
+from utils.logger import log_events
+
+
+def decide(packet_data, rule_set=None):
+    """
+    Match a parsed packet against a rule set snapshot (no DB access).
+    Sources over their rate limit are dropped first; packets of established
+    flows reuse their flow's decision; everything else goes through the
+    decision cache and then the rules.
+    Returns a Decision(action, rule_id, reason, version, state).
+    """
+    if rule_set is None:
+        rule_set = get_rule_set()
+
+    if rate_limiter.enabled:
+        limited = rate_limiter.check(packet_data)
+        if limited is not None:
+            return Decision(
+                RATE_LIMITED, None, f"Rate limit exceeded for {limited}", rule_set.version
+            )
+
+    if conntrack.enabled:
+        key = flow_key(packet_data)
+        flow = conntrack.lookup(key, rule_set.version)
+        if flow is not None:
+            if flow.rule_id is not None:
+                rule_hits.hit(flow.rule_id)
+            return Decision(flow.action, flow.rule_id, flow.reason, flow.version, "ESTABLISHED")
+        result = _evaluate(packet_data, rule_set)
+        conntrack.record(key, result)
+        return result._replace(state="NEW")
+    return _evaluate(packet_data, rule_set)
+
+
+def _evaluate(packet_data, rule_set):
+    """Rule evaluation behind the decision cache."""
+    if decision_cache.enabled:
+        key = decision_cache.key(packet_data)
+        cached = decision_cache.get(key, rule_set.version)
+        if cached is not None:
+            action, rule_id, reason = cached
+            if rule_id is not None:
+                rule_hits.hit(rule_id)
+            return Decision(action, rule_id, reason, rule_set.version)
+        result = _match(packet_data, rule_set)
+        decision_cache.put(key, rule_set.version, result[:3])
+        return result
+    return _match(packet_data, rule_set)
+
+
+def _match(packet_data, rule_set):
+    """Evaluate the rules themselves (cache miss)."""
+    if optimizer.enabled:
+        rule = optimizer.match(rule_set, packet_data)
+    else:
+        rule = rule_set.match(packet_data)
+    if rule is not None:
+        rule_hits.hit(rule.id)
+        return Decision(rule.action, rule.id, rule.reason, rule_set.version)
+
+    # Default ALLOW if no rule matches
+    return Decision("ALLOW", None, "No matching rule found", rule_set.version)
+
+
+def decide_batch(packets, rule_set=None):
+    """Decide a list of parsed packets against one rule set snapshot."""
+    if rule_set is None:
+        rule_set = get_rule_set()
+    return [decide(packet, rule_set) for packet in packets]
+
+
+def persist_weight(packet_data, result):
+    """
+    How many decisions a row persisted for this packet now stands for; 0
+    means no row of its own. Rate-limited packets are recorded in aggregate
+    by the rate limiter, established-flow packets only when
+    CONNTRACK_LOG_ESTABLISHED is on, and the rest per the logging policy.
+    """
+    if result.action == RATE_LIMITED:
+        return 0
+    if result.state == "ESTABLISHED" and not conntrack.log_established:
+        return 0
+    return log_policy.admit(packet_data, result)
+
+
+def process_packet(packet_data, rule_set=None):
+    """
+    The one decision pipeline shared by REST and WebSocket: decide, hand the
+    decision to the write-behind writer exactly once, and return the records
+    clients display. Packet/log ids are allocated up front, so they are set
+    even while the write is still queued; "ticket" identifies the queued write.
+    A decision that is not persisted gets no ids: ticket and ids are None.
+    """
+    result = decide(packet_data, rule_set)
+    processed_at = datetime.utcnow()
+    weight = persist_weight(packet_data, result)
+    if weight:
+        receipt = writer.submit(
+            dict(packet_data, processed_at=processed_at, weight=weight), result
+        )
+    else:
+        receipt = Receipt(None, None, None)
+    timestamp = processed_at.isoformat()
+    return {
+        "ticket": receipt.ticket,
+        "rule_version": result.version,
+        "packet": {
+            "id": receipt.packet_id,
+            "src_ip": packet_data["src_ip"],
+            "dest_ip": packet_data["dest_ip"],
+            "port": packet_data["port"],
+            "protocol": packet_data["protocol"],
+            "status": result.action,
+            "flow_state": result.state,
+            "timestamp": timestamp,
+        },
+        "log": {
+            "id": receipt.log_id,
+            "packet_id": receipt.packet_id,
+            "rule_id": result.rule_id,
+            "decision": result.action,
+            "reason": result.reason,
+            "timestamp": timestamp,
+        },
+    }
 
 
 def evaluate_packet(packet_data):
@@ -13,46 +149,85 @@ def evaluate_packet(packet_data):
     Process an incoming packet through firewall rules
     Returns (decision, reason)
     """
-    rules = Rule.query.order_by(Rule.id.asc()).all()
+    record = process_packet(packet_data)
+    return record["log"]["decision"], record["log"]["reason"]
 
-    for rule in rules:
-        match_src = rule.src_ip in ["any", packet_data["src_ip"]]
-        match_dest = rule.dest_ip in ["any", packet_data["dest_ip"]]
-        match_port = rule.port in [None, packet_data["port"]]
-        match_proto = rule.protocol in ["ANY", packet_data["protocol"]]
 
-        if all([match_src, match_dest, match_port, match_proto]):
-            decision = rule.action
-            reason = f"Matched rule #{rule.id} ({rule.action})"
-            save_result(packet_data, rule, decision, reason)
-            return decision, reason
+def save_result(packet_data, rule_id, decision, reason):
+    """Queue a decision for write-behind persistence; returns its Receipt."""
+    return writer.submit(packet_data, Decision(decision, rule_id, reason, None))
 
-    # Default ALLOW if no rule matches
-    decision = "ALLOW"
-    reason = "No matching rule found"
-    save_result(packet_data, None, decision, reason)
-    return decision, reason
-
-
-def save_result(packet_data, rule, decision, reason):
-    """Store results in DB and logs."""
-    pkt = Packet(
-        src_ip=packet_data["src_ip"],
-        dest_ip=packet_data["dest_ip"],
-        port=packet_data["port"],
-        protocol=packet_data["protocol"],
-        status=decision,
-    )
-    db.session.add(pkt)
-    db.session.commit()
-
-    log_entry = Log(
-        packet_id=pkt.id,
-        rule_id=rule.id if rule else None,
-        decision=decision,
-        reason=reason,
-    )
-    db.session.add(log_entry)
-    db.session.commit()
-
-    log_event(f"Packet {pkt.id}: {decision} ({reason})")
+
+def _row_ids(packets, key, model):
+    """Ids the writer already allocated (packet[key]); allocate any missing ones."""
+    ids = [packet.get(key) for packet in packets]
+    missing = ids.count(None)
+    if missing:
+        fresh = iter(row_ids.allocate(model, missing))
+        ids = [next(fresh) if row_id is None else row_id for row_id in ids]
+    return ids
+
+
+def save_results_bulk(packets, decisions):
+    """
+    Persist many decisions in a single transaction using bulk INSERTs, and
+    bump the traffic rollups in that same transaction.
+    Returns the new packet ids, in the same order as the input.
+    """
+    if not packets:
+        return []
+
+    now = datetime.utcnow()
+    packet_ids = _row_ids(packets, "id", Packet)
+    log_ids = _row_ids(packets, "log_id", Log)
+    try:
+        db.session.execute(
+            insert(Packet),
+            [
+                {
+                    "id": packet_id,
+                    "src_ip": packet["src_ip"],
+                    "dest_ip": packet["dest_ip"],
+                    "port": packet["port"],
+                    "protocol": packet["protocol"],
+                    "status": result.action,
+                    "processed_at": packet.get("processed_at", now),
+                }
+                for packet, packet_id, result in zip(packets, packet_ids, decisions)
+            ],
+        )
+
+        db.session.execute(
+            insert(Log),
+            [
+                {
+                    "id": log_id,
+                    "packet_id": packet_id,
+                    "rule_id": result.rule_id,
+                    "decision": result.action,
+                    "reason": result.reason,
+                    "timestamp": packet.get("processed_at", now),
+                    "rolled_up": True,
+                    "weight": packet.get("weight", 1),
+                }
+                for packet, packet_id, log_id, result in zip(packets, packet_ids, log_ids, decisions)
+            ],
+        )
+        apply_rollups(rollup_counts(
+            (
+                packet.get("processed_at", now), result.action, packet["protocol"],
+                packet["port"], result.rule_id, packet.get("weight", 1),
+            )
+            for packet, result in zip(packets, decisions)
+        ))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    log_events([
+        f"Packet {packet_id}: {result.action} ({result.reason})"
+        + (f" [weight {packet['weight']}]" if packet.get("weight", 1) > 1 else "")
+        for packet, packet_id, result in zip(packets, packet_ids, decisions)
+    ])
+    return packet_ids
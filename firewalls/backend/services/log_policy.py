@@ -0,0 +1,189 @@
+"""
+Logging policy: which decisions get their own Packet/Log row
+
+- all:       every decision is persisted (the original behaviour)
+- sample:    decisions listed in LOG_ALWAYS (BLOCK by default) are always
+             persisted; every other decision is persisted 1-in-N, and the
+             row carries weight=N
+- aggregate: LOG_ALWAYS decisions are persisted as usual; identical
+             (src_ip, dest_ip, port, protocol, decision, rule) events within
+             a window collapse into one row whose weight is the count
+
+Sampling is systematic (every N-th decision per action), so weighted totals
+are exact up to one partial stride. Traffic rollups add up the weights and
+every Log row exposes its weight, so dashboards stay accurate whichever mode
+is active.
+"""
+import atexit
+import threading
+from datetime import datetime
+
+from services.persistence import PersistenceError, writer
+
+MODES = ("all", "sample", "aggregate")
+
+
+class LogPolicy:
+
+    def __init__(self, mode="all", sample_rate=10, always=("BLOCK",), window=5.0,
+                 max_keys=10000):
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self.always = set(always)
+        self.window = window
+        self.max_keys = max_keys
+
+        self.thread = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._seen = {}        # action -> decisions seen (sample mode)
+        self._aggregates = {}  # event key -> [count, packet, decision, last_seen]
+        self._stats = {"persisted": 0, "sampled_out": 0, "aggregated": 0, "aggregate_rows": 0}
+
+    def init_app(self, app):
+        config = app.config
+        mode = config.get("LOG_POLICY", self.mode)
+        if mode not in MODES:
+            raise ValueError(f"Unknown LOG_POLICY '{mode}', use one of {', '.join(MODES)}")
+        self.mode = mode
+        self.sample_rate = max(int(config.get("LOG_SAMPLE_RATE", self.sample_rate)), 1)
+        self.always = set(config.get("LOG_ALWAYS", self.always))
+        self.window = config.get("LOG_AGGREGATE_WINDOW", self.window)
+        self.max_keys = config.get("LOG_AGGREGATE_MAX_KEYS", self.max_keys)
+        if self.mode == "aggregate" and not (self.thread and self.thread.is_alive()):
+            self._stop.clear()
+            self.thread = threading.Thread(target=self._run, name="log-aggregator", daemon=True)
+            self.thread.start()
+            # Registered after the writer's own atexit hook, so it runs first
+            atexit.register(self.stop)
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=self.window + 5)
+        self.thread = None
+        self.flush()
+
+    def admit(self, packet_data, result):
+        """
+        Weight of the row to persist for this decision now: 1 for a normal
+        row, N for a sampled one, 0 when it is skipped or held for aggregation.
+        """
+        if self.mode == "all" or result.action in self.always:
+            self._bump("persisted")
+            return 1
+
+        if self.mode == "sample":
+            with self._lock:
+                seen = self._seen.get(result.action, 0)
+                self._seen[result.action] = seen + 1
+                if seen % self.sample_rate:
+                    self._stats["sampled_out"] += 1
+                    return 0
+                self._stats["persisted"] += 1
+            return self.sample_rate
+
+        key = (
+            packet_data["src_ip"], packet_data["dest_ip"], packet_data["port"],
+            packet_data["protocol"], result.action, result.rule_id,
+        )
+        with self._lock:
+            entry = self._aggregates.get(key)
+            if entry is None:
+                self._aggregates[key] = [1, packet_data, result, datetime.utcnow()]
+            else:
+                entry[0] += 1
+                entry[3] = datetime.utcnow()
+            self._stats["aggregated"] += 1
+            full = len(self._aggregates) >= self.max_keys
+        if full:
+            # The decision is already made; the flush (and any backpressure it
+            # meets) belongs to the aggregator thread, not this request
+            if self.thread and self.thread.is_alive():
+                self._wake.set()
+            else:
+                self._flush_logged()
+        return 0
+
+    def flush(self):
+        """
+        Hand every open aggregate to the writer as one weighted row. When the
+        writer pushes back, the aggregates not yet handed over go back into
+        the map (merged with anything that arrived meanwhile) and the error
+        propagates.
+        """
+        with self._lock:
+            aggregates, self._aggregates = self._aggregates, {}
+        pending = list(aggregates.items())
+        submitted = 0
+        try:
+            for key, (count, packet_data, result, last_seen) in pending:
+                reason = result.reason if count == 1 else f"{result.reason} (x{count})"
+                try:
+                    writer.submit(
+                        dict(packet_data, processed_at=last_seen, weight=count),
+                        result._replace(reason=reason[:255]),
+                    )
+                except PersistenceError:
+                    # Reached the writer and was dropped there (counted in its stats)
+                    submitted += 1
+                    raise
+                submitted += 1
+        finally:
+            if submitted < len(pending):
+                self._restore(pending[submitted:])
+            if submitted:
+                self._bump("aggregate_rows", submitted)
+        return submitted
+
+    def _restore(self, entries):
+        with self._lock:
+            for key, (count, packet_data, result, last_seen) in entries:
+                entry = self._aggregates.get(key)
+                if entry is None:
+                    self._aggregates[key] = [count, packet_data, result, last_seen]
+                else:
+                    entry[0] += count
+                    entry[3] = max(entry[3], last_seen)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.window)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            self._flush_logged()
+
+    def _flush_logged(self):
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"⚠️ Log aggregation flush failed: {e}")
+
+    def _bump(self, key, amount=1):
+        with self._lock:
+            self._stats[key] += amount
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                "mode": self.mode,
+                "sample_rate": self.sample_rate,
+                "always": sorted(self.always),
+                "window": self.window,
+                "open_aggregates": len(self._aggregates),
+            })
+        return stats
+
+
+# Process-wide policy consulted by the firewall engine
+log_policy = LogPolicy()
+
+
+def init_log_policy(app):
+    """Configure the policy from LOG_POLICY / LOG_SAMPLE_RATE / LOG_AGGREGATE_*."""
+    log_policy.init_app(app)
+    return log_policy
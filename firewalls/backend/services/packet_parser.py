@@ -1,37 +1,60 @@
 """
 Service to parse and validate packet data
 """
-import re
+from utils.ip_utils import is_valid_ip, parse_ip_spec
 from utils.response import error_response
 
 
 def validate_ip(ip: str):
-    """Basic IPv4 validation."""
-    pattern = re.compile(r"^(any|(\d{1,3}\.){3}\d{1,3})$")
-    return bool(pattern.match(ip))
+    """IPv4 validation for packet addresses ("any" kept for older clients)."""
+    return ip == "any" or is_valid_ip(ip)
 
 
-def parse_packet(data: dict):
-    """Validate incoming packet JSON payload."""
+def validate_ip_spec(spec: str):
+    """Rule address validation: any, single IP, CIDR block or a-b range."""
+    try:
+        parse_ip_spec(spec)
+        return True
+    except (ValueError, TypeError):
+        return False
+
+
+def validate_packet(data):
+    """
+    Validate and normalize one packet payload without touching Flask.
+    Returns (packet, None) on success or (None, error_message).
+    """
+    if not isinstance(data, dict):
+        return None, "Packet must be a JSON object"
+
     required = ["src_ip", "dest_ip", "port", "protocol"]
 
     for key in required:
         if key not in data:
-            return error_response(f"Missing required field '{key}'", 400)
+            return None, f"Missing required field '{key}'"
 
     if not validate_ip(data["src_ip"]) or not validate_ip(data["dest_ip"]):
-        return error_response("Invalid IP address format", 400)
+        return None, "Invalid IP address format"
 
     try:
         port = int(data["port"])
         if port < 0 or port > 65535:
-            return error_response("Invalid port range (0–65535)", 400)
-    except ValueError:
-        return error_response("Port must be an integer", 400)
+            return None, "Invalid port range (0–65535)"
+    except (TypeError, ValueError):
+        return None, "Port must be an integer"
+
+    src_port = data.get("src_port")
+    if src_port is not None:
+        try:
+            src_port = int(src_port)
+            if src_port < 0 or src_port > 65535:
+                return None, "Invalid source port range (0–65535)"
+        except (TypeError, ValueError):
+            return None, "Source port must be an integer"
 
-    protocol = data["protocol"].upper()
+    protocol = str(data["protocol"]).upper()
     if protocol not in ["TCP", "UDP", "ICMP", "ANY"]:
-        return error_response("Unsupported protocol", 400)
+        return None, "Unsupported protocol"
 
     # Normalize packet structure
     packet = {
@@ -40,4 +63,30 @@ def parse_packet(data: dict):
         "port": port,
         "protocol": protocol,
     }
+    if src_port is not None:
+        packet["src_port"] = src_port  # optional; identifies the flow for conntrack
+    return packet, None
+
+
+def parse_packet(data: dict):
+    """Validate incoming packet JSON payload."""
+    packet, error = validate_packet(data)
+    if error:
+        return error_response(error, 400)
     return packet
+
+
+def parse_packets(items):
+    """
+    Validate a batch of packet payloads.
+    Returns (packets, errors) where packets is a list of (index, packet) and
+    errors a list of {"index": i, "message": ...} for rejected entries.
+    """
+    packets, errors = [], []
+    for index, data in enumerate(items):
+        packet, error = validate_packet(data)
+        if error:
+            errors.append({"index": index, "message": error})
+        else:
+            packets.append((index, packet))
+    return packets, errors
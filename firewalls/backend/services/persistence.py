@@ -0,0 +1,316 @@
+"""
+Write-behind persistence for Packet/Log rows
+
+Decisions are queued in memory and a background worker writes them in
+batches (bulk INSERTs, one transaction per batch) when the batch is full or
+the flush interval elapses. A full queue applies backpressure to producers;
+PERSISTENCE_MODE="sync" writes every decision immediately (handy for tests
+and scripts), and the queue is drained on shutdown. A batch that fails is retried, then
+split in halves down to single rows so only rows that cannot be written are
+dropped (a locked or lost database drops the batch at once); they are
+counted under "dropped" in the pipeline stats, and a synchronous write that
+drops its decision raises PersistenceError.
+"""
+import atexit
+import itertools
+import queue
+import threading
+import time
+from collections import namedtuple
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import DBAPIError, DisconnectionError, OperationalError
+
+from models.log import Log
+from models.packet import Packet
+from utils.db import db
+
+
+# ticket: monotonically increasing id for a submitted decision (None when not persisted)
+# packet_id / log_id: primary keys of the rows, allocated before they are written
+Receipt = namedtuple("Receipt", ["ticket", "packet_id", "log_id"])
+
+
+class PersistenceBackpressure(Exception):
+    """Raised when the write queue stays full for longer than the put timeout."""
+
+
+class PersistenceError(Exception):
+    """Raised when a synchronous write failed and the decision was not stored."""
+
+
+_STOP = object()
+
+# Failures of the database itself rather than of the rows being written
+_SYSTEMIC_ERRORS = ("locked", "disk i/o", "unable to open", "database or disk is full")
+
+
+def _is_systemic(error):
+    if isinstance(error, DisconnectionError):
+        return True
+    if isinstance(error, DBAPIError) and error.connection_invalidated:
+        return True
+    return isinstance(error, OperationalError) and any(
+        text in str(error).lower() for text in _SYSTEMIC_ERRORS
+    )
+
+
+class RowIds:
+    """
+    Hands out Packet/Log primary keys ahead of the INSERT, so a decision still
+    waiting in the write queue already carries the ids clients key on. Each
+    counter starts after the table's largest id (read once per app); every
+    INSERT into packets/logs in this process draws its ids from here.
+    """
+
+    def __init__(self):
+        self.app = None
+        self._lock = threading.Lock()
+        self._next = {}
+
+    def init_app(self, app):
+        with self._lock:
+            self.app = app
+            self._next = {}
+
+    def allocate(self, model, count=1):
+        """Reserve `count` consecutive ids for `model`; returns a range."""
+        with self._lock:
+            start = self._next.get(model)
+            if start is None:
+                start = self._max_id(model) + 1
+            self._next[model] = start + count
+        return range(start, start + count)
+
+    def _max_id(self, model):
+        query = select(func.max(model.id))
+        if self.app is None:
+            return db.session.scalar(query) or 0
+        with self.app.app_context():
+            return db.session.scalar(query) or 0
+
+
+class WriteBehindWriter:
+
+    def __init__(self, max_queue=10000, batch_size=500, flush_interval=0.5,
+                 put_timeout=1.0, sync=False):
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.sync = sync
+
+        self.app = None
+        self.thread = None
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._tickets = itertools.count(1)
+        self._flush_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "queued": 0,
+            "written": 0,
+            "batches": 0,
+            "failed": 0,  # write attempts that raised (retries included)
+            "dropped": 0,  # decisions discarded after retrying and splitting
+            "rejected": 0,
+            "last_flush_ms": None,
+        }
+
+    # ---------------------------------------------------------
+    # Lifecycle
+    # ---------------------------------------------------------
+    def init_app(self, app):
+        """Read settings from app.config and start the background worker."""
+        self.app = app
+        config = app.config
+        self.sync = config.get("PERSISTENCE_MODE", "async") == "sync"
+        self.batch_size = config.get("PERSISTENCE_BATCH_SIZE", self.batch_size)
+        self.flush_interval = config.get("PERSISTENCE_FLUSH_INTERVAL", self.flush_interval)
+        self.put_timeout = config.get("PERSISTENCE_PUT_TIMEOUT", self.put_timeout)
+        max_queue = config.get("PERSISTENCE_QUEUE_SIZE", self.max_queue)
+        if max_queue != self.max_queue and self._queue.empty():
+            self.max_queue = max_queue
+            self._queue = queue.Queue(maxsize=max_queue)
+
+        if not self.sync:
+            self.start()
+        atexit.register(self.stop)
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=10.0):
+        """Drain everything still queued, then stop the worker."""
+        if self.thread and self.thread.is_alive():
+            self._queue.put(_STOP)
+            self.thread.join(timeout=timeout)
+        self.thread = None
+        self.flush()
+
+    # ---------------------------------------------------------
+    # Producer side
+    # ---------------------------------------------------------
+    def submit(self, packet, decision):
+        """
+        Queue one (packet dict, Decision) for persistence; returns a Receipt
+        whose row ids are valid before the write happens. Blocks up to
+        put_timeout when the queue is full, then raises PersistenceBackpressure;
+        raises PersistenceError when a synchronous write drops the decision.
+        """
+        ticket = next(self._tickets)
+        packet = dict(packet, id=row_ids.allocate(Packet)[0], log_id=row_ids.allocate(Log)[0])
+        receipt = Receipt(ticket, packet["id"], packet["log_id"])
+        if self.sync or not (self.thread and self.thread.is_alive()):
+            if self._write([(packet, decision)]):
+                raise PersistenceError("Decision could not be written (see pipeline stats)")
+            return receipt
+        try:
+            self._queue.put((packet, decision), timeout=self.put_timeout)
+        except queue.Full:
+            self._bump("rejected")
+            raise PersistenceBackpressure(
+                f"Write queue full ({self.max_queue} pending decisions)"
+            )
+        self._bump("queued")
+        return receipt
+
+    def flush(self):
+        """
+        Synchronously write everything currently queued and wait for any
+        batch the worker is holding (tests, shutdown).
+        """
+        while True:
+            batch = self._drain(self.batch_size)
+            if not batch:
+                break
+            self._write(batch)
+            self._ack(len(batch))
+        self._queue.join()
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats.update({
+            "mode": "sync" if self.sync else "async",
+            "pending": self._queue.qsize(),
+            "capacity": self.max_queue,
+            "worker_alive": bool(self.thread and self.thread.is_alive()),
+        })
+        return stats
+
+    # ---------------------------------------------------------
+    # Worker side
+    # ---------------------------------------------------------
+    def _run(self):
+        while True:
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            if first is _STOP:
+                self._ack(1)
+                return
+
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._write(batch)
+            self._ack(len(batch) + (1 if stop else 0))
+            if stop:
+                return
+
+    def _drain(self, limit):
+        batch = []
+        while len(batch) < limit:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._ack(1)
+            else:
+                batch.append(item)
+        return batch
+
+    def _ack(self, count):
+        for _ in range(count):
+            self._queue.task_done()
+
+    def _write(self, batch):
+        """
+        Write a batch, retrying it once; returns how many decisions were
+        dropped. A batch that still fails is split in halves, and each half
+        that fails is split again, so only rows that can't be written are
+        lost. A systemic error (database locked or gone) drops what is left
+        instead of bisecting against a database that can't take anything.
+        """
+        with self._flush_lock:
+            error = self._attempt(batch) and self._attempt(batch)
+            return self._bisect(batch, error) if error else 0
+
+    def _bisect(self, batch, error):
+        if len(batch) == 1 or _is_systemic(error):
+            print(f"❌ Write-behind flush failed ({len(batch)} decisions dropped): {error}")
+            self._bump("dropped", len(batch))
+            return len(batch)
+        middle = len(batch) // 2
+        dropped = 0
+        for half in (batch[:middle], batch[middle:]):
+            error = self._attempt(half)
+            if error:
+                dropped += self._bisect(half, error)
+        return dropped
+
+    def _attempt(self, batch):
+        """One write transaction; returns the exception instead of raising it."""
+        from services.firewall_engine import save_results_bulk
+
+        packets = [packet for packet, _ in batch]
+        decisions = [decision for _, decision in batch]
+        started = time.perf_counter()
+        try:
+            if self.app is not None:
+                with self.app.app_context():
+                    save_results_bulk(packets, decisions)
+            else:
+                save_results_bulk(packets, decisions)
+        except Exception as e:
+            self._bump("failed")
+            return e
+        with self._stats_lock:
+            self._stats["written"] += len(batch)
+            self._stats["batches"] += 1
+            self._stats["last_flush_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        return None
+
+    def _bump(self, key, amount=1):
+        with self._stats_lock:
+            self._stats[key] += amount
+
+
+# Process-wide id allocator and writer used by the firewall engine
+row_ids = RowIds()
+writer = WriteBehindWriter()
+
+
+def init_persistence(app):
+    """Configure and start the write-behind writer; call from create_app()."""
+    row_ids.init_app(app)
+    writer.init_app(app)
+    return writer
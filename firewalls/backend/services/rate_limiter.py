@@ -0,0 +1,266 @@
+"""
+Per-source token-bucket rate limiting, ahead of rule evaluation
+
+Every source IP (and, optionally, its /N subnet) owns a token bucket that
+refills at a fixed packets-per-second rate up to a burst size. A packet that
+finds either bucket empty gets the RATE_LIMITED decision and never reaches
+the rules or the write-behind queue. Dropped packets are only counted here;
+a flusher writes one summary Log row per (limited source, protocol) per
+interval, so a flood costs a handful of rows rather than one per packet.
+
+Buckets live in a bounded LRU table. An idle bucket that would already have
+refilled to full is indistinguishable from a fresh one, so those are expired
+from the cold end as traffic flows; when the table is still full the least
+recently used bucket is evicted.
+"""
+import atexit
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from models.log import Log
+from services.persistence import row_ids
+from services.traffic_stats import apply_rollups, rollup_counts
+from utils.db import db
+from utils.ip_utils import int_to_ip, ip_to_int
+from utils.logger import log_events
+
+RATE_LIMITED = "RATE_LIMITED"
+
+
+def _check_bucket(prefix, rate, burst):
+    """Raise ValueError for a bucket that could never pass (or never refill)."""
+    if not rate > 0:
+        raise ValueError(f"{prefix}_PPS must be greater than 0, got {rate}")
+    if not burst >= 1:
+        raise ValueError(f"{prefix}_BURST must be at least 1, got {burst}")
+
+
+class RateLimiter:
+
+    def __init__(self, rate=100.0, burst=200.0, subnet_prefix=None, subnet_rate=1000.0,
+                 subnet_burst=2000.0, max_buckets=100000, flush_interval=5.0, enabled=False):
+        self.rate = rate
+        self.burst = burst
+        self.subnet_prefix = subnet_prefix
+        self.subnet_rate = subnet_rate
+        self.subnet_burst = subnet_burst
+        self.max_buckets = max_buckets
+        self.flush_interval = flush_interval
+        self.enabled = enabled
+
+        self.app = None
+        self.thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        # key -> [tokens, updated_at, full_after] (monotonic seconds)
+        self._buckets = OrderedDict()
+        # (limited key, protocol) -> [count, first_seen, last_seen] (wall clock)
+        self._dropped = {}
+        self._stats = {
+            "passed": 0,
+            "limited": 0,
+            "expired": 0,
+            "evicted": 0,
+            "summaries_written": 0,
+        }
+
+    # ---------------------------------------------------------
+    # Lifecycle
+    # ---------------------------------------------------------
+    def init_app(self, app):
+        """
+        Apply RATE_LIMIT_* settings. Raises ValueError (leaving the limiter as
+        it was) unless every rate is > 0 and every burst >= 1: a zero rate
+        would never refill a bucket, and a burst below one token can't pass
+        a single packet.
+        """
+        config = app.config
+        rate = config.get("RATE_LIMIT_PPS", self.rate)
+        burst = config.get("RATE_LIMIT_BURST", self.burst)
+        subnet_prefix = config.get("RATE_LIMIT_SUBNET_PREFIX", self.subnet_prefix) or None
+        subnet_rate = config.get("RATE_LIMIT_SUBNET_PPS", self.subnet_rate)
+        subnet_burst = config.get("RATE_LIMIT_SUBNET_BURST", self.subnet_burst)
+        _check_bucket("RATE_LIMIT", rate, burst)
+        if subnet_prefix is not None:
+            if not 1 <= subnet_prefix <= 32:
+                raise ValueError(f"RATE_LIMIT_SUBNET_PREFIX must be between 1 and 32, got {subnet_prefix}")
+            _check_bucket("RATE_LIMIT_SUBNET", subnet_rate, subnet_burst)
+
+        self.app = app
+        self.enabled = config.get("RATE_LIMIT_ENABLED", self.enabled)
+        self.rate, self.burst = rate, burst
+        self.subnet_prefix = subnet_prefix
+        self.subnet_rate, self.subnet_burst = subnet_rate, subnet_burst
+        self.max_buckets = config.get("RATE_LIMIT_MAX_BUCKETS", self.max_buckets)
+        self.flush_interval = config.get("RATE_LIMIT_SUMMARY_INTERVAL", self.flush_interval)
+        if self.enabled and not (self.thread and self.thread.is_alive()):
+            self._stop.clear()
+            self.thread = threading.Thread(target=self._run, name="rate-limit-summary", daemon=True)
+            self.thread.start()
+            atexit.register(self.stop)
+
+    def stop(self):
+        self._stop.set()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=self.flush_interval + 5)
+        self.thread = None
+
+    # ---------------------------------------------------------
+    # Packet path
+    # ---------------------------------------------------------
+    def subnet_of(self, src_ip):
+        if not self.subnet_prefix or src_ip == "any":
+            return None
+        shift = 32 - self.subnet_prefix
+        return f"{int_to_ip((ip_to_int(src_ip) >> shift) << shift)}/{self.subnet_prefix}"
+
+    def check(self, packet_data):
+        """
+        Take a token for the packet's source (and subnet). Returns None when
+        the packet may proceed, otherwise the key that ran dry.
+        """
+        src_ip = packet_data["src_ip"]
+        subnet = self.subnet_of(src_ip)
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            source = self._refill(src_ip, now, self.rate, self.burst)
+            network = (
+                self._refill(subnet, now, self.subnet_rate, self.subnet_burst)
+                if subnet is not None else None
+            )
+            if source[0] < 1:
+                limited = src_ip
+            elif network is not None and network[0] < 1:
+                limited = subnet
+            else:
+                source[0] -= 1
+                if network is not None:
+                    network[0] -= 1
+                self._stats["passed"] += 1
+                return None
+
+            self._stats["limited"] += 1
+            wall = datetime.utcnow()
+            dropped = self._dropped.get((limited, packet_data["protocol"]))
+            if dropped is None:
+                self._dropped[(limited, packet_data["protocol"])] = [1, wall, wall]
+            else:
+                dropped[0] += 1
+                dropped[2] = wall
+            return limited
+
+    def _refill(self, key, now, rate, burst):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            while len(self._buckets) >= self.max_buckets:
+                self._buckets.popitem(last=False)
+                self._stats["evicted"] += 1
+            bucket = [burst, now, now]
+            self._buckets[key] = bucket
+        else:
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+            self._buckets.move_to_end(key)
+        bucket[2] = now + (burst - bucket[0] + 1) / rate  # full again (minus this token) by then
+        return bucket
+
+    def _expire(self, now, limit=8):
+        """Drop a few cold buckets that have refilled completely."""
+        buckets = self._buckets
+        for _ in range(limit):
+            if not buckets:
+                return
+            key, bucket = next(iter(buckets.items()))
+            if bucket[2] > now:
+                return
+            del buckets[key]
+            self._stats["expired"] += 1
+
+    # ---------------------------------------------------------
+    # Aggregated recording
+    # ---------------------------------------------------------
+    def flush(self):
+        """Write one summary Log row (plus rollups) per limited source; needs an app context."""
+        with self._lock:
+            dropped, self._dropped = self._dropped, {}
+        if not dropped:
+            return 0
+
+        rows, messages = [], []
+        for (limited, protocol), (count, first, last) in dropped.items():
+            reason = f"Rate limited {count} {protocol} packets from {limited}"
+            rows.append({
+                "packet_id": None,
+                "rule_id": None,
+                "decision": RATE_LIMITED,
+                "reason": reason[:255],
+                "timestamp": last,
+                "rolled_up": True,
+                "weight": count,
+            })
+            messages.append(
+                f"🚦 {reason} between {first:%H:%M:%S} and {last:%H:%M:%S}"
+            )
+        for row, log_id in zip(rows, row_ids.allocate(Log, len(rows))):
+            row["id"] = log_id
+        try:
+            db.session.execute(insert(Log), rows)
+            apply_rollups(rollup_counts(
+                (last, RATE_LIMITED, protocol, 0, None, count)
+                for (_, protocol), (count, _, last) in dropped.items()
+            ))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            # Put the counts back so the next flush retries them
+            with self._lock:
+                for key, (count, first, last) in dropped.items():
+                    current = self._dropped.setdefault(key, [0, first, last])
+                    current[0] += count
+                    current[1] = min(current[1], first)
+                    current[2] = max(current[2], last)
+            raise
+        log_events(messages)
+        with self._lock:
+            self._stats["summaries_written"] += len(rows)
+        return len(rows)
+
+    def _run(self):
+        while True:
+            stopping = self._stop.wait(self.flush_interval)
+            try:
+                with self.app.app_context():
+                    self.flush()
+            except Exception as e:
+                print(f"⚠️ Rate limit summary flush failed: {e}")
+            if stopping:
+                return
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                "enabled": self.enabled,
+                "buckets": len(self._buckets),
+                "max_buckets": self.max_buckets,
+                "pending_summaries": len(self._dropped),
+                "rate": self.rate,
+                "burst": self.burst,
+                "subnet_prefix": self.subnet_prefix,
+            })
+        return stats
+
+
+# Process-wide limiter used by the firewall engine
+rate_limiter = RateLimiter()
+
+
+def init_rate_limiter(app):
+    """Configure the limiter from RATE_LIMIT_* settings and start its flusher."""
+    rate_limiter.init_app(app)
+    return rate_limiter
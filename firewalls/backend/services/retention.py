@@ -0,0 +1,342 @@
+"""
+Data retention: age out packets/logs (and fine-grained rollups)
+
+A background job runs every RETENTION_INTERVAL seconds:
+
+1. logs not yet counted in traffic_rollups are folded in first, so charts
+   keep their history after the raw rows are gone;
+2. logs older than RETENTION_DAYS are deleted together with their packets,
+   RETENTION_BATCH_SIZE rows per short transaction with a pause in between,
+   so the write-behind worker is never locked out for long (rows are
+   appended to a gzipped NDJSON archive first when RETENTION_ARCHIVE_DIR is
+   set); packets left without a log are removed the same way;
+3. minute rollups older than RETENTION_MINUTE_ROLLUP_DAYS (and hour rollups
+   older than RETENTION_HOUR_ROLLUP_DAYS, if set) are pruned;
+4. on SQLite, freed pages are returned with PRAGMA incremental_vacuum.
+
+Progress of the running job and the timings of recent runs are kept in
+memory for GET /api/admin/retention.
+"""
+import atexit
+import gzip
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, exists, select, text
+
+from models.log import Log
+from models.packet import Packet
+from models.traffic_rollup import TrafficRollup
+from services.traffic_stats import backfill_rollups
+from utils.db import db
+from utils.logger import log_event
+
+
+class RetentionJob:
+
+    def __init__(self, max_age_days=30, minute_rollup_days=7, hour_rollup_days=0,
+                 interval=3600.0, initial_delay=60.0, batch_size=1000, batch_pause=0.05,
+                 vacuum_pages=2000, archive_dir=None, history=20, enabled=False):
+        self.max_age_days = max_age_days
+        self.minute_rollup_days = minute_rollup_days
+        self.hour_rollup_days = hour_rollup_days
+        self.interval = interval
+        self.initial_delay = initial_delay
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self.vacuum_pages = vacuum_pages
+        self.archive_dir = archive_dir
+        self.enabled = enabled
+
+        self.app = None
+        self.thread = None
+        self._stop = threading.Event()
+        self._run_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._current = None
+        self._runs = deque(maxlen=history)
+
+    # ---------------------------------------------------------
+    # Lifecycle
+    # ---------------------------------------------------------
+    def init_app(self, app):
+        self.app = app
+        config = app.config
+        self.enabled = config.get("RETENTION_ENABLED", self.enabled)
+        self.max_age_days = config.get("RETENTION_DAYS", self.max_age_days)
+        self.minute_rollup_days = config.get("RETENTION_MINUTE_ROLLUP_DAYS", self.minute_rollup_days)
+        self.hour_rollup_days = config.get("RETENTION_HOUR_ROLLUP_DAYS", self.hour_rollup_days)
+        self.interval = config.get("RETENTION_INTERVAL", self.interval)
+        self.initial_delay = config.get("RETENTION_INITIAL_DELAY", self.initial_delay)
+        self.batch_size = config.get("RETENTION_BATCH_SIZE", self.batch_size)
+        self.batch_pause = config.get("RETENTION_BATCH_PAUSE", self.batch_pause)
+        self.vacuum_pages = config.get("RETENTION_VACUUM_PAGES", self.vacuum_pages)
+        self.archive_dir = config.get("RETENTION_ARCHIVE_DIR", self.archive_dir) or None
+        if self.enabled and not (self.thread and self.thread.is_alive()):
+            self._stop.clear()
+            self.thread = threading.Thread(target=self._schedule, name="retention", daemon=True)
+            self.thread.start()
+            atexit.register(self.stop)
+
+    def stop(self):
+        self._stop.set()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=5)
+        self.thread = None
+
+    def _schedule(self):
+        delay = self.initial_delay
+        while not self._stop.wait(delay):
+            delay = self.interval
+            try:
+                with self.app.app_context():
+                    self.run()
+            except Exception as e:
+                print(f"⚠️ Retention run failed: {e}")
+
+    @property
+    def running(self):
+        return self._run_lock.locked()
+
+    def run_async(self, trigger="manual"):
+        """Start a run on a helper thread; False when one is already in progress."""
+        if self.running:
+            return False
+
+        def target():
+            with self.app.app_context():
+                try:
+                    self.run(trigger=trigger)
+                except Exception as e:
+                    print(f"⚠️ Retention run failed: {e}")
+
+        threading.Thread(target=target, name="retention-manual", daemon=True).start()
+        return True
+
+    # ---------------------------------------------------------
+    # The job
+    # ---------------------------------------------------------
+    def run(self, trigger="scheduled", now=None):
+        """One full retention pass; needs an app context. Returns the run record."""
+        if not self._run_lock.acquire(blocking=False):
+            return None
+        now = now or datetime.utcnow()
+        cutoff = now - timedelta(days=self.max_age_days)
+        record = {
+            "trigger": trigger,
+            "started_at": now.isoformat(),
+            "finished_at": None,
+            "status": "running",
+            "phase": None,
+            "cutoff": cutoff.isoformat(),
+            "rolled_up": 0,
+            "logs_deleted": 0,
+            "packets_deleted": 0,
+            "rollups_deleted": 0,
+            "archived": 0,
+            "batches": 0,
+            "vacuumed_pages": None,
+            "timings_ms": {},
+            "error": None,
+        }
+        with self._lock:
+            self._current = record
+        try:
+            self._phase(record, "rollup", self._rollup)
+            archive = self._archive_path(now)
+            self._phase(record, "logs", lambda r: self._delete_logs(r, cutoff, archive))
+            self._phase(record, "packets", lambda r: self._delete_orphan_packets(r, cutoff))
+            self._phase(record, "rollups", lambda r: self._prune_rollups(r, now))
+            self._phase(record, "vacuum", self._vacuum)
+            record["status"] = "ok"
+        except Exception as e:
+            db.session.rollback()
+            record["status"] = "failed"
+            record["error"] = str(e)
+            raise
+        finally:
+            record["phase"] = None
+            record["finished_at"] = datetime.utcnow().isoformat()
+            with self._lock:
+                self._current = None
+                self._runs.appendleft(record)
+            self._run_lock.release()
+
+        if record["logs_deleted"] or record["packets_deleted"] or record["rollups_deleted"]:
+            log_event(
+                f"🧹 Retention removed {record['logs_deleted']} logs, "
+                f"{record['packets_deleted']} packets, {record['rollups_deleted']} rollups "
+                f"older than {record['cutoff']}"
+            )
+        return record
+
+    def _phase(self, record, name, step):
+        record["phase"] = name
+        started = time.perf_counter()
+        try:
+            step(record)
+        finally:
+            record["timings_ms"][name] = round((time.perf_counter() - started) * 1000, 1)
+
+    def _batches(self, record):
+        """Yield between batches so writers can get in; stop early on shutdown."""
+        while not self._stop.is_set():
+            yield
+            record["batches"] += 1
+            if self.batch_pause:
+                time.sleep(self.batch_pause)
+
+    def _rollup(self, record):
+        for _ in self._batches(record):
+            processed = backfill_rollups(batch_size=self.batch_size, max_batches=1)
+            record["rolled_up"] += processed
+            if processed < self.batch_size:
+                return
+
+    def _delete_logs(self, record, cutoff, archive):
+        for _ in self._batches(record):
+            rows = db.session.execute(
+                select(Log.id, Log.packet_id)
+                .where(Log.timestamp < cutoff, Log.rolled_up.is_(True))
+                .order_by(Log.id)
+                .limit(self.batch_size)
+            ).all()
+            if not rows:
+                return
+            log_ids = [log_id for log_id, _ in rows]
+            packet_ids = [packet_id for _, packet_id in rows if packet_id is not None]
+            if archive:
+                record["archived"] += self._archive(archive, log_ids)
+            db.session.execute(delete(Log).where(Log.id.in_(log_ids)))
+            if packet_ids:
+                db.session.execute(delete(Packet).where(Packet.id.in_(packet_ids)))
+            db.session.commit()
+            record["logs_deleted"] += len(log_ids)
+            record["packets_deleted"] += len(packet_ids)
+
+    def _delete_orphan_packets(self, record, cutoff):
+        for _ in self._batches(record):
+            ids = db.session.execute(
+                select(Packet.id)
+                .where(
+                    Packet.processed_at < cutoff,
+                    ~exists().where(Log.packet_id == Packet.id),
+                )
+                .order_by(Packet.id)
+                .limit(self.batch_size)
+            ).scalars().all()
+            if not ids:
+                return
+            db.session.execute(delete(Packet).where(Packet.id.in_(ids)))
+            db.session.commit()
+            record["packets_deleted"] += len(ids)
+
+    def _prune_rollups(self, record, now):
+        for bucket, days in (("minute", self.minute_rollup_days), ("hour", self.hour_rollup_days)):
+            if not days:
+                continue
+            cutoff = now - timedelta(days=days)
+            for _ in self._batches(record):
+                ids = db.session.execute(
+                    select(TrafficRollup.id)
+                    .where(TrafficRollup.bucket == bucket, TrafficRollup.bucket_start < cutoff)
+                    .limit(self.batch_size)
+                ).scalars().all()
+                if not ids:
+                    break
+                db.session.execute(delete(TrafficRollup).where(TrafficRollup.id.in_(ids)))
+                db.session.commit()
+                record["rollups_deleted"] += len(ids)
+
+    def _vacuum(self, record):
+        """Return free pages to the OS; only possible once auto_vacuum=INCREMENTAL."""
+        if db.session.get_bind().dialect.name != "sqlite":
+            return
+        auto_vacuum = db.session.execute(text("PRAGMA auto_vacuum")).scalar()
+        if auto_vacuum != 2:
+            # Existing databases need a one-off full VACUUM to switch modes
+            record["vacuumed_pages"] = 0
+            return
+        db.session.commit()
+        connection = db.engine.raw_connection()
+        try:
+            free_before = connection.execute("PRAGMA freelist_count").fetchone()[0]
+            # sqlite3's execute() steps the pragma once (one page);
+            # executescript() runs it to completion
+            connection.driver_connection.executescript(
+                f"PRAGMA incremental_vacuum({int(self.vacuum_pages)})"
+            )
+            free_after = connection.execute("PRAGMA freelist_count").fetchone()[0]
+        finally:
+            connection.close()
+        record["vacuumed_pages"] = free_before - free_after
+
+    # ---------------------------------------------------------
+    # Archive
+    # ---------------------------------------------------------
+    def _archive_path(self, now):
+        if not self.archive_dir:
+            return None
+        os.makedirs(self.archive_dir, exist_ok=True)
+        return os.path.join(self.archive_dir, f"firewallx-{now:%Y%m%d-%H%M%S}.ndjson.gz")
+
+    def _archive(self, path, log_ids):
+        rows = db.session.execute(
+            select(
+                Log.id, Log.packet_id, Log.rule_id, Log.decision, Log.reason, Log.timestamp,
+                Log.weight, Packet.src_ip, Packet.dest_ip, Packet.port, Packet.protocol,
+            )
+            .outerjoin(Packet, Packet.id == Log.packet_id)
+            .where(Log.id.in_(log_ids))
+            .order_by(Log.id)
+        ).mappings().all()
+        with gzip.open(path, "at", encoding="utf-8") as archive:
+            for row in rows:
+                archive.write(json.dumps(dict(
+                    row,
+                    timestamp=row["timestamp"].isoformat() if row["timestamp"] else None,
+                    weight=row["weight"] or 1,
+                )) + "\n")
+        return len(rows)
+
+    # ---------------------------------------------------------
+    # Reporting
+    # ---------------------------------------------------------
+    @staticmethod
+    def _copy(record):
+        return dict(record, timings_ms=dict(record["timings_ms"]))
+
+    def status(self):
+        with self._lock:
+            current = self._copy(self._current) if self._current else None
+            runs = [self._copy(run) for run in self._runs]
+        return {
+            "enabled": self.enabled,
+            "running": current is not None,
+            "current": current,
+            "runs": runs,
+            "settings": {
+                "max_age_days": self.max_age_days,
+                "minute_rollup_days": self.minute_rollup_days,
+                "hour_rollup_days": self.hour_rollup_days,
+                "interval": self.interval,
+                "batch_size": self.batch_size,
+                "batch_pause": self.batch_pause,
+                "vacuum_pages": self.vacuum_pages,
+                "archive_dir": self.archive_dir,
+            },
+        }
+
+
+# Process-wide retention job
+retention = RetentionJob()
+
+
+def init_retention(app):
+    """Configure the job from RETENTION_* settings and start its scheduler."""
+    retention.init_app(app)
+    return retention
@@ -0,0 +1,179 @@
+"""
+Rule set analysis: shadowed, redundant and conflicting rules
+
+Everything is derived from the overlapping pairs found by rule_optimizer's
+per-dimension overlap index (each rule only meets rules that overlap it on
+its most selective dimension), with O(1) containment checks per pair:
+
+- shadowed:    fully covered by an earlier rule with a different action, so
+               it never matches
+- redundant:   never matches because an earlier same-action rule covers it,
+               or can be removed because a later same-action rule covers it
+               with nothing conflicting in between, or (for the default
+               action) because no later rule with another action overlaps it
+- conflicts:   overlapping rules with different actions that only partially
+               overlap (correlation) or where the later rule is broader
+               (generalization); order matters for these
+- unmatchable: rules whose stored address/port spec can never match
+
+prune_rules() returns the minimal equivalent rule list by dropping rules in
+reverse id order whenever the rest still produce the same decisions.
+"""
+from services.rule_optimizer import overlapping_pairs
+
+# Action applied when no rule matches (see firewall_engine.decide)
+DEFAULT_ACTION = "ALLOW"
+
+
+def _range_covers(outer, inner):
+    if outer is None:
+        return True
+    return inner is not None and outer[0] <= inner[0] and inner[1] <= outer[1]
+
+
+def _ports_cover(outer, inner):
+    if outer is None:
+        return True
+    if inner is None:
+        return False
+    i = 0
+    for lo, hi in inner:
+        while i < len(outer) and outer[i][1] < lo:
+            i += 1
+        if i == len(outer) or not (outer[i][0] <= lo and hi <= outer[i][1]):
+            return False
+    return True
+
+
+def rule_covers(outer, inner):
+    """True if every packet matching inner also matches outer."""
+    return (
+        (outer.protocol is None or outer.protocol == inner.protocol)
+        and _range_covers(outer.src, inner.src)
+        and _range_covers(outer.dest, inner.dest)
+        and _ports_cover(outer.ports, inner.ports)
+    )
+
+
+def _unmatchable(rule):
+    return (
+        (rule.src is not None and rule.src[0] > rule.src[1])
+        or (rule.dest is not None and rule.dest[0] > rule.dest[1])
+        or rule.ports == ()
+    )
+
+
+def _overlap_lists(rules):
+    """{rule_id: [overlapping earlier rules]}, {rule_id: [overlapping later rules]}, pair count."""
+    earlier = {rule.id: [] for rule in rules}
+    later = {rule.id: [] for rule in rules}
+    pairs = 0
+    for first, second in overlapping_pairs(rules):
+        earlier[second.id].append(first)
+        later[first.id].append(second)
+        pairs += 1
+    for lists in (earlier, later):
+        for overlaps in lists.values():
+            overlaps.sort(key=lambda r: r.id)
+    return earlier, later, pairs
+
+
+def _removal_reason(rule, earlier, later, kept):
+    """
+    Why rule can be dropped without changing any decision, or None.
+    kept: ids still present (every earlier rule, the surviving later ones).
+    """
+    for other in earlier[rule.id]:
+        if other.id in kept and rule_covers(other, rule):
+            return "shadowed" if other.action != rule.action else "redundant", other.id
+
+    conflicting = [
+        other for other in later[rule.id]
+        if other.id in kept and other.action != rule.action
+    ]
+    first_conflict = conflicting[0].id if conflicting else None
+    for other in later[rule.id]:
+        if first_conflict is not None and other.id > first_conflict:
+            break
+        if other.id in kept and other.action == rule.action and rule_covers(other, rule):
+            return "redundant", other.id
+    if not conflicting and rule.action == DEFAULT_ACTION:
+        return "redundant", None
+    return None
+
+
+def analyze_rules(rule_set, max_conflicts=None):
+    """
+    Classify every rule of a RuleSet snapshot; returns a JSON-ready dict.
+    At most max_conflicts conflict pairs are listed (all are counted).
+    """
+    rules = rule_set.rules
+    earlier, later, pairs = _overlap_lists(rules)
+    all_ids = {rule.id for rule in rules}
+
+    shadowed, redundant, conflicts, unmatchable = [], [], [], []
+    conflict_count = 0
+    for rule in rules:
+        if _unmatchable(rule):
+            unmatchable.append(rule.id)
+            continue
+
+        reason = _removal_reason(rule, earlier, later, all_ids)
+        if reason is not None:
+            kind, by = reason
+            entry = {"rule_id": rule.id, "action": rule.action, "by": by}
+            if kind == "shadowed":
+                shadowed.append(entry)
+            else:
+                entry["reason"] = (
+                    "same action as the default" if by is None
+                    else "covered by earlier rule" if by < rule.id
+                    else "covered by later rule"
+                )
+                redundant.append(entry)
+
+        for other in later[rule.id]:
+            if other.action == rule.action or rule_covers(rule, other):
+                continue  # same action, or the later rule is shadowed (reported above)
+            conflict_count += 1
+            if max_conflicts is not None and len(conflicts) >= max_conflicts:
+                continue
+            conflicts.append({
+                "rule_id": rule.id,
+                "with": other.id,
+                "kind": "generalization" if rule_covers(other, rule) else "correlation",
+            })
+
+    return {
+        "version": rule_set.version,
+        "rules": len(rules),
+        "overlapping_pairs": pairs,
+        "shadowed": shadowed,
+        "redundant": redundant,
+        "conflicts": conflicts,
+        "conflict_count": conflict_count,
+        "unmatchable": unmatchable,
+    }
+
+
+def prune_rules(rule_set):
+    """
+    Minimal equivalent rule list: walk rules from last to first and drop each
+    one whose packets would get the same action from the rules kept so far.
+    Returns (kept CompiledRules in id order, [(removed id, reason, by)]).
+    """
+    rules = rule_set.rules
+    earlier, later, _ = _overlap_lists(rules)
+    kept = {rule.id for rule in rules}
+    removed = []
+    for rule in reversed(rules):
+        if _unmatchable(rule):
+            kept.discard(rule.id)
+            removed.append((rule.id, "unmatchable", None))
+            continue
+        reason = _removal_reason(rule, earlier, later, kept)
+        if reason is not None:
+            kept.discard(rule.id)
+            removed.append((rule.id,) + reason)
+    removed.reverse()
+    return [rule for rule in rules if rule.id in kept], removed
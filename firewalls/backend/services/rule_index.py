@@ -0,0 +1,221 @@
+"""
+Bucketed rule index for sub-linear packet matching
+
+Rules are grouped by (protocol, port), with None standing for the ANY/any-port
+wildcards. A packet only has to look at the four buckets that can possibly
+match it; rules with port ranges live in a per-protocol PortRangeTree and
+contribute O(log n) more buckets. Inside a bucket, rules are indexed by source
+and then destination address in prefix tables, so the lookup cost depends on
+the number of distinct prefix lengths (at most 33 per address), not on how
+many rules there are.
+The overall answer is the smallest matching rule id, which is exactly what a
+linear first-match scan returns.
+"""
+from bisect import bisect_left, bisect_right
+
+from utils.ip_utils import MAX_IPV4, range_to_prefixes
+
+_ANY_RANGE = (0, MAX_IPV4)
+
+
+class PrefixTable:
+    """
+    Binary prefix trie flattened into one hash table per prefix length.
+    Each level maps (address >> (32 - prefix_len)) to a value; a lookup probes
+    every populated level, i.e. walks the trie along the address bits.
+    """
+
+    __slots__ = ("levels",)
+
+    def __init__(self, levels):
+        # Tuple of (shift, {masked_address: value}), most specific first
+        self.levels = levels
+
+    @staticmethod
+    def group(items, key_range):
+        """
+        Group items by prefix: {prefix_len: {masked_address: [items]}}.
+        Wildcard items (key_range None) sit in the /0 entry like a full
+        0.0.0.0/0 range, and again under the key None: only they match a
+        packet whose address is the literal 'any' (see CompiledRule.matches).
+        """
+        grouped = {}
+        for item in items:
+            bounds = key_range(item)
+            if bounds is None:
+                grouped.setdefault(0, {}).setdefault(None, []).append(item)
+            start, end = bounds or _ANY_RANGE
+            for network, prefix_len in range_to_prefixes(start, end):
+                shift = 32 - prefix_len
+                grouped.setdefault(prefix_len, {}).setdefault(network >> shift, []).append(item)
+        return grouped
+
+    @classmethod
+    def build(cls, grouped, finalize):
+        """Freeze grouped items, mapping each item list through finalize()."""
+        return cls(tuple(
+            (32 - prefix_len, {key: finalize(items) for key, items in table.items()})
+            for prefix_len, table in sorted(grouped.items(), reverse=True)
+        ))
+
+    def values(self, address):
+        """Yield the value stored at every prefix covering address."""
+        if address is None:
+            # A wildcard packet address only meets wildcard entries
+            for shift, table in self.levels:
+                if shift == 32 and None in table:
+                    yield table[None]
+            return
+        for shift, table in self.levels:
+            value = table.get(address >> shift)
+            if value is not None:
+                yield value
+
+
+def _lowest_id(rules):
+    return min(rules, key=lambda r: r.id)
+
+
+def _build_bucket(rules):
+    """Source-prefix table whose values are destination-prefix tables of rules."""
+    by_src = PrefixTable.group(rules, lambda r: r.src)
+    return PrefixTable.build(
+        by_src,
+        lambda src_rules: PrefixTable.build(
+            PrefixTable.group(src_rules, lambda r: r.dest), _lowest_id
+        ),
+    )
+
+
+def _probe(bucket, src_addr, dest_addr, best):
+    """Lowest-id rule in bucket matching both addresses, or best if lower."""
+    if src_addr is None or dest_addr is None:
+        # Slow path for legacy packets whose address is the literal 'any'
+        for dest_index in bucket.values(src_addr):
+            for rule in dest_index.values(dest_addr):
+                if best is None or rule.id < best.id:
+                    best = rule
+        return best
+
+    for src_shift, src_table in bucket.levels:
+        dest_index = src_table.get(src_addr >> src_shift)
+        if dest_index is None:
+            continue
+        for dest_shift, dest_table in dest_index.levels:
+            rule = dest_table.get(dest_addr >> dest_shift)
+            if rule is not None and (best is None or rule.id < best.id):
+                best = rule
+    return best
+
+
+def _ranked_bucket(rules):
+    """(lowest rule id, bucket): the id lets lookups skip hopeless nodes."""
+    return min(r.id for r in rules), _build_bucket(rules)
+
+
+class PortRangeTree:
+    """
+    Segment tree over port ranges. The port space is cut into elementary
+    segments at every range boundary; each range is stored at the O(log n)
+    tree nodes that exactly cover it, so a lookup visits one root-to-leaf
+    path (O(log n) nodes) however wide or numerous the ranges are.
+    """
+
+    __slots__ = ("_points", "_segments", "_leaf_base", "_nodes")
+
+    def __init__(self, entries, finalize=None):
+        # entries: iterable of (lo, hi, item) with inclusive port bounds;
+        # finalize maps each node's item list to what buckets() yields
+        entries = list(entries)
+        points = sorted({lo for lo, _, _ in entries} | {hi + 1 for _, hi, _ in entries})
+        segments = max(len(points) - 1, 0)
+        leaf_base = 1
+        while leaf_base < segments:
+            leaf_base *= 2
+
+        nodes = [[] for _ in range(2 * leaf_base)]
+        for lo, hi, rule in entries:
+            left = bisect_left(points, lo) + leaf_base
+            right = bisect_left(points, hi + 1) + leaf_base  # exclusive
+            while left < right:
+                if left & 1:
+                    nodes[left].append(rule)
+                    left += 1
+                if right & 1:
+                    right -= 1
+                    nodes[right].append(rule)
+                left >>= 1
+                right >>= 1
+
+        self._points = points
+        self._segments = segments
+        self._leaf_base = leaf_base
+        finalize = finalize or _ranked_bucket
+        self._nodes = [finalize(node) if node else None for node in nodes]
+
+    def buckets(self, port):
+        """Yield the finalized value of every range node containing port."""
+        segment = bisect_right(self._points, port) - 1
+        if segment < 0 or segment >= self._segments:
+            return
+        nodes = self._nodes
+        i = segment + self._leaf_base
+        while i:
+            if nodes[i] is not None:
+                yield nodes[i]
+            i >>= 1
+
+
+class RuleIndex:
+    """Read-only index over CompiledRule objects (built once per RuleSet)."""
+
+    __slots__ = ("_buckets", "_ranges", "_sizes", "size")
+
+    def __init__(self, rules):
+        rules = list(rules)
+        exact = {}
+        ranged = {}
+        for rule in rules:
+            if rule.ports is None:
+                exact.setdefault((rule.protocol, None), []).append(rule)
+                continue
+            for lo, hi in rule.ports:
+                if lo == hi:
+                    exact.setdefault((rule.protocol, lo), []).append(rule)
+                else:
+                    ranged.setdefault(rule.protocol, []).append((lo, hi, rule))
+
+        self._buckets = {key: _build_bucket(bucket) for key, bucket in exact.items()}
+        self._ranges = {proto: PortRangeTree(entries) for proto, entries in ranged.items()}
+        self._sizes = {key: len(bucket) for key, bucket in exact.items()}
+        for proto, entries in ranged.items():
+            self._sizes[(proto, "ranges")] = len(entries)
+        self.size = len(rules)
+
+    def bucket_sizes(self):
+        """Number of entries per (protocol, port|None|"ranges") bucket, for diagnostics."""
+        return dict(self._sizes)
+
+    def lookup(self, src_addr, dest_addr, port, protocol):
+        """Return the lowest-id rule matching the packet, or None."""
+        buckets = self._buckets
+        best = None
+        for key in (
+            (protocol, port),
+            (protocol, None),
+            (None, port),
+            (None, None),
+        ):
+            bucket = buckets.get(key)
+            if bucket is not None:
+                best = _probe(bucket, src_addr, dest_addr, best)
+
+        ranges = self._ranges
+        if ranges:
+            for proto in (protocol, None):
+                tree = ranges.get(proto)
+                if tree is not None:
+                    for min_id, bucket in tree.buckets(port):
+                        if best is None or min_id < best.id:
+                            best = _probe(bucket, src_addr, dest_addr, best)
+        return best
@@ -0,0 +1,379 @@
+"""
+Hit-frequency-aware rule ordering for the linear matcher
+
+First-match semantics only pin the relative order of rules that can match the
+same packet and disagree on the action, so the optimizer builds that
+precedence graph (earlier id -> later id for each overlapping, conflicting
+pair) and topologically sorts it, always taking the most frequently hit rule
+that is free to go next. With strict=True every overlapping pair keeps its
+order, so even the reported rule id is unchanged; otherwise same-action
+overlaps may swap, which keeps every decision's action but can attribute a
+packet to another rule of that action.
+
+Plans are cached per rule set version and refreshed in the background as hit
+counts change.
+"""
+import heapq
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import func, select
+
+from models.traffic_rollup import TrafficRollup
+from services.rule_set import get_rule_set, packet_address
+from utils.db import db
+from utils.ip_utils import MAX_IPV4, range_to_prefixes
+from utils.port_utils import MAX_PORT, MIN_PORT
+
+_ANY_RANGE = (0, MAX_IPV4)
+_ANY_PORTS = ((MIN_PORT, MAX_PORT),)
+
+
+def _ranges_overlap(a, b):
+    a = a or _ANY_RANGE
+    b = b or _ANY_RANGE
+    return max(a[0], b[0]) <= min(a[1], b[1])
+
+
+def _ports_overlap(a, b):
+    a = _ANY_PORTS if a is None else a
+    b = _ANY_PORTS if b is None else b
+    i = j = 0
+    while i < len(a) and j < len(b):
+        if max(a[i][0], b[j][0]) <= min(a[i][1], b[j][1]):
+            return True
+        if a[i][1] < b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return False
+
+
+def rules_overlap(a, b):
+    """True if some packet can match both CompiledRules."""
+    return (
+        (a.protocol is None or b.protocol is None or a.protocol == b.protocol)
+        and _ranges_overlap(a.dest, b.dest)
+        and _ports_overlap(a.ports, b.ports)
+        and _ranges_overlap(a.src, b.src)
+    )
+
+
+class _RangeDimension:
+    """
+    One range-valued dimension (an address, or ports) of a set of rules,
+    split into prefix blocks like the rule index does. Two ranges overlap
+    exactly when a block of one contains a block of the other, so candidates
+    for a block come from `blocks` (rules with a block containing it, one
+    probe per populated prefix length) and `within` (rules with a block
+    inside it). Rules that are "any" here sit in a separate wildcard list.
+    """
+
+    __slots__ = ("wildcard", "prefixes", "blocks", "within")
+
+    def __init__(self, rules, key_ranges):
+        # key_ranges: rule -> iterable of (start, end), or None for any
+        self.wildcard = []
+        self.prefixes = {}  # rule id -> its blocks, None if wildcard
+        self.blocks = {}
+        self.within = {}
+        ranged = []
+        for rule in rules:
+            ranges = key_ranges(rule)
+            if ranges is None:
+                self.wildcard.append(rule)
+                self.prefixes[rule.id] = None
+                continue
+            prefixes = self.prefixes[rule.id] = list(_prefixes(ranges))
+            ranged.append((rule, prefixes))
+            for network, prefix_len in prefixes:
+                table = self.blocks.setdefault(prefix_len, {})
+                table.setdefault(network >> (32 - prefix_len), []).append(rule)
+
+        # Queries only ever ask `within` at lengths some block actually has
+        lengths = sorted(self.blocks)
+        for rule, prefixes in ranged:
+            inside = set()
+            for network, prefix_len in prefixes:
+                for length in lengths:
+                    if length > prefix_len:
+                        break
+                    inside.add((length, network >> (32 - length)))
+            for length, key in inside:
+                self.within.setdefault(length, {}).setdefault(key, []).append(rule)
+
+    def candidates(self, rule):
+        """Lists holding every rule overlapping rule here, or None if rule is "any" here."""
+        prefixes = self.prefixes[rule.id]
+        if prefixes is None:
+            return None
+        found = [self.wildcard]
+        for network, prefix_len in prefixes:
+            inside = self.within.get(prefix_len, {}).get(network >> (32 - prefix_len))
+            if inside:
+                found.append(inside)
+            for length, table in self.blocks.items():
+                if length < prefix_len:
+                    containing = table.get(network >> (32 - length))
+                    if containing:
+                        found.append(containing)
+        return found
+
+
+class _ProtocolDimension:
+    """Rules bucketed by protocol, with ANY rules in a wildcard list."""
+
+    __slots__ = ("wildcard", "buckets")
+
+    def __init__(self, rules):
+        self.wildcard = [rule for rule in rules if rule.protocol is None]
+        self.buckets = {}
+        for rule in rules:
+            if rule.protocol is not None:
+                self.buckets.setdefault(rule.protocol, []).append(rule)
+
+    def candidates(self, rule):
+        if rule.protocol is None:
+            return None
+        return [self.wildcard, self.buckets.get(rule.protocol, [])]
+
+
+def _prefixes(ranges):
+    for start, end in ranges:
+        yield from range_to_prefixes(start, end)
+
+
+def _never_matches(rule):
+    return (
+        (rule.src is not None and rule.src[0] > rule.src[1])
+        or (rule.dest is not None and rule.dest[0] > rule.dest[1])
+        or rule.ports == ()
+    )
+
+
+def overlapping_pairs(rules):
+    """
+    Yield (earlier, later) pairs of overlapping rules, each pair once.
+    Protocol, ports, source and destination are each indexed with a wildcard
+    list for rules that are "any" in that dimension. A rule only walks the
+    candidates of its most selective dimension and checks them with
+    rules_overlap, so two rules are compared only if they already overlap
+    there; a rule that is "any" everywhere still meets every other rule.
+    """
+    rules = [rule for rule in rules if not _never_matches(rule)]
+    dimensions = (
+        _ProtocolDimension(rules),
+        # Port ranges are split into blocks of the same 32-bit space as addresses
+        _RangeDimension(rules, lambda r: None if r.ports is None else r.ports),
+        _RangeDimension(rules, lambda r: None if r.src is None else (r.src,)),
+        _RangeDimension(rules, lambda r: None if r.dest is None else (r.dest,)),
+    )
+    for rule in rules:
+        options = [
+            found for found in (dimension.candidates(rule) for dimension in dimensions)
+            if found is not None
+        ]
+        if options:
+            lists = min(options, key=lambda found: sum(map(len, found)))
+        else:
+            lists = [rules]
+        seen = set()
+        for candidates in lists:
+            for other in candidates:
+                if other.id > rule.id and other.id not in seen:
+                    seen.add(other.id)
+                    if rules_overlap(rule, other):
+                        yield rule, other
+
+
+def precedence_graph(rules, strict=False):
+    """{rule_id: set(ids that must stay after it)} for first-match equivalence."""
+    after = {rule.id: set() for rule in rules}
+    for earlier, later in overlapping_pairs(rules):
+        if strict or earlier.action != later.action:
+            after[earlier.id].add(later.id)
+    return after
+
+
+def expected_comparisons(order, hits, misses=0):
+    """
+    Average rules checked per packet by a linear scan in this order: a packet
+    matched by the k-th rule costs k checks, an unmatched one costs len(order).
+    None when there is no traffic to weigh by.
+    """
+    total = sum(hits.get(rule.id, 0) for rule in order) + misses
+    if not total:
+        return None
+    cost = sum(position * hits.get(rule.id, 0) for position, rule in enumerate(order, 1))
+    return (cost + misses * len(order)) / total
+
+
+class OrderPlan:
+    """An optimized scan order for one rule set version."""
+
+    __slots__ = ("version", "order", "strict", "constraints", "before", "after", "computed_at")
+
+    def __init__(self, version, order, strict, constraints, before, after):
+        self.version = version
+        self.order = tuple(order)
+        self.strict = strict
+        self.constraints = constraints
+        self.before = before
+        self.after = after
+        self.computed_at = datetime.utcnow()
+
+    def to_dict(self):
+        id_order = sorted(rule.id for rule in self.order)
+        return {
+            "version": self.version,
+            "strict": self.strict,
+            "rules": len(self.order),
+            "constraints": self.constraints,
+            "moved": sum(1 for a, b in zip(id_order, self.order) if a != b.id),
+            "order": [rule.id for rule in self.order],
+            "expected_comparisons": {
+                "id_order": round(self.before, 3) if self.before is not None else None,
+                "optimized": round(self.after, 3) if self.after is not None else None,
+            },
+            "computed_at": self.computed_at.isoformat(),
+        }
+
+
+def optimize_order(rule_set, hits, misses=0, strict=False):
+    """
+    Kahn's algorithm over the precedence graph, picking the available rule
+    with the most hits (ties: lowest id) at each step.
+    """
+    rules = rule_set.rules
+    after = precedence_graph(rules, strict)
+    indegree = {rule.id: 0 for rule in rules}
+    for successors in after.values():
+        for rule_id in successors:
+            indegree[rule_id] += 1
+
+    by_id = {rule.id: rule for rule in rules}
+    ready = [(-hits.get(rule.id, 0), rule.id) for rule in rules if not indegree[rule.id]]
+    heapq.heapify(ready)
+    order = []
+    while ready:
+        _, rule_id = heapq.heappop(ready)
+        order.append(by_id[rule_id])
+        for successor in after[rule_id]:
+            indegree[successor] -= 1
+            if not indegree[successor]:
+                heapq.heappush(ready, (-hits.get(successor, 0), successor))
+
+    return OrderPlan(
+        rule_set.version,
+        order,
+        strict,
+        sum(len(successors) for successors in after.values()),
+        expected_comparisons(rules, hits, misses),
+        expected_comparisons(order, hits, misses),
+    )
+
+
+def load_frequencies():
+    """(hits per rule id, unmatched packet count) from rule_stats and rollups."""
+    from services.rule_stats import rule_stats_map
+
+    hits = {rule_id: stat["hit_count"] for rule_id, stat in rule_stats_map().items()}
+    misses = db.session.execute(
+        select(func.coalesce(func.sum(TrafficRollup.count), 0)).where(
+            TrafficRollup.bucket == "hour", TrafficRollup.rule_id == 0
+        )
+    ).scalar()
+    return hits, int(misses)
+
+
+class RuleOptimizer:
+
+    def __init__(self, refresh_interval=60.0, strict=False, enabled=False):
+        self.refresh_interval = refresh_interval
+        self.strict = strict
+        self.enabled = enabled
+        self.app = None
+        self.thread = None
+        self.plan = None
+        self._hits = {}
+        self._misses = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def init_app(self, app):
+        self.app = app
+        config = app.config
+        self.enabled = config.get("RULE_MATCHER", "index") == "optimized"
+        self.strict = config.get("RULE_OPTIMIZER_STRICT", self.strict)
+        self.refresh_interval = config.get("RULE_OPTIMIZER_INTERVAL", self.refresh_interval)
+        if self.enabled and not (self.thread and self.thread.is_alive()):
+            self._stop.clear()
+            self.thread = threading.Thread(target=self._run, name="rule-optimizer", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def refresh(self, rule_set=None, reload_frequencies=True):
+        """Recompute the plan (reads hit counts unless reload_frequencies=False)."""
+        if rule_set is None:
+            rule_set = get_rule_set()
+        if reload_frequencies:
+            self._hits, self._misses = load_frequencies()
+        plan = optimize_order(rule_set, self._hits, self._misses, self.strict)
+        with self._lock:
+            self.plan = plan
+        return plan
+
+    def preview(self, strict):
+        """Plan for the current rules with the given strictness, without installing it."""
+        hits, misses = load_frequencies()
+        return optimize_order(get_rule_set(), hits, misses, strict)
+
+    def current_plan(self, rule_set):
+        plan = self.plan
+        return plan if plan is not None and plan.version == rule_set.version else None
+
+    def match(self, rule_set, packet_data):
+        """
+        Linear scan in the optimized order; falls back to the index until a
+        plan exists for this rule set version.
+        """
+        plan = self.current_plan(rule_set)
+        if plan is None:
+            return rule_set.match(packet_data)
+        src_addr = packet_address(packet_data["src_ip"])
+        dest_addr = packet_address(packet_data["dest_ip"])
+        port = packet_data["port"]
+        protocol = packet_data["protocol"]
+        for rule in plan.order:
+            if rule.matches(src_addr, dest_addr, port, protocol):
+                return rule
+        return None
+
+    def _run(self):
+        # Rebuild right away when rules change; refresh frequencies on the interval
+        refreshed_at = 0.0
+        while not self._stop.wait(1.0):
+            try:
+                with self.app.app_context():
+                    rule_set = get_rule_set()
+                    stale = time.monotonic() - refreshed_at >= self.refresh_interval
+                    if stale:
+                        self.refresh(rule_set)
+                        refreshed_at = time.monotonic()
+                    elif self.current_plan(rule_set) is None:
+                        self.refresh(rule_set, reload_frequencies=False)
+            except Exception as e:
+                print(f"⚠️ Rule optimizer refresh failed: {e}")
+
+
+# Process-wide optimizer consulted by the firewall engine
+optimizer = RuleOptimizer()
+
+
+def init_rule_optimizer(app):
+    """Enable the optimized linear matcher when RULE_MATCHER=optimized."""
+    optimizer.init_app(app)
+    return optimizer
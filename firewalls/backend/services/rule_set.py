@@ -0,0 +1,176 @@
+"""
+Compiled, in-memory firewall rule set
+
+The engine never reads the `rules` table on the packet hot path. Instead it
+evaluates against an immutable RuleSet snapshot that is rebuilt and swapped
+in whenever rules change (see reload_rules), tagged with a version counter.
+"""
+import threading
+from collections import namedtuple
+
+from models.rule import Rule
+from services.rule_index import RuleIndex
+from utils.ip_utils import ip_to_int, parse_ip_spec
+from utils.port_utils import parse_port_spec
+
+
+# Outcome of evaluating one packet against a rule set generation; state is the
+# connection tracking state ("NEW" / "ESTABLISHED") or None when untracked
+Decision = namedtuple(
+    "Decision", ["action", "rule_id", "reason", "version", "state"], defaults=(None,)
+)
+
+
+class CompiledRule:
+    """
+    Plain, read-only copy of a Rule row; None means 'match anything'.
+    Addresses are held as inclusive (start, end) integer ranges and ports as a
+    sorted tuple of inclusive (lo, hi) ranges.
+    """
+
+    __slots__ = (
+        "id", "src_ip", "dest_ip", "src", "dest", "ports", "protocol", "action", "reason",
+    )
+
+    def __init__(self, id, src_ip, dest_ip, ports, protocol, action, src=None, dest=None):
+        self.id = id
+        self.src_ip = None if src_ip in (None, "", "any") else src_ip
+        self.dest_ip = None if dest_ip in (None, "", "any") else dest_ip
+        self.src = src if src is not None else _compile_ip(self.src_ip)
+        self.dest = dest if dest is not None else _compile_ip(self.dest_ip)
+        self.ports = _compile_ports(ports)
+        self.protocol = None if protocol in (None, "", "ANY") else protocol
+        self.action = action
+        self.reason = f"Matched rule #{id} ({action})"
+
+    @classmethod
+    def from_model(cls, rule):
+        return cls(
+            rule.id,
+            rule.src_ip,
+            rule.dest_ip,
+            rule.ports if rule.ports else rule.port,
+            (rule.protocol or "ANY").upper(),
+            (rule.action or "ALLOW").upper(),
+            src=_stored_range(rule.src_ip_start, rule.src_ip_end),
+            dest=_stored_range(rule.dest_ip_start, rule.dest_ip_end),
+        )
+
+    def matches(self, src_addr, dest_addr, port, protocol):
+        """Match against integer addresses (None = packet address 'any')."""
+        src, dest = self.src, self.dest
+        return (
+            (src is None or (src_addr is not None and src[0] <= src_addr <= src[1]))
+            and (dest is None or (dest_addr is not None and dest[0] <= dest_addr <= dest[1]))
+            and (self.ports is None or any(lo <= port <= hi for lo, hi in self.ports))
+            and (self.protocol is None or self.protocol == protocol)
+        )
+
+    def __repr__(self):
+        return f"<CompiledRule #{self.id} {self.action}>"
+
+
+# Empty ranges: an unparseable legacy address or port spec never matches a packet
+_NEVER = (1, 0)
+
+
+def _compile_ip(spec):
+    try:
+        return parse_ip_spec(spec)
+    except ValueError:
+        return _NEVER
+
+
+def _compile_ports(spec):
+    try:
+        return parse_port_spec(spec)
+    except (ValueError, TypeError):
+        return ()
+
+
+def _stored_range(start, end):
+    return None if start is None else (start, end)
+
+
+def packet_address(ip):
+    """Integer form of a packet address; None for the legacy 'any' value."""
+    return None if ip == "any" else ip_to_int(ip)
+
+
+class RuleSet:
+    """Immutable snapshot of the rule table, ordered by rule id."""
+
+    __slots__ = ("rules", "version", "index")
+
+    def __init__(self, rules, version):
+        self.rules = tuple(sorted(rules, key=lambda r: r.id))
+        self.version = version
+        self.index = RuleIndex(self.rules)
+
+    def __len__(self):
+        return len(self.rules)
+
+    def match(self, packet_data):
+        """Return the first matching CompiledRule (lowest id) or None."""
+        return self.index.lookup(
+            packet_address(packet_data["src_ip"]),
+            packet_address(packet_data["dest_ip"]),
+            packet_data["port"],
+            packet_data["protocol"],
+        )
+
+    def match_linear(self, packet_data):
+        """Reference first-match scan over every rule; same result as match()."""
+        src_addr = packet_address(packet_data["src_ip"])
+        dest_addr = packet_address(packet_data["dest_ip"])
+        port = packet_data["port"]
+        protocol = packet_data["protocol"]
+        for rule in self.rules:
+            if rule.matches(src_addr, dest_addr, port, protocol):
+                return rule
+        return None
+
+
+# -------------------------------------------------------------
+# ✅ Process-wide current snapshot
+# -------------------------------------------------------------
+_current = None
+_version = 0
+_reload_lock = threading.Lock()
+
+
+def build_rule_set(rules, version):
+    """Compile an iterable of Rule models (or CompiledRules) into a RuleSet."""
+    compiled = [
+        r if isinstance(r, CompiledRule) else CompiledRule.from_model(r)
+        for r in rules
+    ]
+    return RuleSet(compiled, version)
+
+
+def reload_rules():
+    """
+    Rebuild the snapshot from the database and swap it in atomically.
+    Must run inside an app context; call after committing rule changes.
+    """
+    global _current, _version
+    with _reload_lock:
+        rows = Rule.query.order_by(Rule.id.asc()).all()
+        _version += 1
+        rule_set = build_rule_set(rows, _version)
+        _current = rule_set
+    return rule_set
+
+
+def get_rule_set():
+    """Return the current snapshot, loading it on first use."""
+    rule_set = _current
+    if rule_set is None:
+        rule_set = reload_rules()
+    return rule_set
+
+
+def current_version():
+    """Version of the active snapshot (0 if nothing has been loaded yet)."""
+    rule_set = _current
+    return rule_set.version if rule_set is not None else 0
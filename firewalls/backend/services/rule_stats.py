@@ -0,0 +1,228 @@
+"""
+Per-rule hit counters kept in memory and flushed to rule_stats on an interval
+
+decide() calls hit(rule_id) for every match. Each thread bumps its own shard
+(plain dicts, no locks), counters only ever grow, and the flusher upserts
+the difference since the last flush, so nothing on the packet path touches
+the database or waits on another thread.
+"""
+import atexit
+import threading
+import time
+from datetime import datetime
+
+from models.rule_stat import RuleStat
+from utils.db import db
+
+
+class _Shard:
+    __slots__ = ("thread", "counts", "last_hit")
+
+    def __init__(self, thread):
+        self.thread = thread
+        self.counts = {}    # rule_id -> hits since process start
+        self.last_hit = {}  # rule_id -> epoch seconds of the latest hit
+
+
+class RuleHitCounters:
+
+    def __init__(self, flush_interval=5.0):
+        self.flush_interval = flush_interval
+        self.app = None
+        self.thread = None
+        self._local = threading.local()
+        self._shards = []
+        self._shards_lock = threading.Lock()  # registry only, never on the hit path
+        self._flush_lock = threading.Lock()
+        self._flushed = {}  # shard -> {rule_id: count already written}
+        self._stop = threading.Event()
+        self._stats = {"flushes": 0, "rows_written": 0, "failed": 0, "last_flush_ms": None}
+
+    # ---------------------------------------------------------
+    # Hot path
+    # ---------------------------------------------------------
+    def hit(self, rule_id):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._register()
+        counts = shard.counts
+        counts[rule_id] = counts.get(rule_id, 0) + 1
+        shard.last_hit[rule_id] = time.time()
+
+    def _register(self):
+        shard = _Shard(threading.current_thread())
+        with self._shards_lock:
+            self._shards.append(shard)
+        self._local.shard = shard
+        return shard
+
+    # ---------------------------------------------------------
+    # Reading / flushing
+    # ---------------------------------------------------------
+    def _snapshot(self):
+        """Copy every shard; (shard, finished, counts, last_hit) per shard."""
+        with self._shards_lock:
+            shards = list(self._shards)
+        # Check liveness before copying so a finished shard's copy is complete
+        return [
+            (shard, not shard.thread.is_alive(), shard.counts.copy(), shard.last_hit.copy())
+            for shard in shards
+        ]
+
+    def _pending(self, snapshots):
+        pending = {}
+        for shard, _, counts, last_hit in snapshots:
+            flushed = self._flushed.get(shard, {})
+            for rule_id, count in counts.items():
+                delta = count - flushed.get(rule_id, 0)
+                if delta > 0:
+                    total, last = pending.get(rule_id, (0, 0.0))
+                    pending[rule_id] = (total + delta, max(last, last_hit.get(rule_id, 0.0)))
+        return pending
+
+    def pending(self):
+        """Hits counted in memory but not yet written: {rule_id: (count, last_hit_at)}."""
+        return {
+            rule_id: (count, datetime.utcfromtimestamp(last))
+            for rule_id, (count, last) in self._pending(self._snapshot()).items()
+        }
+
+    def flush(self):
+        """Write unflushed hits to rule_stats (needs an app context)."""
+        with self._flush_lock:
+            started = time.perf_counter()
+            snapshots = self._snapshot()
+            pending = self._pending(snapshots)
+            if pending:
+                try:
+                    apply_rule_hits(pending)
+                    db.session.commit()
+                except Exception:
+                    db.session.rollback()
+                    self._stats["failed"] += 1
+                    raise
+                for shard, _, counts, _ in snapshots:
+                    self._flushed[shard] = counts
+                self._stats["flushes"] += 1
+                self._stats["rows_written"] += len(pending)
+                self._stats["last_flush_ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+            # Everything a finished thread counted is now written; forget its shard
+            finished = [shard for shard, done, _, _ in snapshots if done]
+            if finished:
+                with self._shards_lock:
+                    for shard in finished:
+                        self._shards.remove(shard)
+                        self._flushed.pop(shard, None)
+            return len(pending)
+
+    def forget(self, rule_id):
+        """Drop unflushed hits for a deleted rule."""
+        with self._flush_lock:
+            for shard, _, counts, _ in self._snapshot():
+                if rule_id in counts:
+                    self._flushed.setdefault(shard, {})[rule_id] = counts[rule_id]
+
+    def stats(self):
+        stats = dict(self._stats)
+        stats.update({
+            "shards": len(self._shards),
+            "pending_rules": len(self._pending(self._snapshot())),
+            "flush_interval": self.flush_interval,
+        })
+        return stats
+
+    # ---------------------------------------------------------
+    # Lifecycle
+    # ---------------------------------------------------------
+    def init_app(self, app):
+        self.app = app
+        self.flush_interval = app.config.get("RULE_STATS_FLUSH_INTERVAL", self.flush_interval)
+        if self.thread and self.thread.is_alive():
+            return
+        self._stop.clear()
+        self.thread = threading.Thread(target=self._run, name="rule-stats", daemon=True)
+        self.thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        self._stop.set()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=self.flush_interval + 5)
+        self.thread = None
+
+    def _run(self):
+        while True:
+            stopping = self._stop.wait(self.flush_interval)
+            try:
+                with self.app.app_context():
+                    self.flush()
+            except Exception as e:
+                print(f"⚠️ Rule stats flush failed: {e}")
+            if stopping:
+                return
+
+
+def apply_rule_hits(pending):
+    """Upsert {rule_id: (count, last_hit_epoch)} into rule_stats (caller commits)."""
+    rows = [
+        {
+            "rule_id": rule_id,
+            "hit_count": count,
+            "last_hit_at": datetime.utcfromtimestamp(last),
+        }
+        for rule_id, (count, last) in pending.items()
+    ]
+
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        stmt = dialect_insert(RuleStat)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["rule_id"],
+            set_={
+                "hit_count": RuleStat.hit_count + stmt.excluded.hit_count,
+                "last_hit_at": stmt.excluded.last_hit_at,
+            },
+        )
+        db.session.execute(stmt, rows)
+        return
+
+    # Portable fallback
+    for row in rows:
+        stat = db.session.get(RuleStat, row["rule_id"])
+        if stat is None:
+            db.session.add(RuleStat(**row))
+        else:
+            stat.hit_count += row["hit_count"]
+            stat.last_hit_at = row["last_hit_at"]
+
+
+def rule_stats_map(rule_ids=None):
+    """Persisted plus not-yet-flushed hits: {rule_id: {"hit_count", "last_hit_at"}}."""
+    query = RuleStat.query
+    if rule_ids is not None:
+        query = query.filter(RuleStat.rule_id.in_(rule_ids))
+    stats = {
+        stat.rule_id: {"hit_count": stat.hit_count, "last_hit_at": stat.last_hit_at}
+        for stat in query
+    }
+    for rule_id, (count, last) in rule_hits.pending().items():
+        entry = stats.setdefault(rule_id, {"hit_count": 0, "last_hit_at": None})
+        entry["hit_count"] += count
+        if entry["last_hit_at"] is None or last > entry["last_hit_at"]:
+            entry["last_hit_at"] = last
+    return stats
+
+
+# Process-wide counters bumped by the firewall engine
+rule_hits = RuleHitCounters()
+
+
+def init_rule_stats(app):
+    """Start the periodic flusher; call from create_app()."""
+    rule_hits.init_app(app)
+    return rule_hits
@@ -1,89 +1,481 @@
 """
 Real-time packet simulation service (Flask + WebSocket safe)
 Author: Edwin Bwambale
+
+Two modes share one open-loop pacer:
+
+- interval (default): one packet every `interval` seconds, evaluated and
+  published to WebSocket clients like any other packet
+- load: a target rate (packets/sec) of heavy-hitter traffic from
+  utils.mock_data.TrafficMix, optionally spread over worker processes
+
+Open loop means packets are scheduled at start + i/rate whatever the engine
+is doing; a slow engine doesn't slow the generator down, it shows up as
+latency. Latency is measured from a packet's scheduled time to its decision,
+so it includes time spent waiting behind earlier packets. Work that falls
+more than LOADGEN_MAX_LAG seconds behind schedule is dropped (and counted)
+rather than sent late, and so are packets refused by a saturated
+persistence queue.
+
+Sinks (what happens to each packet):
+
+- decide:  firewall_engine.decide() only (no persistence, no clients)
+- process: process_packet(): decide + write-behind persistence
+- publish: process + publish to WebSocket subscribers
+
+Worker processes (workers > 1) only run the decide sink: each gets a copy
+of the current rules and engine settings and evaluates against its own
+decision cache / conntrack table, since SQLite sessions, the persistence
+queue and sockets don't cross process boundaries.
 """
 
+import math
+import multiprocessing
+import queue
 import threading
 import time
 import random
+from collections import Counter
 from datetime import datetime
-from flask import current_app, request, jsonify
-from utils.db import db
+from types import SimpleNamespace
+from flask import current_app
+
+from utils.mock_data import TrafficMix
+
+SINKS = ("decide", "process", "publish")
+
+# Interval mode keeps the old simulator's spread: hosts .1-.254 on each side, uniformly
+INTERVAL_TRAFFIC = {
+    "src_pool": "192.168.1.1-192.168.1.254",
+    "dest_pool": "10.0.0.1-10.0.0.254",
+    "src_hosts": 254,
+    "dest_hosts": 254,
+    "skew": 0,
+}
+
+# Config keys a worker process needs to evaluate packets like the server does
+_ENGINE_CONFIG_PREFIXES = ("DECISION_CACHE", "CONNTRACK", "RATE_LIMIT")
+
+_GROWTH = 1.02  # histogram bucket growth: ~2% resolution
+_LOG_GROWTH = math.log(_GROWTH)
+
+
+class LatencyHistogram:
+    """Log-bucketed latency counts (µs); cheap to record and to merge across processes."""
+
+    def __init__(self, counts=None):
+        self.counts = dict(counts or {})
+        self.total = sum(self.counts.values())
+
+    def record(self, seconds):
+        micros = seconds * 1e6
+        bucket = int(math.log(micros) / _LOG_GROWTH) + 1 if micros > 1 else 0
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.total += 1
+
+    def merge(self, counts):
+        for bucket, count in counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+            self.total += count
+
+    def percentile(self, pct):
+        """Upper bound (ms) of the bucket holding the pct-th percentile."""
+        if not self.total:
+            return None
+        target = self.total * pct / 100
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= target:
+                return round(_GROWTH ** bucket / 1000, 3)
+        return None
+
+
+def _new_report():
+    return {
+        "elapsed": 0.0,
+        "scheduled": 0,
+        "completed": 0,
+        "dropped_lag": 0,
+        "dropped_backpressure": 0,
+        "errors": 0,
+        "max_latency": 0.0,
+        "decisions": {},
+        "latency": {},
+    }
+
+
+def _pace(rate, duration, max_lag, mix, sink, stop, report, report_interval=0.5, chunk=1000):
+    """
+    Open-loop pacer: run packets through sink(packet) -> action at `rate`
+    per second until stop is set or duration runs out. report(snapshot) gets
+    cumulative counters every report_interval seconds and once at the end.
+    """
+    from services.persistence import PersistenceBackpressure
+
+    histogram = LatencyHistogram()
+    decisions = Counter()
+    stats = _new_report()
+    start = time.perf_counter()
+    next_report = start + report_interval
+    sent = 0  # index of the next packet to schedule
+
+    def snapshot(now):
+        stats["elapsed"] = now - start
+        stats["scheduled"] = sent
+        stats["decisions"] = dict(decisions)
+        stats["latency"] = dict(histogram.counts)
+        report(dict(stats))
+
+    while not stop.is_set():
+        now = time.perf_counter()
+        if duration and now - start >= duration:
+            break
+        if now >= next_report:
+            snapshot(now)
+            next_report = now + report_interval
+
+        due = int((now - start) * rate) + 1
+        if duration:
+            due = min(due, int(duration * rate))
+        behind = due - sent
+        if behind <= 0:
+            # Caught up: wait for the next scheduled packet (or the next report);
+            # once the whole run is sent, just sleep towards the deadline
+            if duration and sent >= int(duration * rate):
+                delay = start + duration - now
+            else:
+                delay = start + sent / rate - now
+            stop.wait(min(delay, next_report - now, 0.5))
+            continue
+
+        # Open loop: anything scheduled longer ago than max_lag is given up on
+        oldest_allowed = int((now - max_lag - start) * rate)
+        if sent < oldest_allowed:
+            stats["dropped_lag"] += oldest_allowed - sent
+            sent = oldest_allowed
+            continue
+
+        count = min(behind, chunk)
+        for packet in mix.packets(count):
+            scheduled = start + sent / rate
+            sent += 1
+            try:
+                action = sink(packet)
+            except PersistenceBackpressure:
+                stats["dropped_backpressure"] += 1
+                continue
+            except Exception as e:
+                stats["errors"] += 1
+                print(f"⚠️ Load generator sink failed: {e}")
+                continue
+            latency = time.perf_counter() - scheduled
+            histogram.record(latency)
+            decisions[action] += 1
+            stats["completed"] += 1
+            if latency > stats["max_latency"]:
+                stats["max_latency"] = latency
+
+    if duration and not stop.is_set():
+        # Scheduled before the end but never reached: the engine fell behind
+        missed = int(duration * rate) - sent
+        if missed > 0:
+            stats["dropped_lag"] += missed
+            sent += missed
+    snapshot(time.perf_counter())
+
+
+def _configure_worker_engine(config):
+    """Mirror the server's engine settings in a worker process (no threads, no DB)."""
+    from services.conntrack import conntrack
+    from services.decision_cache import decision_cache
+    from services.rate_limiter import rate_limiter
+
+    app = SimpleNamespace(config=config)
+    decision_cache.init_app(app)
+    conntrack.init_app(app)
+    # Not init_app: that would start the summary thread, which writes to the DB
+    rate_limiter.enabled = config.get("RATE_LIMIT_ENABLED", False)
+    rate_limiter.rate = config.get("RATE_LIMIT_PPS", rate_limiter.rate)
+    rate_limiter.burst = config.get("RATE_LIMIT_BURST", rate_limiter.burst)
+    rate_limiter.subnet_prefix = config.get("RATE_LIMIT_SUBNET_PREFIX") or None
+    rate_limiter.subnet_rate = config.get("RATE_LIMIT_SUBNET_PPS", rate_limiter.subnet_rate)
+    rate_limiter.subnet_burst = config.get("RATE_LIMIT_SUBNET_BURST", rate_limiter.subnet_burst)
+    rate_limiter.max_buckets = config.get("RATE_LIMIT_MAX_BUCKETS", rate_limiter.max_buckets)
+
+
+def _worker_main(worker_id, rate, duration, max_lag, traffic, rules, version, config, stop, reports):
+    """Entry point of a load generator worker process."""
+    from services.firewall_engine import decide
+    from services.rule_set import RuleSet
+
+    _configure_worker_engine(config)
+    rule_set = RuleSet(rules, version)
+    mix = TrafficMix(**traffic)
 
-# Optional import for emitting to WebSocket clients (if you use socketio)
-try:
-    from services.websocket_service import socketio
-except ImportError:
-    socketio = None
+    def sink(packet):
+        return decide(packet, rule_set).action
+
+    _pace(rate, duration, max_lag, mix, sink, stop, lambda stats: reports.put((worker_id, stats)))
 
 
 class PacketSimulator:
-    
+
     def __init__(self, interval=2.0):
         self.interval = interval
         self.is_running = False
         self.thread = None
         self.packet_count = 0
 
-    def start(self):
-        """Start the packet simulation"""
+        self.max_rate = 200000
+        self.max_workers = multiprocessing.cpu_count()
+        self.max_lag = 1.0
+
+        self._lock = threading.Lock()
+        self._stop = None
+        self._processes = []
+        self._reports = {}
+        self._run = None
+
+    def _configure(self, app):
+        config = app.config
+        self.interval = config.get("SIMULATION_INTERVAL", self.interval)
+        self.max_rate = config.get("LOADGEN_MAX_RATE", self.max_rate)
+        self.max_workers = max(int(config.get("LOADGEN_MAX_WORKERS", self.max_workers)), 1)
+        self.max_lag = config.get("LOADGEN_MAX_LAG", self.max_lag)
+
+    def start(self, rate=None, duration=None, workers=1, sink=None, traffic=None):
+        """
+        Start the packet simulation. Without a rate, one packet every
+        `interval` seconds is published to WebSocket clients; with one, the
+        load generator runs at that many packets/sec (see module docstring).
+        Raises ValueError on bad parameters.
+        """
         if self.is_running:
             return "Simulation already running"
 
+        # ✅ Capture the actual Flask app instance (threads need it for app_context)
+        try:
+            app = current_app._get_current_object()
+        except RuntimeError:
+            app = None
+        if app is not None:
+            self._configure(app)
+
+        mode = "interval" if rate is None else "load"
+        rate = 1.0 / self.interval if rate is None else float(rate)
+        sink = sink or ("publish" if mode == "interval" else "decide")
+        workers = int(workers or 1)
+        traffic = dict(traffic or {})
+        if not 0 < rate <= self.max_rate:
+            raise ValueError(f"rate must be between 0 and {self.max_rate} packets/sec")
+        if duration is not None and float(duration) <= 0:
+            raise ValueError("duration must be positive (omit it to run until stopped)")
+        if not 1 <= workers <= self.max_workers:
+            raise ValueError(f"workers must be between 1 and {self.max_workers}")
+        if sink not in SINKS:
+            raise ValueError(f"Unknown sink '{sink}', use one of {', '.join(SINKS)}")
+        if workers > 1 and sink != "decide":
+            raise ValueError("Worker processes only support the 'decide' sink")
+        if mode == "interval":
+            traffic = dict(INTERVAL_TRAFFIC, **traffic)
+        try:
+            mix = TrafficMix(**traffic)
+        except TypeError as e:
+            raise ValueError(f"Invalid traffic options: {e}")
+        duration = float(duration) if duration is not None else None
+
+        with self._lock:
+            self._reports = {}
+            self._run = {
+                "mode": mode,
+                "target_rate": rate,
+                "duration": duration,
+                "workers": workers,
+                "sink": sink,
+                "traffic": mix.describe(),
+                "started_at": datetime.utcnow().isoformat(),
+                "stopped_at": None,
+            }
+        self.packet_count = 0
         self.is_running = True
-        self.thread = threading.Thread(target=self._simulation_loop, daemon=True)
+
+        try:
+            if workers == 1:
+                self._stop = threading.Event()
+                self.thread = threading.Thread(
+                    target=self._simulation_loop, args=(app, rate, duration, mix, sink), daemon=True
+                )
+                self.thread.start()
+            else:
+                self._start_workers(app, rate, duration, workers, traffic)
+        except Exception:
+            self.is_running = False
+            raise
+
+        if mode == "interval":
+            return f"Simulation started with {self.interval}s interval"
+        return f"Load generator started at {rate:g} packets/sec ({workers} worker(s), {sink} sink)"
+
+    def _start_workers(self, app, rate, duration, workers, traffic):
+        """Spawn (not fork: the server is multi-threaded) the worker processes."""
+        from services.rule_set import get_rule_set
+
+        if app is not None:
+            with app.app_context():
+                rule_set = get_rule_set()
+            config = {
+                key: value for key, value in app.config.items()
+                if key.startswith(_ENGINE_CONFIG_PREFIXES)
+            }
+        else:
+            rule_set = get_rule_set()
+            config = {}
+
+        context = multiprocessing.get_context("spawn")
+        self._stop = context.Event()
+        reports = context.Queue()
+        seed = traffic.get("seed")
+        self._processes = []
+        for worker_id in range(workers):
+            worker_traffic = dict(traffic, seed=None if seed is None else seed + worker_id)
+            process = context.Process(
+                target=_worker_main,
+                args=(worker_id, rate / workers, duration, self.max_lag, worker_traffic,
+                      list(rule_set.rules), rule_set.version, config, self._stop, reports),
+                name=f"loadgen-{worker_id}",
+                daemon=True,
+            )
+            process.start()
+            self._processes.append(process)
+        self.thread = threading.Thread(target=self._collect, args=(reports,), daemon=True)
         self.thread.start()
-        return f"Simulation started with {self.interval}s interval"
+
+    def _collect(self, reports):
+        """Gather worker reports until every worker has exited."""
+        while True:
+            try:
+                worker_id, stats = reports.get(timeout=0.5)
+            except queue.Empty:
+                if not any(process.is_alive() for process in self._processes):
+                    break
+                continue
+            self._store_report(worker_id, stats)
+        # Anything still buffered after the last worker exited
+        while True:
+            try:
+                worker_id, stats = reports.get_nowait()
+            except queue.Empty:
+                break
+            self._store_report(worker_id, stats)
+        self._finish()
+
+    def _store_report(self, worker_id, stats):
+        with self._lock:
+            self._reports[worker_id] = stats
+            self.packet_count = sum(report["completed"] for report in self._reports.values())
+
+    def _finish(self):
+        with self._lock:
+            if self._run is not None and self._run["stopped_at"] is None:
+                self._run["stopped_at"] = datetime.utcnow().isoformat()
+        self.is_running = False
 
     def stop(self):
         """Stop the packet simulation"""
         if not self.is_running:
             return "Simulation not running"
 
-        self.is_running = False
+        self._stop.set()
+        for process in self._processes:
+            process.join(timeout=5.0)
         if self.thread:
-            self.thread.join(timeout=1.0)
+            self.thread.join(timeout=5.0)
+        self._processes = []
+        self._finish()
         return "Simulation stopped"
 
     def get_status(self):
-        """Get simulation status"""
-        return {
+        """Get simulation status, with the achieved rate, latency and dropped work of the last run"""
+        status = {
             "is_running": self.is_running,
             "interval": self.interval,
             "packet_count": self.packet_count,
         }
+        with self._lock:
+            run = dict(self._run) if self._run else None
+            reports = list(self._reports.values())
+        if run is None:
+            return status
 
-    def _simulation_loop(self):
-        """Main simulation loop (runs inside Flask app_context)"""
-        protocols = ["TCP", "UDP", "ICMP"]
+        histogram = LatencyHistogram()
+        for report in reports:
+            histogram.merge(report["latency"])
+        elapsed = max((report["elapsed"] for report in reports), default=0.0)
+        completed = sum(report["completed"] for report in reports)
+        decisions = Counter()
+        for report in reports:
+            decisions.update(report["decisions"])
+        run.update({
+            "elapsed": round(elapsed, 3),
+            "scheduled": sum(report["scheduled"] for report in reports),
+            "completed": completed,
+            "achieved_rate": round(completed / elapsed, 1) if elapsed else 0.0,
+            "dropped": {
+                "lag": sum(report["dropped_lag"] for report in reports),
+                "backpressure": sum(report["dropped_backpressure"] for report in reports),
+                "errors": sum(report["errors"] for report in reports),
+            },
+            "latency_ms": {
+                "p50": histogram.percentile(50),
+                "p90": histogram.percentile(90),
+                "p99": histogram.percentile(99),
+                "p999": histogram.percentile(99.9),
+                "max": round(max((report["max_latency"] for report in reports), default=0.0) * 1000, 3),
+            },
+            "decisions": dict(decisions),
+        })
+        status["run"] = run
+        return status
 
-        # ✅ Capture the actual Flask app instance
-        try:
-            app = current_app
-        except RuntimeError:
-            app = None
+    def _simulation_loop(self, app, rate, duration, mix, sink_name):
+        """In-process pacer (runs inside Flask app_context)"""
 
-        while self.is_running:
-            # Generate random packet data
-            packet = {
-                "src_ip": f"192.168.1.{random.randint(1, 254)}",
-                "dest_ip": f"10.0.0.{random.randint(1, 254)}",
-                "port": random.choice([80, 443, 22, 53, 8080]),
-                "protocol": random.choice(protocols),
-                "timestamp": datetime.utcnow().isoformat(),
-            }
+        def report(stats):
+            self._store_report(0, stats)
 
+        try:
             if app:
                 with app.app_context():
-                    print(f"📦 Simulating packet: {packet}")
-                    if socketio:
-                        socketio.emit("PACKET_RESULT", {"packet": packet})
+                    _pace(rate, duration, self.max_lag, mix, self._sink(sink_name), self._stop, report)
             else:
-                print(f"📦 [No Flask Context] Simulated packet: {packet}")
+                print("📦 [No Flask Context] Simulating without an app context")
+                _pace(rate, duration, self.max_lag, mix, self._sink(sink_name), self._stop, report)
+        finally:
+            self._finish()
+
+    @staticmethod
+    def _sink(name):
+        from services.firewall_engine import decide, process_packet
+
+        if name == "decide":
+            return lambda packet: decide(packet).action
+        if name == "process":
+            return lambda packet: process_packet(packet)["log"]["decision"]
 
-            self.packet_count += 1
-            time.sleep(self.interval)
+        from services.websocket_service import publish_result
 
+        def sink(packet):
+            record = process_packet(packet)
+            publish_result({
+                "type": "PACKET_RESULT",
+                "ticket": record["ticket"],
+                "rule_version": record["rule_version"],
+                "packet": record["packet"],
+                "log": record["log"],
+            })
+            return record["log"]["decision"]
+        return sink
 
     def generate_mock_packet(self):
         """Generate a realistic mock packet for simulation"""
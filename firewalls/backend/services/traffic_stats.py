@@ -0,0 +1,179 @@
+"""
+Traffic statistics: incrementally maintained per-minute / per-hour rollups
+
+Every persisted decision bumps the matching (bucket, decision, protocol,
+port, rule) counters in the same transaction as its Log row, so charts read a
+few hundred rollup rows instead of scanning the logs table. Logs written
+before rollups existed (rolled_up IS NULL) are folded in by backfill_rollups.
+"""
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select, update
+
+from models.log import Log
+from models.packet import Packet
+from models.traffic_rollup import TrafficRollup
+from utils.db import db
+
+BUCKETS = {
+    "minute": timedelta(minutes=1),
+    "hour": timedelta(hours=1),
+}
+
+# Startup backfill and the retention job both fold in unrolled logs; only
+# one may do so at a time or the same rows would be counted twice
+_backfill_lock = threading.Lock()
+
+GROUP_COLUMNS = {
+    "decision": TrafficRollup.decision,
+    "protocol": TrafficRollup.protocol,
+    "port": TrafficRollup.port,
+    "rule": TrafficRollup.rule_id,
+}
+
+
+def truncate(timestamp, bucket):
+    if bucket == "hour":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(second=0, microsecond=0)
+
+
+def rollup_counts(records):
+    """
+    Aggregate (timestamp, decision, protocol, port, rule_id, weight) records
+    into a Counter keyed by rollup row, for every bucket size.
+    """
+    counts = Counter()
+    for timestamp, decision, protocol, port, rule_id, weight in records:
+        for bucket in BUCKETS:
+            key = (bucket, truncate(timestamp, bucket), decision, protocol, port, rule_id or 0)
+            counts[key] += weight
+    return counts
+
+
+def apply_rollups(counts):
+    """Upsert aggregated counts in the current transaction (caller commits)."""
+    if not counts:
+        return
+    rows = [
+        {
+            "bucket": bucket,
+            "bucket_start": bucket_start,
+            "decision": decision,
+            "protocol": protocol,
+            "port": port,
+            "rule_id": rule_id,
+            "count": count,
+        }
+        for (bucket, bucket_start, decision, protocol, port, rule_id), count in counts.items()
+    ]
+
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        stmt = dialect_insert(TrafficRollup)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["bucket", "bucket_start", "decision", "protocol", "port", "rule_id"],
+            set_={"count": TrafficRollup.count + stmt.excluded.count},
+        )
+        db.session.execute(stmt, rows)
+        return
+
+    # Portable fallback: update, then insert whatever did not exist yet
+    for row in rows:
+        key = {k: v for k, v in row.items() if k != "count"}
+        updated = db.session.execute(
+            update(TrafficRollup)
+            .filter_by(**key)
+            .values(count=TrafficRollup.count + row["count"])
+        ).rowcount
+        if not updated:
+            db.session.add(TrafficRollup(**row))
+
+
+def traffic_series(start, end, bucket="minute", group_by="decision"):
+    """
+    Rollup counts between start (inclusive) and end (exclusive), one entry per
+    bucket: {"bucket_start", "total", "counts": {group_value: n}}.
+    """
+    group_column = GROUP_COLUMNS[group_by]
+    rows = db.session.execute(
+        select(TrafficRollup.bucket_start, group_column, func.sum(TrafficRollup.count))
+        .where(
+            TrafficRollup.bucket == bucket,
+            TrafficRollup.bucket_start >= truncate(start, bucket),
+            TrafficRollup.bucket_start < end,
+        )
+        .group_by(TrafficRollup.bucket_start, group_column)
+        .order_by(TrafficRollup.bucket_start)
+    ).all()
+
+    series = {}
+    for bucket_start, group_value, count in rows:
+        if group_by == "rule":
+            group_value = group_value or None
+        point = series.setdefault(bucket_start, {"counts": {}, "total": 0})
+        point["counts"][str(group_value)] = int(count)
+        point["total"] += int(count)
+    return [
+        {"bucket_start": bucket_start.isoformat(), **point}
+        for bucket_start, point in sorted(series.items())
+    ]
+
+
+def backfill_rollups(batch_size=1000, max_batches=None):
+    """
+    Fold logs that predate rollups (rolled_up IS NULL) into the rollup table,
+    one small transaction per batch. Returns the number of logs processed.
+    """
+    with _backfill_lock:
+        return _backfill(batch_size, max_batches)
+
+
+def _backfill(batch_size, max_batches):
+    processed = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        rows = db.session.execute(
+            select(
+                Log.id, Log.timestamp, Log.decision, Packet.protocol, Packet.port, Log.rule_id,
+                func.coalesce(Log.weight, 1),
+            )
+            .outerjoin(Packet, Packet.id == Log.packet_id)
+            .where(Log.rolled_up.is_(None))
+            .order_by(Log.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        apply_rollups(rollup_counts(
+            (ts or datetime.utcnow(), decision or "UNKNOWN", protocol or "ANY", port or 0, rule_id, weight)
+            for _, ts, decision, protocol, port, rule_id, weight in rows
+        ))
+        db.session.execute(
+            update(Log).where(Log.id.in_([row[0] for row in rows])).values(rolled_up=True)
+        )
+        db.session.commit()
+        processed += len(rows)
+        batches += 1
+    return processed
+
+
+def init_traffic_stats(app):
+    """Backfill rollups for pre-existing logs in the background."""
+    def run():
+        with app.app_context():
+            try:
+                count = backfill_rollups()
+                if count:
+                    print(f"📊 Backfilled traffic rollups from {count} existing logs")
+            except Exception as e:
+                db.session.rollback()
+                print(f"⚠️ Traffic rollup backfill failed: {e}")
+
+    threading.Thread(target=run, name="rollup-backfill", daemon=True).start()
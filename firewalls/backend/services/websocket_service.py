@@ -9,17 +9,16 @@ import time
 import random
 import json
 from services.packet_parser import parse_packet
-from services.firewall_engine import evaluate_packet
-from models.log import Log
-from models.packet import Packet
-from utils.db import db
+from services.firewall_engine import process_packet
+from services.ws_batcher import result_batcher
+from services.ws_fanout import MODES, fanout
+from services.ws_subscriptions import compile_filter
+from utils.wire_format import ENCODINGS
 
 # -------------------------------------------------------------
 # ✅ Global WebSocket setup
 # -------------------------------------------------------------
 sock = Sock()
-connected_clients = set()
-clients_lock = threading.Lock()
 
 simulation_thread = None
 simulation_running = False
@@ -31,6 +30,8 @@ def init_websocket(app):
     Must be called from app.py inside create_app().
     """
     sock.init_app(app)
+    fanout.init_app(app)
+    result_batcher.init_app(app)
     print("📡 WebSocket initialized on /ws")
     return sock
 
@@ -41,20 +42,18 @@ def init_websocket(app):
 @sock.route("/ws")
 def handle_websocket(ws):
     """Handle new WebSocket connection"""
-    client_id = id(ws)
-    with clients_lock:
-        connected_clients.add(ws)
-        client_count = len(connected_clients)
+    channel = fanout.register(ws)
+    client_count = fanout.client_count()
 
     print(f"📡 Client connected → Total clients: {client_count}")
 
     try:
         # Confirm connection
-        ws.send(json.dumps({
+        send_to_client(ws, {
             "type": "connected",
             "message": "Connected to FirewallX WebSocket",
             "clients": client_count
-        }))
+        })
 
         # Main receive loop
         while True:
@@ -72,9 +71,8 @@ def handle_websocket(ws):
         print(f"❌ WebSocket error: {e}")
 
     finally:
-        with clients_lock:
-            connected_clients.discard(ws)
-            client_count = len(connected_clients)
+        fanout.unregister(channel, reason="disconnected")
+        client_count = fanout.client_count()
         print(f"🔌 Client disconnected → Remaining clients: {client_count}")
 
 
@@ -91,12 +89,51 @@ def handle_websocket_message(ws, data):
         handle_start_simulation()
     elif event_type == "stop_simulation":
         handle_stop_simulation()
+    elif event_type == "subscribe":
+        handle_subscribe(ws, data.get("data") or {})
     elif event_type == "ping_test":
         send_to_client(ws, {"type": "pong_test", "message": "pong"})
     else:
         send_to_client(ws, {"type": "error", "message": "Unknown event type"})
 
 
+def handle_subscribe(ws, options):
+    """
+    Pick raw (one PACKET_RESULT per packet) or batched (PACKET_BATCH) delivery,
+    server-side filters and json or binary packet frames; omitted settings
+    keep their current value
+    """
+    mode = options.get("mode")
+    if mode is not None and mode not in MODES:
+        send_to_client(ws, {"type": "error", "message": f"Unknown mode '{mode}', use one of {', '.join(MODES)}"})
+        return
+    encoding = options.get("encoding")
+    if encoding is not None and encoding not in ENCODINGS:
+        send_to_client(ws, {"type": "error", "message": f"Unknown encoding '{encoding}', use one of {', '.join(ENCODINGS)}"})
+        return
+    try:
+        subscription = compile_filter(options["filters"]) if "filters" in options else None
+    except ValueError as e:
+        send_to_client(ws, {"type": "error", "message": str(e)})
+        return
+
+    channel = fanout.subscribe(ws, mode, subscription, encoding)
+    if channel is None:
+        return
+    reply = {
+        "type": "subscribed",
+        "mode": channel.mode,
+        "encoding": channel.encoding,
+        "filters": channel.subscription.to_dict(),
+    }
+    if channel.mode == "batched":
+        reply.update({
+            "window_ms": round(result_batcher.window * 1000, 1),
+            "max_batch": result_batcher.max_batch,
+        })
+    send_to_client(ws, reply)
+
+
 # -------------------------------------------------------------
 # ✅ Packet Simulation Logic
 # -------------------------------------------------------------
@@ -109,50 +146,21 @@ def handle_simulate_packet(packet_data, ws=None):
             send_to_client(ws, {"type": "error", "message": parsed[0].get_json()["message"]})
             return
 
-        decision, reason = evaluate_packet(parsed)
-
-        # Save to DB
-        packet = Packet(
-            src_ip=parsed["src_ip"],
-            dest_ip=parsed["dest_ip"],
-            port=parsed["port"],
-            protocol=parsed["protocol"],
-            status=decision
-        )
-        db.session.add(packet)
-        db.session.flush()
-
-        log = Log(
-            packet_id=packet.id,
-            decision=decision,
-            reason=reason,
-            rule_id=None
-        )
-        db.session.add(log)
-        db.session.commit()
+        # Decide + persist exactly once; the record is broadcast as-is
+        record = process_packet(parsed)
+        decision = record["log"]["decision"]
+        reason = record["log"]["reason"]
 
         result_data = {
             "type": "PACKET_RESULT",
-            "packet": {
-                "id": packet.id,
-                "src_ip": packet.src_ip,
-                "dest_ip": packet.dest_ip,
-                "port": packet.port,
-                "protocol": packet.protocol,
-                "timestamp": packet.timestamp.isoformat()
-            },
-            "log": {
-                "id": log.id,
-                "packet_id": log.packet_id,
-                "decision": log.decision,
-                "reason": log.reason,
-                "rule_id": log.rule_id,
-                "timestamp": log.timestamp.isoformat()
-            }
+            "ticket": record["ticket"],
+            "rule_version": record["rule_version"],
+            "packet": record["packet"],
+            "log": record["log"],
         }
 
         print(f"📊 Packet decision → {decision}: {reason}")
-        broadcast_message(result_data)
+        publish_result(result_data)
 
     except Exception as e:
         print(f"❌ Packet simulation error: {str(e)}")
@@ -186,17 +194,13 @@ def handle_stop_simulation():
 
 from flask import current_app
 
-def simulation_loop():
+def simulation_loop(app=None):
     """Background random packet generator (Flask context-safe)"""
     protocols = ["TCP", "UDP", "ICMP"]
-
-    try:
-        app = current_app
-    except RuntimeError:
-        app = None
+    interval = app.config.get("SIMULATION_INTERVAL", 2.0) if app else 2.0
 
     while simulation_running:
-        time.sleep(2)
+        time.sleep(interval)
         packet = {
             "src_ip": f"192.168.1.{random.randint(1, 254)}",
             "dest_ip": f"10.0.0.{random.randint(1, 254)}",
@@ -219,7 +223,11 @@ def start_mock_simulation():
     global simulation_thread
     if simulation_thread and simulation_thread.is_alive():
         return
-    simulation_thread = threading.Thread(target=simulation_loop, daemon=True)
+    try:
+        app = current_app._get_current_object()
+    except RuntimeError:
+        app = None
+    simulation_thread = threading.Thread(target=simulation_loop, args=(app,), daemon=True)
     simulation_thread.start()
     print("🚀 Mock packet simulation started")
 
@@ -228,26 +236,17 @@ def start_mock_simulation():
 # ✅ Broadcast + Client Messaging Helpers
 # -------------------------------------------------------------
 def broadcast_message(message):
-    """Send message to all connected clients safely"""
-    message_json = json.dumps(message)
-    disconnected = []
+    """Queue message for every connected client (never blocks on a socket)"""
+    fanout.broadcast(message)
 
-    with clients_lock:
-        for client in list(connected_clients):
-            try:
-                client.send(message_json)
-            except Exception:
-                disconnected.append(client)
 
-        for dead in disconnected:
-            connected_clients.discard(dead)
+def publish_result(result_data):
+    """PACKET_RESULT to matching raw subscribers; batched ones get it in their next PACKET_BATCH"""
+    result_batcher.add(result_data, fanout.publish(result_data))
 
 
 def send_to_client(client, message):
-    """Send message to a specific WebSocket client"""
+    """Queue message for a specific WebSocket client"""
     if not client:
         return
-    try:
-        client.send(json.dumps(message))
-    except Exception:
-        pass
+    fanout.send(client, message)
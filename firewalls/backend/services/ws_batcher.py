@@ -0,0 +1,151 @@
+"""
+Coalesced PACKET_BATCH frames for WebSocket clients in batched mode
+
+Results are gathered for WS_BATCH_WINDOW_MS after the first one arrives (or
+until WS_BATCH_MAX results, whichever comes first) and sent as one frame:
+
+    {
+      "type": "PACKET_BATCH",
+      "window": {"start": ..., "end": ..., "duration_ms": ...},
+      "count": 3,
+      "counters": {
+        "decisions": {"ALLOW": 2, "BLOCK": 1},
+        "protocols": {"TCP": 3},
+        "ports": {"22": 1, "443": 2},
+        "rules": {"4": 1, "none": 2}
+      },
+      "results": [{"ticket": ..., "packet": {...}, "log": {...}}, ...]
+    }
+
+Batched subscribers sharing a filter form one group; each group gets its
+own frame with only the results its filter accepts, built and serialized
+once for all of its members. Results no batched group wants aren't gathered.
+"""
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from services.ws_fanout import fanout
+
+
+def window_counters(results):
+    decisions, protocols, ports, rules = Counter(), Counter(), Counter(), Counter()
+    for result in results:
+        packet, log = result["packet"], result["log"]
+        decisions[log["decision"]] += 1
+        protocols[packet["protocol"]] += 1
+        ports[str(packet["port"])] += 1
+        rules[str(log["rule_id"]) if log.get("rule_id") is not None else "none"] += 1
+    return {
+        "decisions": dict(decisions),
+        "protocols": dict(protocols),
+        "ports": dict(ports),
+        "rules": dict(rules),
+    }
+
+
+class ResultBatcher:
+
+    def __init__(self, window=0.1, max_batch=500):
+        self.window = window
+        self.max_batch = max_batch
+
+        self.thread = None
+        self._cond = threading.Condition()
+        self._pending = []
+        self._ready = []  # full batches cut by add(), waiting for the sender
+        self._window_start = None
+        self._deadline = None
+        self._stats = {"results": 0, "frames": 0, "largest_frame": 0}
+
+    def init_app(self, app):
+        config = app.config
+        self.window = max(config.get("WS_BATCH_WINDOW_MS", self.window * 1000), 1) / 1000
+        self.max_batch = max(int(config.get("WS_BATCH_MAX", self.max_batch)), 1)
+
+    def start(self):
+        with self._cond:
+            if self.thread and self.thread.is_alive():
+                return
+            self.thread = threading.Thread(target=self._run, name="ws-batcher", daemon=True)
+            self.thread.start()
+
+    def add(self, result, subscriptions):
+        """Queue one PACKET_RESULT for the next frame of each matching filter group."""
+        if not subscriptions:
+            return
+        if not (self.thread and self.thread.is_alive()):
+            self.start()
+        with self._cond:
+            if not self._pending:
+                self._window_start = datetime.utcnow()
+                self._deadline = time.monotonic() + self.window
+                self._cond.notify()
+            self._pending.append(
+                ({key: value for key, value in result.items() if key != "type"}, subscriptions)
+            )
+            if len(self._pending) >= self.max_batch:
+                self._ready.append((self._pending, self._window_start))
+                self._pending = []
+                self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._ready:
+                    self._cond.wait()
+                while not self._ready:
+                    remaining = self._deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._ready.append((self._pending, self._window_start))
+                        self._pending = []
+                        break
+                    self._cond.wait(remaining)
+                ready, self._ready = self._ready, []
+            for batch, window_start in ready:
+                try:
+                    self._send(batch, window_start)
+                except Exception as e:
+                    print(f"⚠️ WebSocket batch send failed: {e}")
+
+    def _send(self, batch, window_start):
+        window_end = datetime.utcnow()
+        by_subscription = {}
+        for result, subscriptions in batch:
+            for subscription in subscriptions:
+                by_subscription.setdefault(subscription, []).append(result)
+        for subscription, results in by_subscription.items():
+            self._send_frame(subscription, results, window_start, window_end)
+        with self._cond:
+            self._stats["results"] += len(batch)
+
+    def _send_frame(self, subscription, batch, window_start, window_end):
+        fanout.broadcast_batch(subscription, {
+            "type": "PACKET_BATCH",
+            "window": {
+                "start": window_start.isoformat(),
+                "end": window_end.isoformat(),
+                "duration_ms": round((window_end - window_start).total_seconds() * 1000, 1),
+            },
+            "count": len(batch),
+            "counters": window_counters(batch),
+            "results": batch,
+        })
+        with self._cond:
+            self._stats["frames"] += 1
+            self._stats["largest_frame"] = max(self._stats["largest_frame"], len(batch))
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update({
+                "window_ms": round(self.window * 1000, 1),
+                "max_batch": self.max_batch,
+                "pending": len(self._pending) + sum(len(batch) for batch, _ in self._ready),
+            })
+        return stats
+
+
+# Process-wide batcher feeding batched WebSocket subscribers
+result_batcher = ResultBatcher()
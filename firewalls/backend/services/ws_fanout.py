@@ -0,0 +1,319 @@
+"""
+WebSocket fan-out with per-client send queues
+
+broadcast() serializes a message once, snapshots the client list under the
+lock and appends the payload to every client's bounded outbound queue; it
+never touches a socket. Each client has its own writer thread draining its
+queue, so a slow dashboard only delays itself. When a client's queue is full
+the configured policy applies:
+
+- drop_oldest: the oldest queued message is discarded (and counted), so a
+               lagging client skips ahead instead of falling further behind
+- disconnect:  the client is closed and unregistered
+
+Packet results go through publish(): clients subscribe with a filter (see
+services.ws_subscriptions) and a mode, "raw" (the default) for one
+PACKET_RESULT per matching packet or "batched" for PACKET_BATCH frames from
+services.ws_batcher, and an encoding, "json" (the default) or "binary" (see
+utils.wire_format). Packet data is encoded once per encoding in use, not
+once per client. Other messages are broadcast to everyone as JSON.
+
+Per-client lag (time from broadcast to the send completing), queue depth and
+drop counts are reported by stats().
+"""
+import itertools
+import json
+import threading
+import time
+from collections import deque
+
+from services.ws_subscriptions import MATCH_ALL, Group, SubscriptionIndex
+from utils.wire_format import ENCODINGS, encode_message
+
+POLICIES = ("drop_oldest", "disconnect")
+MODES = ("raw", "batched")
+
+
+class ClientChannel:
+    """One connected client: a bounded queue plus the thread that drains it."""
+
+    __slots__ = (
+        "id", "ws", "queue_size", "policy", "mode", "subscription", "encoding", "connected_at",
+        "closed", "close_reason",
+        "_fanout", "_queue", "_cond", "_thread", "_stats",
+    )
+
+    def __init__(self, client_id, ws, fanout, queue_size, policy):
+        self.id = client_id
+        self.ws = ws
+        self.queue_size = queue_size
+        self.policy = policy
+        self.mode = "raw"
+        self.subscription = MATCH_ALL
+        self.encoding = "json"
+        self.connected_at = time.time()
+        self.closed = False
+        self.close_reason = None
+        self._fanout = fanout
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._stats = {
+            "sent": 0,
+            "dropped": 0,
+            "max_depth": 0,
+            "last_lag_ms": None,
+            "max_lag_ms": 0.0,
+            "lag_total_ms": 0.0,
+        }
+        self._thread = threading.Thread(target=self._run, name=f"ws-writer-{client_id}", daemon=True)
+        self._thread.start()
+
+    def enqueue(self, payload, queued_at=None):
+        """Queue a serialized message; False when the client is (now) closed."""
+        with self._cond:
+            if self.closed:
+                return False
+            if len(self._queue) >= self.queue_size:
+                if self.policy == "disconnect":
+                    self._close_locked("send queue full")
+                    return False
+                self._queue.popleft()
+                self._stats["dropped"] += 1
+            self._queue.append((payload, queued_at or time.monotonic()))
+            self._stats["max_depth"] = max(self._stats["max_depth"], len(self._queue))
+            self._cond.notify()
+        return True
+
+    def close(self, reason="closed"):
+        with self._cond:
+            self._close_locked(reason)
+
+    def _close_locked(self, reason):
+        if self.closed:
+            return
+        self.closed = True
+        self.close_reason = reason
+        self._queue.clear()
+        self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self.closed:
+                    self._cond.wait()
+                if self.closed:
+                    break
+                payload, queued_at = self._queue.popleft()
+            try:
+                self.ws.send(payload)
+            except Exception as e:
+                self.close(f"send failed: {e}")
+                break
+            lag_ms = (time.monotonic() - queued_at) * 1000
+            with self._cond:
+                stats = self._stats
+                stats["sent"] += 1
+                stats["last_lag_ms"] = round(lag_ms, 2)
+                stats["max_lag_ms"] = max(stats["max_lag_ms"], round(lag_ms, 2))
+                stats["lag_total_ms"] += lag_ms
+
+        # Closed by policy or a failed send: make sure the socket goes too
+        if self.close_reason != "disconnected":
+            try:
+                self.ws.close()
+            except Exception:
+                pass
+        self._fanout.unregister(self)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            depth = len(self._queue)
+        lag_total = stats.pop("lag_total_ms")
+        stats.update({
+            "id": self.id,
+            "mode": self.mode,
+            "filters": self.subscription.to_dict(),
+            "encoding": self.encoding,
+            "connected_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(self.connected_at)),
+            "queued": depth,
+            "avg_lag_ms": round(lag_total / stats["sent"], 2) if stats["sent"] else None,
+        })
+        return stats
+
+
+class FanOut:
+
+    def __init__(self, queue_size=256, policy="drop_oldest"):
+        self.queue_size = queue_size
+        self.policy = policy
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._channels = {}  # ws -> ClientChannel
+        self._members = {}   # SubscriptionFilter -> {mode: set of channels}
+        self._mode_counts = dict.fromkeys(MODES, 0)
+        self._index = SubscriptionIndex()
+        self._stats = {
+            "broadcasts": 0,
+            "published": 0,
+            "connected": 0,
+            "disconnected": 0,
+            "slow_disconnects": 0,
+        }
+
+    def init_app(self, app):
+        config = app.config
+        policy = config.get("WS_SLOW_CLIENT_POLICY", self.policy)
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown WS_SLOW_CLIENT_POLICY '{policy}', use one of {', '.join(POLICIES)}")
+        self.policy = policy
+        self.queue_size = max(int(config.get("WS_SEND_QUEUE_SIZE", self.queue_size)), 1)
+
+    # ---------------------------------------------------------
+    # Membership (all under the lock; each change swaps in a new index)
+    # ---------------------------------------------------------
+    def register(self, ws):
+        channel = ClientChannel(next(self._ids), ws, self, self.queue_size, self.policy)
+        with self._lock:
+            self._channels[ws] = channel
+            self._join(channel)
+            self._stats["connected"] += 1
+            self._reindex()
+        return channel
+
+    def unregister(self, channel, reason=None):
+        """Forget a client (idempotent); reason closes its channel first."""
+        if reason is not None:
+            channel.close(reason)
+        with self._lock:
+            if self._channels.get(channel.ws) is not channel:
+                return
+            del self._channels[channel.ws]
+            self._leave(channel)
+            self._stats["disconnected"] += 1
+            if channel.close_reason == "send queue full":
+                self._stats["slow_disconnects"] += 1
+            self._reindex()
+
+    def subscribe(self, ws, mode=None, subscription=None, encoding=None):
+        """
+        Change a client's delivery mode, filter and/or encoding (None keeps
+        the current one). Returns the channel, or None if the client is gone.
+        """
+        if mode is not None and mode not in MODES:
+            raise ValueError(f"Unknown mode '{mode}', use one of {', '.join(MODES)}")
+        if encoding is not None and encoding not in ENCODINGS:
+            raise ValueError(f"Unknown encoding '{encoding}', use one of {', '.join(ENCODINGS)}")
+        with self._lock:
+            channel = self._channels.get(ws)
+            if channel is None:
+                return None
+            self._leave(channel)
+            channel.mode = mode or channel.mode
+            channel.subscription = subscription or channel.subscription
+            channel.encoding = encoding or channel.encoding
+            self._join(channel)
+            self._reindex()
+        return channel
+
+    def _join(self, channel):
+        members = self._members.setdefault(channel.subscription, {mode: set() for mode in MODES})
+        members[channel.mode].add(channel)
+        self._mode_counts[channel.mode] += 1
+
+    def _leave(self, channel):
+        members = self._members[channel.subscription]
+        members[channel.mode].discard(channel)
+        self._mode_counts[channel.mode] -= 1
+        if not any(members.values()):
+            del self._members[channel.subscription]
+
+    def _reindex(self):
+        self._index = SubscriptionIndex(
+            Group(subscription, tuple(members["raw"]), tuple(members["batched"]))
+            for subscription, members in self._members.items()
+        )
+
+    def client_count(self, mode=None):
+        with self._lock:
+            return len(self._channels) if mode is None else self._mode_counts[mode]
+
+    # ---------------------------------------------------------
+    # Sending
+    # ---------------------------------------------------------
+    def broadcast(self, message):
+        """Queue message for every client; returns how many accepted it."""
+        queued_at = time.monotonic()
+        with self._lock:
+            channels = list(self._channels.values())
+            self._stats["broadcasts"] += 1
+        if not channels:
+            return 0
+        payload = message if isinstance(message, str) else json.dumps(message)
+        return sum(channel.enqueue(payload, queued_at) for channel in channels)
+
+    def publish(self, result):
+        """
+        Queue a PACKET_RESULT for raw subscribers whose filter accepts it.
+        Returns the filters of matching groups with batched subscribers, for
+        the batcher.
+        """
+        queued_at = time.monotonic()
+        groups = self._index.match(result["packet"], result["log"])
+        with self._lock:
+            self._stats["published"] += 1
+        raw = [channel for group in groups for channel in group.raw]
+        if raw:
+            self._enqueue_encoded(raw, result, queued_at)
+        return [group.filter for group in groups if group.batched]
+
+    def broadcast_batch(self, subscription, message):
+        """Queue a batched frame for the batched subscribers of one filter."""
+        channels = self._index.members(subscription, "batched")
+        if not channels:
+            return 0
+        return self._enqueue_encoded(channels, message, time.monotonic())
+
+    @staticmethod
+    def _enqueue_encoded(channels, message, queued_at):
+        """Encode message once per encoding the channels use and queue it."""
+        payloads = {}
+        accepted = 0
+        for channel in channels:
+            payload = payloads.get(channel.encoding)
+            if payload is None:
+                payload = payloads[channel.encoding] = encode_message(message, channel.encoding)
+            accepted += channel.enqueue(payload, queued_at)
+        return accepted
+
+    def send(self, ws, message):
+        """Queue message for one client, behind anything already queued for it."""
+        with self._lock:
+            channel = self._channels.get(ws)
+        if channel is None:
+            return False
+        return channel.enqueue(message if isinstance(message, str) else json.dumps(message))
+
+    def stats(self):
+        with self._lock:
+            channels = list(self._channels.values())
+            stats = dict(self._stats)
+            modes = dict(self._mode_counts)
+            groups = len(self._members)
+        clients = [channel.stats() for channel in channels]
+        stats.update({
+            "clients": len(clients),
+            "queue_size": self.queue_size,
+            "policy": self.policy,
+            "modes": modes,
+            "filter_groups": groups,
+            "dropped": sum(client["dropped"] for client in clients),
+            "max_queued": max((client["queued"] for client in clients), default=0),
+            "max_lag_ms": max((client["max_lag_ms"] for client in clients), default=0.0),
+            "per_client": clients,
+        })
+        return stats
+
+
+# Process-wide fan-out used by the WebSocket endpoint
+fanout = FanOut()
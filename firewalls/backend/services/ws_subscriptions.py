@@ -0,0 +1,258 @@
+"""
+Server-side subscription filters for WebSocket clients
+
+A client's subscribe message may carry filters:
+
+    {"decision": "BLOCK", "protocol": ["TCP", "UDP"], "port": "1-1024",
+     "src": "192.168.1.0/24", "dest": ["10.0.0.1", "10.0.1.0/24"], "rule_id": [3, 7]}
+
+Every field is optional; a list means any of its values, and fields combine
+with AND. Ports use the rule port syntax and addresses the rule address
+syntax (single IP, CIDR block or a-b range).
+
+Filters compile once into a hashable SubscriptionFilter, so clients asking
+for the same thing share one group. Every field is indexed on its own:
+decision, protocol and rule id by value, ports in a PortRangeTree and
+addresses in PrefixTables (the structures the rule index uses), each with a
+wildcard set of the groups that don't filter on it. A packet's groups are the
+intersection of its candidates per field, so no filter is ever evaluated
+one by one. The index is immutable and rebuilt on subscription changes
+(rare) so publishing (hot) reads it without a lock.
+"""
+from collections import namedtuple
+
+from services.rule_index import PortRangeTree, PrefixTable
+from utils.ip_utils import int_to_ip, ip_to_int, parse_ip_spec, range_to_prefixes
+from utils.port_utils import format_port_ranges, parse_port_spec
+
+FILTER_FIELDS = ("decision", "protocol", "port", "src", "dest", "rule_id")
+
+
+class SubscriptionFilter(namedtuple(
+    "SubscriptionFilter", ["decisions", "protocols", "ports", "src", "dest", "rule_ids"]
+)):
+    """Compiled filter; None in a field means "any"."""
+
+    __slots__ = ()
+
+    def matches(self, packet, log):
+        """Check one result directly (SubscriptionIndex.match does it for all groups at once)."""
+        if self.decisions is not None and log["decision"] not in self.decisions:
+            return False
+        if self.protocols is not None and packet["protocol"] not in self.protocols:
+            return False
+        if self.ports is not None and not _in_ranges(packet["port"], self.ports):
+            return False
+        if self.src is not None and not _ip_in_ranges(packet["src_ip"], self.src):
+            return False
+        if self.dest is not None and not _ip_in_ranges(packet["dest_ip"], self.dest):
+            return False
+        if self.rule_ids is not None and log.get("rule_id") not in self.rule_ids:
+            return False
+        return True
+
+    def to_dict(self):
+        spec = {}
+        if self.decisions is not None:
+            spec["decision"] = sorted(self.decisions)
+        if self.protocols is not None:
+            spec["protocol"] = sorted(self.protocols)
+        if self.ports is not None:
+            spec["port"] = format_port_ranges(self.ports)
+        for field in ("src", "dest"):
+            ranges = getattr(self, field)
+            if ranges is not None:
+                spec[field] = [_format_range(start, end) for start, end in ranges]
+        if self.rule_ids is not None:
+            spec["rule_id"] = sorted(self.rule_ids)
+        return spec
+
+
+MATCH_ALL = SubscriptionFilter(None, None, None, None, None, None)
+
+
+def _in_ranges(value, ranges):
+    return any(lo <= value <= hi for lo, hi in ranges)
+
+
+def _ip_in_ranges(ip, ranges):
+    try:
+        value = ip_to_int(ip)
+    except ValueError:
+        return False  # "any" or malformed never falls inside a prefix
+    return _in_ranges(value, ranges)
+
+
+def _format_range(start, end):
+    prefixes = range_to_prefixes(start, end)
+    if len(prefixes) == 1:
+        network, length = prefixes[0]
+        return int_to_ip(network) if length == 32 else f"{int_to_ip(network)}/{length}"
+    return f"{int_to_ip(start)}-{int_to_ip(end)}"
+
+
+def _as_list(value):
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+
+def _names(value):
+    names = frozenset(str(item).strip().upper() for item in _as_list(value) if str(item).strip())
+    return names or None
+
+
+def _addresses(value, field):
+    ranges = set()
+    for spec in _as_list(value):
+        try:
+            bounds = parse_ip_spec(spec)
+        except (ValueError, TypeError):
+            raise ValueError(f"Invalid '{field}' address: {spec!r}")
+        if bounds is None:
+            return None  # "any" anywhere in the list matches everything
+        ranges.add(bounds)
+    return tuple(sorted(ranges)) or None
+
+
+def compile_filter(spec):
+    """
+    Build a SubscriptionFilter from a subscribe message's "filters" object.
+    Raises ValueError on unknown fields or malformed values.
+    """
+    if not spec:
+        return MATCH_ALL
+    if not isinstance(spec, dict):
+        raise ValueError("'filters' must be an object")
+    unknown = set(spec) - set(FILTER_FIELDS)
+    if unknown:
+        raise ValueError(
+            f"Unknown filter field(s): {', '.join(sorted(unknown))}; use {', '.join(FILTER_FIELDS)}"
+        )
+
+    def present(field):
+        return spec.get(field) not in (None, "", [])
+
+    try:
+        ports = parse_port_spec(spec["port"]) if present("port") else None
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid 'port' filter: {e}")
+    try:
+        rule_ids = (
+            frozenset(int(item) for item in _as_list(spec["rule_id"]))
+            if present("rule_id") else None
+        )
+    except (ValueError, TypeError):
+        raise ValueError("'rule_id' filter must be an integer or a list of integers")
+
+    return SubscriptionFilter(
+        decisions=_names(spec["decision"]) if present("decision") else None,
+        protocols=_names(spec["protocol"]) if present("protocol") else None,
+        ports=ports,
+        src=_addresses(spec["src"], "src") if present("src") else None,
+        dest=_addresses(spec["dest"], "dest") if present("dest") else None,
+        rule_ids=rule_ids,
+    )
+
+
+# One deduplicated filter and the clients subscribed with it, split by mode
+Group = namedtuple("Group", ["filter", "raw", "batched"])
+
+
+class _ValueField:
+    """Groups by exact value of one field; every value's set includes the wildcards."""
+
+    __slots__ = ("key", "wildcard", "values")
+
+    def __init__(self, filters, allowed, key):
+        self.key = key
+        self.wildcard = frozenset(i for i, f in enumerate(filters) if allowed(f) is None)
+        values = {}
+        for i, f in enumerate(filters):
+            for value in allowed(f) or ():
+                values.setdefault(value, set()).add(i)
+        self.values = {value: self.wildcard.union(found) for value, found in values.items()}
+
+    def candidates(self, packet, log):
+        return self.values.get(self.key(packet, log), self.wildcard)
+
+
+class _PortField:
+    """Groups by port range, in a segment tree."""
+
+    __slots__ = ("wildcard", "tree")
+
+    def __init__(self, filters):
+        self.wildcard = frozenset(i for i, f in enumerate(filters) if f.ports is None)
+        entries = [(lo, hi, i) for i, f in enumerate(filters) for lo, hi in f.ports or ()]
+        self.tree = PortRangeTree(entries, frozenset) if entries else None
+
+    def candidates(self, packet, log):
+        port = packet.get("port")
+        if port is None:
+            return self.wildcard
+        return self.wildcard.union(*self.tree.buckets(port))
+
+
+class _AddressField:
+    """Groups by address range, in a prefix table."""
+
+    __slots__ = ("name", "wildcard", "table")
+
+    def __init__(self, filters, field, name):
+        self.name = name
+        self.wildcard = frozenset(i for i, f in enumerate(filters) if getattr(f, field) is None)
+        grouped = {}
+        for i, f in enumerate(filters):
+            for start, end in getattr(f, field) or ():
+                for network, prefix_len in range_to_prefixes(start, end):
+                    table = grouped.setdefault(prefix_len, {})
+                    table.setdefault(network >> (32 - prefix_len), []).append(i)
+        self.table = PrefixTable.build(grouped, frozenset) if grouped else None
+
+    def candidates(self, packet, log):
+        try:
+            address = ip_to_int(packet[self.name])
+        except ValueError:
+            return self.wildcard  # "any" or malformed never falls inside a prefix
+        return self.wildcard.union(*self.table.values(address))
+
+
+class SubscriptionIndex:
+    """Immutable per-field index over a snapshot of groups."""
+
+    def __init__(self, groups=()):
+        self.groups = {}
+        self._order = []
+        for group in groups:
+            if not group.raw and not group.batched:
+                continue
+            self.groups[group.filter] = group
+            self._order.append(group)
+        filters = [group.filter for group in self._order]
+        fields = (
+            _ValueField(filters, lambda f: f.decisions, lambda packet, log: log["decision"]),
+            _ValueField(filters, lambda f: f.protocols, lambda packet, log: packet["protocol"]),
+            _ValueField(filters, lambda f: f.rule_ids, lambda packet, log: log.get("rule_id")),
+            _PortField(filters),
+            _AddressField(filters, "src", "src_ip"),
+            _AddressField(filters, "dest", "dest_ip"),
+        )
+        # A field nobody filters on accepts every group; skip it
+        self._fields = tuple(f for f in fields if len(f.wildcard) < len(filters))
+
+    def match(self, packet, log):
+        """Groups whose filter accepts this result."""
+        matched = None
+        for field in self._fields:
+            found = field.candidates(packet, log)
+            matched = found if matched is None else matched & found
+            if not matched:
+                return []
+        if matched is None:
+            return list(self._order)
+        return [self._order[i] for i in sorted(matched)]
+
+    def members(self, subscription, mode):
+        group = self.groups.get(subscription)
+        if group is None:
+            return ()
+        return group.batched if mode == "batched" else group.raw
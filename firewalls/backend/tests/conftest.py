@@ -0,0 +1,60 @@
+"""
+Shared fixtures: one app on a throwaway SQLite database per test session
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# Config reads the environment at import time, so point it at a scratch
+# database (and keep the background services quiet) before importing the app
+_TMP_DIR = tempfile.mkdtemp(prefix="firewallx-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMP_DIR, 'firewallx.db')}"
+os.environ.setdefault("RETENTION_ENABLED", "false")
+
+from utils.logger import file_logger  # noqa: E402
+
+file_logger.path = os.path.join(_TMP_DIR, "firewallx.log")
+
+from app import create_app  # noqa: E402
+from models import Log, Packet  # noqa: E402
+from services.persistence import writer  # noqa: E402
+from utils.db import db  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def app():
+    return create_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture(autouse=True)
+def clean_tables(app):
+    """Every test starts with no packets or logs (and nothing left queued)."""
+    writer.flush()
+    with app.app_context():
+        db.session.query(Log).delete()
+        db.session.query(Packet).delete()
+        db.session.commit()
+    yield
+    writer.flush()
+
+
+@pytest.fixture(params=["sync", "async"])
+def persistence_mode(request, app):
+    """Run a test with synchronous writes and again with the write-behind queue."""
+    previous = writer.sync
+    writer.sync = request.param == "sync"
+    if not writer.sync:
+        writer.start()
+    yield request.param
+    writer.flush()
+    writer.sync = previous
@@ -0,0 +1,46 @@
+"""
+Engine setup: the tuned SQLite profile works for file and in-memory URLs
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BOOT = """
+import sys
+from utils.logger import file_logger
+file_logger.path = sys.argv[1]
+
+from app import create_app
+from utils.db import db
+app = create_app()
+with app.app_context():
+    print(db.session.execute(db.text("PRAGMA journal_mode")).scalar())
+response = app.test_client().post("/api/rules/", json={"src_ip": "10.0.0.1", "action": "BLOCK"})
+print(response.status_code)
+"""
+
+
+def boot(url, tmp_path):
+    """(journal mode, POST /api/rules/ status) of a fresh app on `url`."""
+    # Config reads DATABASE_URL at import time, so boot a fresh interpreter
+    env = dict(os.environ, DATABASE_URL=url, SQLITE_PROFILE="tuned")
+    result = subprocess.run(
+        [sys.executable, "-c", BOOT, str(tmp_path / "firewallx.log")],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+    journal_mode, status = result.stdout.strip().splitlines()[-2:]
+    return journal_mode, status
+
+
+def test_tuned_profile_applies_pragmas(tmp_path):
+    assert boot(f"sqlite:///{tmp_path / 'firewallx.db'}", tmp_path) == ("wal", "201")
+
+
+@pytest.mark.parametrize("url", ["sqlite://", "sqlite:///:memory:"])
+def test_app_boots_on_in_memory_sqlite(url, tmp_path):
+    assert boot(url, tmp_path)[1] == "201"
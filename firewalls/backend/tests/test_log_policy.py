@@ -0,0 +1,81 @@
+"""
+Logging policies: sampled and aggregated rows carry the right weights, and
+backpressure never loses aggregated counts or reaches the request
+"""
+import pytest
+
+from services import log_policy as log_policy_module
+from services.log_policy import LogPolicy
+from services.persistence import PersistenceBackpressure
+from services.rule_set import Decision
+
+DECISION = Decision("ALLOW", None, "No matching rule found", 1)
+BLOCKED = Decision("BLOCK", 1, "Matched rule #1 (BLOCK)", 1)
+
+
+@pytest.fixture
+def submitted(monkeypatch):
+    """Fake writer: refuses every submit once `accept` submits have gone through."""
+    calls = {"rows": [], "accept": None}
+
+    class Writer:
+        def submit(self, packet, decision):
+            if calls["accept"] is not None and len(calls["rows"]) >= calls["accept"]:
+                raise PersistenceBackpressure("Write queue full")
+            calls["rows"].append((packet["src_ip"], packet["weight"]))
+
+    monkeypatch.setattr(log_policy_module, "writer", Writer())
+    return calls
+
+
+def packet(n):
+    return {"src_ip": f"10.0.0.{n}", "dest_ip": "10.0.1.1", "port": 80, "protocol": "TCP"}
+
+
+def aggregating(keys, repeat=1, max_keys=1000):
+    policy = LogPolicy(mode="aggregate", max_keys=max_keys)
+    for _ in range(repeat):
+        for n in range(keys):
+            assert policy.admit(packet(n), DECISION) == 0
+    return policy
+
+
+def test_sample_mode_keeps_one_in_n_with_its_weight():
+    policy = LogPolicy(mode="sample", sample_rate=3)
+    assert [policy.admit(packet(0), DECISION) for _ in range(7)] == [3, 0, 0, 3, 0, 0, 3]
+    assert policy.admit(packet(0), BLOCKED) == 1
+
+
+def test_aggregate_rows_carry_their_counts(submitted):
+    policy = aggregating(5, repeat=3)
+    assert policy.admit(packet(0), BLOCKED) == 1
+    assert policy.flush() == 5
+    assert sorted(submitted["rows"]) == [(f"10.0.0.{n}", 3) for n in range(5)]
+    assert policy.stats()["open_aggregates"] == 0
+
+
+def test_backpressure_keeps_unsubmitted_aggregates(submitted):
+    policy = aggregating(5, repeat=3)
+    submitted["accept"] = 2
+    with pytest.raises(PersistenceBackpressure):
+        policy.flush()
+    assert len(submitted["rows"]) == 2
+    assert policy.stats()["open_aggregates"] == 3
+
+    # Counts that arrive while the writer is busy merge with the restored ones
+    policy.admit(packet(4), DECISION)
+    submitted["accept"] = None
+    assert policy.flush() == 3
+    weights = dict(submitted["rows"])
+    assert sum(weights.values()) == 16
+    assert weights["10.0.0.4"] == 4
+    assert policy.stats()["aggregate_rows"] == 5
+
+
+def test_cap_flush_backpressure_does_not_reach_request(submitted):
+    submitted["accept"] = 0
+    policy = aggregating(4, max_keys=2)
+    assert policy.stats()["open_aggregates"] == 4
+    submitted["accept"] = None
+    policy.flush()
+    assert sorted(submitted["rows"]) == [(f"10.0.0.{n}", 1) for n in range(4)]
@@ -0,0 +1,74 @@
+"""
+Log listing: time filters honour UTC offsets, cursors outlive their rows
+"""
+from datetime import datetime, timedelta, timezone
+
+from models.log import Log
+from services.persistence import writer
+from utils.db import db
+
+
+def test_since_with_offset_is_converted_to_utc(client):
+    client.post("/api/packets/simulate", json={
+        "src_ip": "192.168.1.10", "dest_ip": "10.0.0.1", "port": 80, "protocol": "TCP",
+    })
+    writer.flush()
+    an_hour_ago = datetime.now(timezone.utc) - timedelta(hours=1)
+
+    # Same instant written with a +05:00 offset: dropping the offset would put it 5h in the future
+    shifted = an_hour_ago.astimezone(timezone(timedelta(hours=5))).isoformat()
+    logs = client.get("/api/logs/", query_string={"since": shifted}).get_json()["data"]
+    assert len(logs) == 1
+
+    later = (datetime.now(timezone.utc) + timedelta(hours=1)).astimezone(timezone(timedelta(hours=-5)))
+    logs = client.get("/api/logs/", query_string={"since": later.isoformat()}).get_json()["data"]
+    assert logs == []
+
+
+def test_invalid_timestamp_is_rejected(client):
+    response = client.get("/api/logs/", query_string={"since": "yesterday"})
+    assert response.status_code == 400
+
+
+def simulate(client, count):
+    for port in range(count):
+        client.post("/api/packets/simulate", json={
+            "src_ip": "192.168.1.10", "dest_ip": "10.0.0.1", "port": 1000 + port, "protocol": "TCP",
+        })
+    writer.flush()
+
+
+def test_cursor_survives_deletion_of_its_row(app, client):
+    simulate(client, 5)
+    page = client.get("/api/logs/", query_string={"limit": 2}).get_json()
+    cursor = page["meta"]["next_before"]
+    expected = client.get("/api/logs/", query_string={"limit": 2, "before": cursor}).get_json()["data"]
+
+    # Retention removing the cursor row must not invalidate the cursor
+    with app.app_context():
+        Log.query.filter(Log.id == page["data"][-1]["id"]).delete()
+        db.session.commit()
+    response = client.get("/api/logs/", query_string={"limit": 2, "before": cursor})
+    assert response.status_code == 200
+    assert response.get_json()["data"] == expected
+    assert {log["id"] for log in expected}.isdisjoint(log["id"] for log in page["data"])
+
+
+def test_pages_cover_every_log_once(client):
+    simulate(client, 7)
+    seen, cursor = [], None
+    while True:
+        args = {"limit": 3, **({"before": cursor} if cursor else {})}
+        page = client.get("/api/logs/", query_string=args).get_json()
+        seen += [log["id"] for log in page["data"]]
+        cursor = page["meta"]["next_before"]
+        if cursor is None:
+            break
+    assert len(seen) == len(set(seen)) == 7
+
+
+def test_invalid_limit_and_cursor_are_rejected(client):
+    response = client.get("/api/logs/", query_string={"limit": "abc"})
+    assert response.status_code == 400
+    assert response.get_json()["message"] == "limit must be an integer"
+    assert client.get("/api/logs/", query_string={"before": "nope"}).status_code == 400
@@ -0,0 +1,110 @@
+"""
+Every evaluated packet is persisted exactly once (one Packet row, one Log
+row), and the records sent to clients carry the ids of those rows (or null
+ids when the logging policy does not persist the decision).
+"""
+import pytest
+
+from models import Log, Packet
+from services import websocket_service
+from services.log_policy import log_policy
+from services.persistence import writer
+from utils.db import db
+
+PACKETS = [
+    {"src_ip": "192.168.1.10", "dest_ip": "10.0.0.1", "port": 22, "protocol": "TCP"},
+    {"src_ip": "192.168.1.11", "dest_ip": "10.0.0.2", "port": 53, "protocol": "UDP"},
+    {"src_ip": "192.168.1.12", "dest_ip": "10.0.0.3", "port": 443, "protocol": "TCP"},
+]
+
+
+def stored_rows(app):
+    writer.flush()
+    with app.app_context():
+        packets = {packet.id: packet for packet in db.session.query(Packet)}
+        logs = {log.id: log for log in db.session.query(Log)}
+    return packets, logs
+
+
+def assert_one_row_each(app, results):
+    """results: (packet_id, log_id, packet dict, decision) per evaluated packet"""
+    packets, logs = stored_rows(app)
+    assert len(packets) == len(results)
+    assert len(logs) == len(results)
+    for packet_id, log_id, packet, decision in results:
+        assert packet_id is not None and log_id is not None
+        assert packets[packet_id].src_ip == packet["src_ip"]
+        assert packets[packet_id].port == packet["port"]
+        assert logs[log_id].packet_id == packet_id
+        assert logs[log_id].decision == decision
+
+
+def test_rest_simulate_persists_one_row_each(app, client, persistence_mode):
+    results = []
+    for packet in PACKETS:
+        response = client.post("/api/packets/simulate", json=packet)
+        assert response.status_code == 200
+        data = response.get_json()["data"]
+        results.append((data["packet_id"], data["log_id"], packet, data["decision"]))
+
+    assert_one_row_each(app, results)
+
+
+def test_ws_simulate_persists_one_row_each(app, persistence_mode, monkeypatch):
+    published = []
+    monkeypatch.setattr(websocket_service, "publish_result", published.append)
+
+    with app.app_context():
+        for packet in PACKETS:
+            websocket_service.handle_simulate_packet(dict(packet))
+
+    assert len(published) == len(PACKETS)
+    results = []
+    for message, packet in zip(published, PACKETS):
+        assert message["log"]["packet_id"] == message["packet"]["id"]
+        results.append((message["packet"]["id"], message["log"]["id"], packet, message["log"]["decision"]))
+    assert_one_row_each(app, results)
+
+
+
+@pytest.fixture
+def sampled_out(monkeypatch):
+    """Sample policy that skips every packet below (none of them is persisted)."""
+    monkeypatch.setattr(log_policy, "mode", "sample")
+    monkeypatch.setattr(log_policy, "sample_rate", 1000)
+    monkeypatch.setattr(log_policy, "always", set())
+    monkeypatch.setattr(log_policy, "_seen", {"ALLOW": 1, "BLOCK": 1})
+
+
+def assert_nothing_stored(app):
+    packets, logs = stored_rows(app)
+    assert packets == {} and logs == {}
+
+
+def test_rest_simulate_reports_null_ids_when_not_persisted(app, client, sampled_out):
+    for packet in PACKETS:
+        data = client.post("/api/packets/simulate", json=packet).get_json()["data"]
+        assert (data["ticket"], data["packet_id"], data["log_id"]) == (None, None, None)
+    assert_nothing_stored(app)
+
+
+def test_ws_simulate_reports_null_ids_when_not_persisted(app, sampled_out, monkeypatch):
+    published = []
+    monkeypatch.setattr(websocket_service, "publish_result", published.append)
+
+    with app.app_context():
+        for packet in PACKETS:
+            websocket_service.handle_simulate_packet(dict(packet))
+
+    for message in published:
+        assert message["ticket"] is None
+        assert message["packet"]["id"] is None
+        assert message["log"]["id"] is None and message["log"]["packet_id"] is None
+    assert_nothing_stored(app)
+
+
+def test_batch_reports_null_ids_when_not_persisted(app, client, sampled_out):
+    response = client.post("/api/packets/simulate-batch", json=PACKETS)
+    results = response.get_json()["data"]["results"]
+    assert [result["packet_id"] for result in results] == [None] * len(PACKETS)
+    assert_nothing_stored(app)
@@ -0,0 +1,112 @@
+"""
+Write-behind writer: queued decisions are written in batches, a full queue
+pushes back, and failed batches are retried and split before anything is dropped
+"""
+import threading
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from services import firewall_engine
+from services.persistence import PersistenceBackpressure, PersistenceError, WriteBehindWriter
+from services.rule_set import Decision
+
+DECISION = Decision("ALLOW", None, "No matching rule found", 1)
+
+
+@pytest.fixture
+def saved(monkeypatch):
+    """
+    Fake save_results_bulk: fails on a "bad" packet or while `down` is set;
+    waits on `gate` when set.
+    """
+    calls = {"rows": [], "down": 0, "flaky": 0, "writing": threading.Event(), "gate": None}
+
+    def save(packets, decisions):
+        calls["writing"].set()
+        if calls["gate"] is not None:
+            calls["gate"].wait(5)
+        if calls["down"]:
+            raise OperationalError("INSERT", {}, Exception("database is locked"))
+        if any(packet.get("bad") for packet in packets):
+            raise RuntimeError("write failed")
+        if calls["flaky"]:
+            calls["flaky"] -= 1
+            raise RuntimeError("database is locked")
+        calls["rows"].extend(packet["n"] for packet in packets)
+
+    monkeypatch.setattr(firewall_engine, "save_results_bulk", save)
+    return calls
+
+
+def batch(size, bad=()):
+    return [({"n": n, "bad": n in bad}, DECISION) for n in range(size)]
+
+
+def test_queued_decisions_are_written_in_order(saved):
+    writer = WriteBehindWriter(batch_size=4, flush_interval=0.01)
+    writer.start()
+    for packet, decision in batch(10):
+        writer.submit(packet, decision)
+    writer.stop()
+    assert saved["rows"] == list(range(10))
+    assert writer.stats()["written"] == 10
+
+
+def test_full_queue_applies_backpressure(saved):
+    writer = WriteBehindWriter(max_queue=2, batch_size=1, flush_interval=0.01, put_timeout=0.01)
+    saved["gate"] = threading.Event()
+    writer.start()
+    items = batch(4)
+    writer.submit(*items[0])
+    assert saved["writing"].wait(1)  # the worker is now stuck writing packet 0
+    writer.submit(*items[1])
+    writer.submit(*items[2])
+    with pytest.raises(PersistenceBackpressure):
+        writer.submit(*items[3])
+    saved["gate"].set()
+    writer.stop()
+    assert saved["rows"] == [0, 1, 2]
+    assert writer.stats()["rejected"] == 1
+
+
+def test_transient_failure_is_retried(saved):
+    writer = WriteBehindWriter()
+    saved["flaky"] = 1
+    writer._write(batch(10))
+    assert saved["rows"] == list(range(10))
+    assert writer.stats()["failed"] == 1
+    assert writer.stats()["dropped"] == 0
+
+
+def test_bad_row_only_drops_itself(saved):
+    writer = WriteBehindWriter()
+    writer._write(batch(16, bad={5}))
+    assert sorted(saved["rows"]) == [n for n in range(16) if n != 5]
+    assert writer.stats()["dropped"] == 1
+    assert writer.stats()["written"] == 15
+
+
+def test_bad_rows_in_both_halves_only_drop_themselves(saved):
+    writer = WriteBehindWriter()
+    assert writer._write(batch(16, bad={2, 9, 10, 15})) == 4
+    assert sorted(saved["rows"]) == [n for n in range(16) if n not in {2, 9, 10, 15}]
+    assert writer.stats()["dropped"] == 4
+    assert writer.stats()["written"] == 12
+
+
+def test_batch_dropped_at_once_when_database_is_locked(saved):
+    writer = WriteBehindWriter()
+    saved["down"] = 1
+    assert writer._write(batch(500)) == 500
+    stats = writer.stats()
+    assert saved["rows"] == []
+    assert stats["dropped"] == 500
+    assert stats["failed"] == 2  # the attempt and its retry, no bisecting
+
+
+def test_sync_write_failure_is_raised(saved):
+    writer = WriteBehindWriter(sync=True)
+    with pytest.raises(PersistenceError):
+        writer.submit({"n": 1, "bad": True}, DECISION)
+    assert writer.stats()["dropped"] == 1
@@ -0,0 +1,32 @@
+"""
+Port spec parsing: only explicit wildcards mean "any port"
+"""
+import pytest
+
+from utils.port_utils import parse_port_spec
+
+
+@pytest.mark.parametrize("spec", [None, "", "  ", "any", "ANY", "*", "0-65535"])
+def test_wildcards(spec):
+    assert parse_port_spec(spec) is None
+
+
+@pytest.mark.parametrize("spec, expected", [
+    (443, ((443, 443),)),
+    ("443", ((443, 443),)),
+    ("80,443,8000-8100", ((80, 80), (443, 443), (8000, 8100))),
+    ([80, "8000-8100", 81], ((80, 81), (8000, 8100))),
+])
+def test_ports_and_ranges(spec, expected):
+    assert parse_port_spec(spec) == expected
+
+
+@pytest.mark.parametrize("spec", [",", " , ", ",,", [], (), "abc", "70000", "90-80", True])
+def test_empty_or_malformed_specs_are_rejected(spec):
+    with pytest.raises(ValueError):
+        parse_port_spec(spec)
+
+
+def test_rule_with_empty_port_list_is_rejected(client):
+    response = client.post("/api/rules/", json={"port": ",", "action": "BLOCK"})
+    assert response.status_code == 400
@@ -0,0 +1,53 @@
+"""
+Rate limiter: sources get their burst, subnets share a bucket, and settings
+are validated before they are applied
+"""
+import pytest
+from flask import Flask
+
+from services.rate_limiter import RateLimiter
+
+
+def configured(**settings):
+    app = Flask(__name__)
+    app.config.update(RATE_LIMIT_ENABLED=False, **settings)
+    return app
+
+
+@pytest.mark.parametrize("settings", [
+    {"RATE_LIMIT_PPS": 0},
+    {"RATE_LIMIT_PPS": -5},
+    {"RATE_LIMIT_BURST": 0.5},
+    {"RATE_LIMIT_SUBNET_PREFIX": 24, "RATE_LIMIT_SUBNET_PPS": 0},
+    {"RATE_LIMIT_SUBNET_PREFIX": 24, "RATE_LIMIT_SUBNET_BURST": 0},
+    {"RATE_LIMIT_SUBNET_PREFIX": 40},
+])
+def test_invalid_settings_are_rejected(settings):
+    limiter = RateLimiter()
+    with pytest.raises(ValueError):
+        limiter.init_app(configured(**settings))
+    assert (limiter.rate, limiter.burst, limiter.subnet_prefix) == (100.0, 200.0, None)
+
+
+def test_subnet_settings_ignored_without_prefix():
+    limiter = RateLimiter()
+    limiter.init_app(configured(RATE_LIMIT_SUBNET_PPS=0))
+    assert limiter.check({"src_ip": "10.0.0.1", "protocol": "TCP"}) is None
+
+
+def test_burst_then_limited():
+    limiter = RateLimiter()
+    limiter.init_app(configured(RATE_LIMIT_PPS=0.001, RATE_LIMIT_BURST=2))
+    packet = {"src_ip": "10.0.0.1", "protocol": "TCP"}
+    assert [limiter.check(packet) for _ in range(3)] == [None, None, "10.0.0.1"]
+
+
+def test_subnet_bucket_is_shared():
+    limiter = RateLimiter()
+    limiter.init_app(configured(
+        RATE_LIMIT_PPS=0.001, RATE_LIMIT_BURST=10, RATE_LIMIT_SUBNET_PREFIX=24,
+        RATE_LIMIT_SUBNET_PPS=0.001, RATE_LIMIT_SUBNET_BURST=3,
+    ))
+    checks = [limiter.check({"src_ip": f"10.0.0.{n}", "protocol": "TCP"}) for n in range(1, 5)]
+    assert checks == [None, None, None, "10.0.0.0/24"]
+    assert limiter.check({"src_ip": "10.0.1.1", "protocol": "TCP"}) is None
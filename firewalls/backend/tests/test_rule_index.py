@@ -0,0 +1,85 @@
+"""
+The rule index returns exactly what a linear first-match scan returns
+"""
+import random
+
+import pytest
+
+from services.rule_set import CompiledRule, RuleSet
+
+PROTOCOLS = ["TCP", "UDP", "ICMP"]
+
+
+def random_address(rng):
+    choice = rng.random()
+    if choice < 0.25:
+        return "any"
+    if choice < 0.3:
+        return rng.choice(["0.0.0.0/0", "0.0.0.0-255.255.255.255"])
+    if choice < 0.55:
+        return f"10.{rng.randint(0, 3)}.{rng.randint(0, 3)}.{rng.randint(0, 255)}"
+    if choice < 0.8:
+        return f"10.{rng.randint(0, 3)}.{rng.randint(0, 3)}.0/{rng.choice([8, 16, 24, 28])}"
+    low = rng.randint(0, 200)
+    return f"10.{rng.randint(0, 3)}.0.{low}-10.{rng.randint(0, 3)}.3.{rng.randint(low, 255)}"
+
+
+def random_ports(rng):
+    choice = rng.random()
+    if choice < 0.3:
+        return None
+    if choice < 0.6:
+        return rng.choice([22, 53, 80, 443])
+    if choice < 0.8:
+        low = rng.randint(0, 2000)
+        return f"{low}-{rng.randint(low, 9000)}"
+    return f"{rng.choice([22, 80])},{rng.randint(100, 500)}-{rng.randint(500, 1500)},8080"
+
+
+def random_rule(rule_id, rng):
+    return CompiledRule(
+        rule_id, random_address(rng), random_address(rng), random_ports(rng),
+        rng.choice(PROTOCOLS + ["ANY"]), rng.choice(["ALLOW", "BLOCK"]),
+    )
+
+
+def random_packet(rng):
+    def address():
+        if rng.random() < 0.1:
+            return "any"
+        return f"10.{rng.randint(0, 3)}.{rng.randint(0, 3)}.{rng.randint(0, 255)}"
+
+    return {
+        "src_ip": address(),
+        "dest_ip": address(),
+        "port": rng.choice([22, 53, 80, 443, 700, 1200, 5000, 8080, 65000]),
+        "protocol": rng.choice(PROTOCOLS),
+    }
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_index_matches_linear_scan(seed):
+    rng = random.Random(seed)
+    rule_set = RuleSet([random_rule(rule_id, rng) for rule_id in range(1, rng.randint(2, 80))], 1)
+    for _ in range(500):
+        packet = random_packet(rng)
+        assert rule_set.match(packet) is rule_set.match_linear(packet), packet
+
+
+@pytest.mark.parametrize("spec", ["0.0.0.0/0", "0.0.0.0-255.255.255.255"])
+def test_full_range_rule_does_not_match_any_address(spec):
+    """A literal 'any' packet address only meets wildcard rules, as in CompiledRule.matches."""
+    rule_set = RuleSet([
+        CompiledRule(1, spec, "any", None, "ANY", "BLOCK"),
+        CompiledRule(2, "any", spec, None, "ANY", "BLOCK"),
+        CompiledRule(3, "any", "any", None, "ANY", "ALLOW"),
+    ], 1)
+    for src, dest, expected in (
+        ("any", "10.0.0.1", 2),
+        ("10.0.0.1", "any", 1),
+        ("any", "any", 3),
+        ("10.0.0.1", "10.0.0.2", 1),
+    ):
+        packet = {"src_ip": src, "dest_ip": dest, "port": 80, "protocol": "TCP"}
+        assert rule_set.match_linear(packet).id == expected
+        assert rule_set.match(packet).id == expected
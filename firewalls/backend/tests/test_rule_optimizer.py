@@ -0,0 +1,111 @@
+"""
+The optimized scan order keeps first-match results, and overlapping_pairs
+finds exactly the pairs a brute-force comparison finds
+"""
+import itertools
+import random
+
+import pytest
+
+from services.rule_optimizer import optimize_order, overlapping_pairs, rules_overlap
+from services.rule_set import CompiledRule, RuleSet, packet_address
+
+
+def random_rule(rule_id, rng):
+    def address():
+        choice = rng.random()
+        if choice < 0.3:
+            return "any"
+        if choice < 0.6:
+            return f"10.{rng.randint(0, 3)}.{rng.randint(0, 255)}.0/24"
+        if choice < 0.7:
+            return f"10.{rng.randint(0, 3)}.0.0/16"
+        if choice < 0.8:
+            return f"10.0.0.{rng.randint(1, 50)}-10.0.{rng.randint(0, 2)}.{rng.randint(0, 255)}"
+        return f"10.{rng.randint(0, 3)}.{rng.randint(0, 3)}.{rng.randint(0, 255)}"
+
+    choice = rng.random()
+    if choice < 0.3:
+        ports = None
+    elif choice < 0.7:
+        ports = rng.choice([22, 80, 443, 53])
+    elif choice < 0.95:
+        ports = f"{rng.randint(1, 2000)}-{rng.randint(1000, 9000)},{rng.randint(1, 65535)}"
+    else:
+        ports = "9-1"  # unparseable: never matches
+    return CompiledRule(
+        rule_id, address(), address(), ports,
+        rng.choice(["TCP", "UDP", "ICMP", "ANY"]), rng.choice(["ALLOW", "BLOCK"]),
+    )
+
+
+def matchable(rule):
+    return rule.ports != () and all(r is None or r[0] <= r[1] for r in (rule.src, rule.dest))
+
+
+def random_packet(rng):
+    return {
+        "src_ip": f"10.{rng.randint(0, 3)}.{rng.randint(0, 3)}.{rng.randint(0, 255)}",
+        "dest_ip": f"10.{rng.randint(0, 3)}.{rng.randint(0, 3)}.{rng.randint(0, 255)}",
+        "port": rng.choice([22, 53, 80, 443, 1500, 8080]),
+        "protocol": rng.choice(["TCP", "UDP", "ICMP"]),
+    }
+
+
+def first_match(order, packet):
+    src, dest = packet_address(packet["src_ip"]), packet_address(packet["dest_ip"])
+    for rule in order:
+        if rule.matches(src, dest, packet["port"], packet["protocol"]):
+            return rule
+    return None
+
+
+@pytest.mark.parametrize("strict", [False, True])
+@pytest.mark.parametrize("seed", range(20))
+def test_optimized_order_keeps_first_match(seed, strict):
+    rng = random.Random(seed)
+    rule_set = RuleSet([random_rule(rule_id, rng) for rule_id in range(1, rng.randint(2, 120))], 1)
+    hits = {rule.id: rng.randint(0, 1000) for rule in rule_set.rules}
+    plan = optimize_order(rule_set, hits, strict=strict)
+    assert sorted(rule.id for rule in plan.order) == [rule.id for rule in rule_set.rules]
+
+    for _ in range(300):
+        packet = random_packet(rng)
+        expected = rule_set.match_linear(packet)
+        found = first_match(plan.order, packet)
+        if strict:
+            assert found is expected, packet
+        else:
+            # Same-action overlaps may swap: the action holds, the rule may differ
+            assert (found and found.action) == (expected and expected.action), packet
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_matches_brute_force(seed):
+    rng = random.Random(seed)
+    rules = [random_rule(rule_id, rng) for rule_id in range(1, rng.randint(2, 120))]
+
+    found = [(a.id, b.id) for a, b in overlapping_pairs(rules)]
+    expected = sorted(
+        (a.id, b.id) for a, b in itertools.combinations(rules, 2)
+        if matchable(a) and matchable(b) and rules_overlap(a, b)
+    )
+    assert sorted(found) == expected
+    assert len(found) == len(set(found))
+
+
+def test_any_source_rules_are_not_compared_pairwise(monkeypatch):
+    """Rules that share only a wildcard source are never compared."""
+    from services import rule_optimizer
+
+    compared = []
+    original = rule_optimizer.rules_overlap
+    monkeypatch.setattr(
+        rule_optimizer, "rules_overlap", lambda a, b: compared.append(1) or original(a, b)
+    )
+    rules = [
+        CompiledRule(rule_id, "any", f"10.0.{rule_id // 256}.{rule_id % 256}", 80, "TCP", "BLOCK")
+        for rule_id in range(1, 501)
+    ]
+    assert list(overlapping_pairs(rules)) == []
+    assert len(compared) == 0
@@ -0,0 +1,34 @@
+"""
+Compiled rule sets: first match by rule id, wildcard fields, versioned snapshots
+"""
+from services.rule_set import CompiledRule, build_rule_set
+
+
+def packet(src="10.0.0.1", dest="10.0.0.2", port=80, protocol="TCP"):
+    return {"src_ip": src, "dest_ip": dest, "port": port, "protocol": protocol}
+
+
+def test_lowest_matching_id_wins_whatever_the_input_order():
+    rule_set = build_rule_set([
+        CompiledRule(7, "any", "any", None, "ANY", "ALLOW"),
+        CompiledRule(3, "10.0.0.1", "any", 80, "TCP", "BLOCK"),
+        CompiledRule(5, "10.0.0.1", "any", None, "ANY", "ALLOW"),
+    ], 4)
+    assert rule_set.version == 4
+    assert [rule.id for rule in rule_set.rules] == [3, 5, 7]
+    assert rule_set.match(packet()).id == 3
+    assert rule_set.match(packet(port=443)).id == 5
+    assert rule_set.match(packet(src="10.0.0.9")).id == 7
+
+
+def test_empty_and_any_fields_are_wildcards():
+    rule = CompiledRule(1, "", None, None, "ANY", "BLOCK")
+    assert (rule.src_ip, rule.dest_ip, rule.protocol) == (None, None, None)
+    assert build_rule_set([rule], 1).match(packet(port=53, protocol="UDP")) is rule
+
+
+def test_no_matching_rule_returns_none():
+    rule_set = build_rule_set([CompiledRule(1, "10.0.0.1", "10.0.0.2", 22, "TCP", "BLOCK")], 1)
+    assert rule_set.match(packet()) is None
+    assert rule_set.match(packet(port=22)).id == 1
+    assert build_rule_set([], 2).match(packet()) is None
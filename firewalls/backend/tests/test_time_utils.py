@@ -0,0 +1,33 @@
+"""
+Query timestamps are normalised to naive UTC
+"""
+from datetime import datetime
+
+import pytest
+
+from utils.time_utils import parse_time
+
+
+@pytest.mark.parametrize("value", [
+    "2024-05-01T12:00:00",
+    "2024-05-01T12:00:00Z",
+    "2024-05-01T12:00:00+00:00",
+    "2024-05-01T17:30:00+05:30",
+    "2024-05-01T07:00:00-05:00",
+])
+def test_offsets_are_converted_to_utc(value):
+    assert parse_time(value, "since") == datetime(2024, 5, 1, 12, 0)
+
+
+def test_invalid_value_names_the_parameter():
+    with pytest.raises(ValueError, match="'from'"):
+        parse_time("not a time", "from")
+
+
+def test_stats_range_uses_utc(client):
+    response = client.get("/api/stats/traffic", query_string={
+        "from": "2024-05-01T17:00:00+05:00", "to": "2024-05-01T14:00:00+01:00",
+    })
+    assert response.status_code == 200
+    data = response.get_json()["data"]
+    assert (data["from"], data["to"]) == ("2024-05-01T12:00:00", "2024-05-01T13:00:00")
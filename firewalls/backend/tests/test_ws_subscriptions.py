@@ -0,0 +1,64 @@
+"""
+SubscriptionIndex returns exactly the groups whose filter accepts a result
+"""
+import random
+
+import pytest
+
+from services.ws_subscriptions import Group, MATCH_ALL, SubscriptionIndex, compile_filter
+
+
+def random_spec(rng):
+    spec = {}
+    if rng.random() < 0.5:
+        spec["decision"] = rng.sample(["ALLOW", "BLOCK", "RATE_LIMITED"], rng.randint(1, 2))
+    if rng.random() < 0.5:
+        spec["protocol"] = rng.choice(["TCP", "UDP", ["TCP", "ICMP"]])
+    if rng.random() < 0.5:
+        spec["port"] = rng.choice(["22", "80,443", "1-1024", "1000-2000,8080"])
+    if rng.random() < 0.4:
+        spec["src"] = rng.choice(["10.0.0.0/8", "10.1.2.3", ["10.1.0.0/16", "192.168.1.0/24"]])
+    if rng.random() < 0.4:
+        spec["dest"] = rng.choice(["10.0.0.1-10.0.0.100", "172.16.0.0/12", "any"])
+    if rng.random() < 0.3:
+        spec["rule_id"] = rng.choice([1, [2, 3]])
+    return spec
+
+
+def random_result(rng):
+    packet = {
+        "src_ip": rng.choice(["10.1.2.3", "10.9.9.9", "192.168.1.7", "8.8.8.8", "any"]),
+        "dest_ip": rng.choice(["10.0.0.50", "10.0.0.200", "172.16.5.5", "any"]),
+        "port": rng.choice([22, 80, 443, 1500, 8080, 65000]),
+        "protocol": rng.choice(["TCP", "UDP", "ICMP"]),
+    }
+    log = {
+        "decision": rng.choice(["ALLOW", "BLOCK", "RATE_LIMITED"]),
+        "rule_id": rng.choice([None, 1, 2, 3, 4]),
+    }
+    return packet, log
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_index_matches_every_filter_checked_directly(seed):
+    rng = random.Random(seed)
+    filters = {compile_filter(random_spec(rng)) for _ in range(40)} | {MATCH_ALL}
+    groups = [Group(f, ("raw-client",), ()) for f in filters]
+    index = SubscriptionIndex(groups)
+
+    for _ in range(300):
+        packet, log = random_result(rng)
+        expected = {group.filter for group in groups if group.filter.matches(packet, log)}
+        assert {group.filter for group in index.match(packet, log)} == expected
+
+
+def test_empty_groups_are_not_indexed():
+    only_batched = compile_filter({"decision": "BLOCK"})
+    index = SubscriptionIndex([
+        Group(compile_filter({"protocol": "TCP"}), (), ()),
+        Group(only_batched, (), ("batched-client",)),
+    ])
+    packet = {"src_ip": "10.0.0.1", "dest_ip": "10.0.0.2", "port": 80, "protocol": "TCP"}
+    matched = index.match(packet, {"decision": "BLOCK", "rule_id": None})
+    assert [group.filter for group in matched] == [only_batched]
+    assert index.members(only_batched, "batched") == ("batched-client",)
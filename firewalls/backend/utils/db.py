@@ -3,14 +3,62 @@ Database initialization utility
 """
 
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
 
 db = SQLAlchemy()
 
 
+def sqlite_pragma_listener(pragmas):
+    """Build a connect-event handler that applies PRAGMAs to each new connection."""
+    statements = [f"PRAGMA {name}={value}" for name, value in pragmas.items()]
+
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+
+    return apply_pragmas
+
+
+def _is_memory_sqlite(uri):
+    """In-memory SQLite gets a StaticPool (one shared connection) from Flask-SQLAlchemy."""
+    database = make_url(uri).database
+    return database in (None, "", ":memory:") or database.startswith("file::memory:")
+
+
+def _configure_sqlite(app):
+    """Pool sizing for the threads we run (requests, write-behind, simulation)."""
+    if app.config.get("SQLITE_PROFILE", "tuned") != "tuned":
+        return
+    options = app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", {})
+    options.setdefault("connect_args", {}).setdefault("check_same_thread", False)
+    if _is_memory_sqlite(app.config["SQLALCHEMY_DATABASE_URI"]):
+        return  # StaticPool (QueuePool only for files) takes no pool sizing
+    options.setdefault("pool_size", app.config.get("SQLITE_POOL_SIZE", 10))
+    options.setdefault("max_overflow", app.config.get("SQLITE_MAX_OVERFLOW", 10))
+    options.setdefault("pool_timeout", app.config.get("SQLITE_POOL_TIMEOUT", 10))
+
+
 def init_db(app):
     """Attach DB to Flask app."""
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    is_sqlite = app.config.get("SQLALCHEMY_DATABASE_URI", "").startswith("sqlite")
+    if is_sqlite:
+        _configure_sqlite(app)
+
     db.init_app(app)
     with app.app_context():
+        if is_sqlite and app.config.get("SQLITE_PROFILE", "tuned") == "tuned":
+            event.listen(
+                db.engine, "connect",
+                sqlite_pragma_listener(app.config.get("SQLITE_PRAGMAS", {})),
+            )
+
         db.create_all()
 
+        from utils.migrations import run_migrations
+        run_migrations()
@@ -0,0 +1,95 @@
+"""
+IPv4 helpers for rule matching: integer conversion, CIDR and range parsing
+"""
+import ipaddress
+from functools import lru_cache
+
+MAX_IPV4 = 0xFFFFFFFF
+
+
+@lru_cache(maxsize=65536)
+def ip_to_int(ip: str):
+    """Dotted quad -> int. Raises ValueError on malformed input."""
+    parts = ip.split(".")
+    if len(parts) != 4:
+        raise ValueError(f"Invalid IPv4 address: {ip!r}")
+    value = 0
+    for part in parts:
+        if not part.isdigit() or len(part) > 3 or not part.isascii():
+            raise ValueError(f"Invalid IPv4 address: {ip!r}")
+        octet = int(part)
+        if octet > 255:
+            raise ValueError(f"Invalid IPv4 address: {ip!r}")
+        value = (value << 8) | octet
+    return value
+
+
+def int_to_ip(value: int):
+    return str(ipaddress.IPv4Address(value))
+
+
+def is_valid_ip(ip) -> bool:
+    """True for a single, well-formed IPv4 address."""
+    if not isinstance(ip, str):
+        return False
+    try:
+        ip_to_int(ip)
+        return True
+    except (ValueError, TypeError):
+        return False
+
+
+def parse_ip_spec(spec):
+    """
+    Parse a rule address spec into an inclusive (start, end) integer range.
+      "any" / "" / None      -> None (wildcard)
+      "10.0.0.5"             -> single address
+      "10.0.0.0/8"           -> CIDR block
+      "10.0.0.1-10.0.0.50"   -> inclusive range
+    Raises ValueError if the spec is malformed.
+    """
+    if spec is None:
+        return None
+    spec = str(spec).strip()
+    if spec == "" or spec.lower() == "any":
+        return None
+
+    if "/" in spec:
+        network = ipaddress.IPv4Network(spec, strict=False)
+        return int(network.network_address), int(network.broadcast_address)
+
+    if "-" in spec:
+        first, last = (part.strip() for part in spec.split("-", 1))
+        start, end = ip_to_int(first), ip_to_int(last)
+        if start > end:
+            raise ValueError(f"IP range start is after end: {spec}")
+        return start, end
+
+    value = ip_to_int(spec)
+    return value, value
+
+
+def normalize_ip_spec(spec):
+    """Canonical string form of a rule address spec ("10.0.0.0/8", "any", ...)."""
+    bounds = parse_ip_spec(spec)
+    if bounds is None:
+        return "any"
+    start, end = bounds
+    if start == end:
+        return int_to_ip(start)
+    if "/" in str(spec):
+        return str(ipaddress.IPv4Network(str(spec).strip(), strict=False))
+    return f"{int_to_ip(start)}-{int_to_ip(end)}"
+
+
+def range_to_prefixes(start, end):
+    """Split an inclusive integer range into (network_int, prefix_len) blocks."""
+    prefixes = []
+    while start <= end:
+        # Largest aligned block starting at `start` that still fits in the range
+        size = (start & -start) if start else 1 << 32
+        while start + size - 1 > end:
+            size >>= 1
+        prefixes.append((start, 33 - size.bit_length()))
+        start += size
+    return prefixes
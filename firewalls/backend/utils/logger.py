@@ -1,16 +1,248 @@
 """
 Lightweight logging utility
+
+log_event / log_events only format the line and put it on a queue; a
+background thread batches lines into the open log file, flushing when the
+buffer reaches LOG_FLUSH_BYTES or every LOG_FLUSH_INTERVAL seconds, and
+rotates the file by size and/or age (rotated segments optionally gzipped,
+oldest pruned beyond LOG_BACKUP_COUNT). When the queue is full, the "drop"
+policy discards the line and counts it; "block" waits up to
+LOG_BLOCK_TIMEOUT seconds first. Lines keep the "[YYYY-mm-dd HH:MM:SS] message"
+format, stamped when the event is logged rather than when it is written.
 """
+import atexit
+import glob
+import gzip
 import os
+import queue
+import shutil
+import threading
+import time
 from datetime import datetime
 
 LOG_DIR = os.path.join(os.path.dirname(__file__), "../static/logs")
 os.makedirs(LOG_DIR, exist_ok=True)
 LOG_FILE = os.path.join(LOG_DIR, "firewallx.log")
 
+_STOP = object()
+
+
+class BufferedFileLogger:
+
+    def __init__(self, path=LOG_FILE, queue_size=10000, flush_bytes=64 * 1024,
+                 flush_interval=1.0, max_bytes=10 * 1024 * 1024, rotate_interval=None,
+                 backup_count=5, compress=True, policy="drop", block_timeout=1.0):
+        self.path = path
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval
+        self.backup_count = backup_count
+        self.compress = compress
+        self.policy = policy
+        self.block_timeout = block_timeout
+
+        self.thread = None
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._compress_lock = threading.Lock()
+        self._file = None
+        self._opened_at = None
+        self._stats = {"written": 0, "dropped": 0, "flushes": 0, "rotations": 0}
+
+    # ---------------------------------------------------------
+    # Lifecycle
+    # ---------------------------------------------------------
+    def configure(self, config):
+        """Apply LOG_* settings (a Flask config or any mapping)."""
+        self.flush_bytes = config.get("LOG_FLUSH_BYTES", self.flush_bytes)
+        self.flush_interval = config.get("LOG_FLUSH_INTERVAL", self.flush_interval)
+        self.max_bytes = config.get("LOG_MAX_BYTES", self.max_bytes)
+        self.rotate_interval = config.get("LOG_ROTATE_INTERVAL", self.rotate_interval) or None
+        self.backup_count = config.get("LOG_BACKUP_COUNT", self.backup_count)
+        self.compress = config.get("LOG_GZIP", self.compress)
+        self.policy = config.get("LOG_FULL_POLICY", self.policy)
+        self.block_timeout = config.get("LOG_BLOCK_TIMEOUT", self.block_timeout)
+        queue_size = config.get("LOG_QUEUE_SIZE", self._queue.maxsize)
+        if queue_size != self._queue.maxsize and self._queue.empty():
+            self._queue = queue.Queue(maxsize=queue_size)
+
+    def start(self):
+        with self._start_lock:
+            if self.thread and self.thread.is_alive():
+                return
+            self.thread = threading.Thread(target=self._run, name="file-logger", daemon=True)
+            self.thread.start()
+
+    def stop(self, timeout=5.0):
+        """Write out everything queued and close the file."""
+        if self.thread and self.thread.is_alive():
+            try:
+                self._queue.put(_STOP, timeout=timeout)
+            except queue.Full:
+                pass
+            self.thread.join(timeout=timeout)
+        self.thread = None
+
+    def flush(self):
+        """Block until every line queued so far is on disk."""
+        if self.thread and self.thread.is_alive():
+            self._queue.join()
+
+    # ---------------------------------------------------------
+    # Producer side
+    # ---------------------------------------------------------
+    def write_lines(self, lines):
+        if not (self.thread and self.thread.is_alive()):
+            self.start()
+        for line in lines:
+            try:
+                if self.policy == "block":
+                    self._queue.put(line, timeout=self.block_timeout)
+                else:
+                    self._queue.put_nowait(line)
+            except queue.Full:
+                self._bump("dropped")
+
+    # ---------------------------------------------------------
+    # Writer thread
+    # ---------------------------------------------------------
+    def _run(self):
+        buffer, size = [], 0
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                item = None
+
+            stopping = item is _STOP
+            if item is not None and not stopping:
+                buffer.append(item)
+                size += len(item)
+
+            if buffer and (stopping or size >= self.flush_bytes or time.monotonic() >= deadline):
+                self._write(buffer)
+                for _ in buffer:
+                    self._queue.task_done()
+                buffer, size = [], 0
+            if time.monotonic() >= deadline:
+                deadline = time.monotonic() + self.flush_interval
+
+            if stopping:
+                self._queue.task_done()
+                self._close()
+                return
+
+    def _write(self, lines):
+        try:
+            if self._file is None:
+                self._open()
+            elif self._should_rotate():
+                self._rotate()
+            self._file.write("".join(lines))
+            self._file.flush()
+            self._bump("written", len(lines))
+            self._bump("flushes")
+        except OSError as e:
+            self._bump("dropped", len(lines))
+            print(f"⚠️ Log write failed ({len(lines)} lines dropped): {e}")
+            self._close()
+
+    def _open(self):
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._opened_at = time.time()
+
+    def _close(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+        self._file = None
+
+    def _should_rotate(self):
+        if self.max_bytes and self._file.tell() >= self.max_bytes:
+            return True
+        return bool(self.rotate_interval) and time.time() - self._opened_at >= self.rotate_interval
+
+    def _rotate(self):
+        self._close()
+        # Fixed-width stamp, so segment names sort in rotation order
+        rotated = f"{self.path}.{datetime.utcnow():%Y%m%d-%H%M%S-%f}"
+        os.replace(self.path, rotated)
+        self._bump("rotations")
+        self._open()
+        if self.compress:
+            # Compress off the writer thread so logging doesn't stall on gzip
+            threading.Thread(target=self._compress_and_prune, args=(rotated,), daemon=True).start()
+        else:
+            self._prune()
+
+    def _compress_and_prune(self, rotated):
+        with self._compress_lock:
+            if not os.path.exists(rotated):
+                return  # already pruned by a later rotation
+            try:
+                with open(rotated, "rb") as src, gzip.open(rotated + ".gz", "wb") as dst:
+                    shutil.copyfileobj(src, dst)
+                os.remove(rotated)
+            except OSError as e:
+                print(f"⚠️ Log compression failed for {rotated}: {e}")
+            self._prune()
+
+    def _prune(self):
+        segments = sorted(
+            glob.glob(f"{glob.escape(self.path)}.*"),
+            key=lambda path: path[:-3] if path.endswith(".gz") else path,
+        )
+        for path in segments[:-self.backup_count] if self.backup_count else segments:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _bump(self, key, amount=1):
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats.update({
+            "pending": self._queue.qsize(),
+            "capacity": self._queue.maxsize,
+            "policy": self.policy,
+            "worker_alive": bool(self.thread and self.thread.is_alive()),
+        })
+        return stats
+
+
+# Process-wide logger behind log_event / log_events
+file_logger = BufferedFileLogger()
+atexit.register(file_logger.stop)
+
+
+def _stamp():
+    return datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+
 
 def log_event(message: str):
     """Append timestamped log entries."""
-    timestamp = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
-    with open(LOG_FILE, "a") as f:
-        f.write(f"[{timestamp}] {message}\n")
+    file_logger.write_lines([f"[{_stamp()}] {message}\n"])
+
+
+def log_events(messages):
+    """Queue several entries at once (used by batch processing)."""
+    if not messages:
+        return
+    timestamp = _stamp()
+    file_logger.write_lines([f"[{timestamp}] {message}\n" for message in messages])
+
+
+def init_logger(app):
+    """Apply LOG_* settings from the app config and start the writer thread."""
+    file_logger.configure(app.config)
+    file_logger.start()
+    return file_logger
@@ -0,0 +1,94 @@
+"""
+Lightweight in-place schema migrations
+
+db.create_all() only creates missing tables, it never alters existing ones,
+so columns added to models after a database was created are added here.
+Each migration must be idempotent; they all run on every startup.
+"""
+from sqlalchemy import inspect, text
+from utils.db import db
+
+
+def add_missing_columns(table, columns):
+    """ALTER TABLE ... ADD COLUMN for each {name: ddl_type} not yet present."""
+    existing = {c["name"] for c in inspect(db.engine).get_columns(table)}
+    added = []
+    for name, ddl in columns.items():
+        if name not in existing:
+            db.session.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+            added.append(name)
+    if added:
+        db.session.commit()
+        print(f"🛠 Migrated {table}: added {', '.join(added)}")
+    return added
+
+
+def migrate_log_rollup_flag():
+    """Add logs.rolled_up; existing rows stay NULL until the rollup backfill counts them."""
+    add_missing_columns("logs", {"rolled_up": "BOOLEAN"})
+
+
+def migrate_log_weight():
+    """Add logs.weight; NULL on older rows reads as 1."""
+    add_missing_columns("logs", {"weight": "INTEGER DEFAULT 1"})
+
+
+def migrate_rule_ip_ranges():
+    """Add integer IP bounds to rules and backfill them from the string columns."""
+    from models.rule import Rule
+
+    add_missing_columns("rules", {
+        "src_ip_start": "BIGINT",
+        "src_ip_end": "BIGINT",
+        "dest_ip_start": "BIGINT",
+        "dest_ip_end": "BIGINT",
+    })
+
+    pending = Rule.query.filter(
+        db.or_(
+            db.and_(Rule.src_ip_start.is_(None), Rule.src_ip != "any"),
+            db.and_(Rule.dest_ip_start.is_(None), Rule.dest_ip != "any"),
+        )
+    ).all()
+    for rule in pending:
+        try:
+            rule.apply_ip_specs()
+        except ValueError as e:
+            # Leave it as-is; the engine treats an unparseable address as never matching
+            print(f"⚠️ Rule #{rule.id} has an invalid address, skipped: {e}")
+    if pending:
+        db.session.commit()
+
+
+def migrate_rule_port_ranges():
+    """Add the ports column (ranges/sets); existing single-port rows need no backfill."""
+    add_missing_columns("rules", {"ports": "VARCHAR(255)"})
+
+
+def create_missing_indexes():
+    """Create indexes declared on models that older databases don't have yet."""
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {ix["name"] for ix in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=db.engine)
+                print(f"🛠 Migrated {table.name}: created index {index.name}")
+
+
+# Schema-only migrations run first: data backfills query through the ORM,
+# which selects every mapped column, so all columns must exist by then.
+MIGRATIONS = [
+    migrate_rule_port_ranges,
+    migrate_log_rollup_flag,
+    migrate_log_weight,
+    migrate_rule_ip_ranges,
+    create_missing_indexes,
+]
+
+
+def run_migrations():
+    for migration in MIGRATIONS:
+        migration()
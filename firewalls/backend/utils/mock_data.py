@@ -3,6 +3,8 @@ Mock data utilities for simulating network traffic
 """
 import random
 
+from utils.ip_utils import int_to_ip, parse_ip_spec
+
 # Common IP blocks for simulation
 LOCAL_IPS = [
     "192.168.1.10", "192.168.1.22", "10.0.0.5", "10.0.0.8",
@@ -32,3 +34,92 @@ def generate_mock_packet():
 def generate_bulk_packets(n=10):
     """Generate multiple mock packets."""
     return [generate_mock_packet() for _ in range(n)]
+
+
+# -------------------------------------------------------------
+# Heavy-hitter traffic for the load generator
+# -------------------------------------------------------------
+# Most popular first: with a Zipf skew, earlier ports get most of the traffic
+DEFAULT_PORTS = [443, 80, 53, 22, 8080, 123, 3306, 25, 5432, 6379, 3389, 8443]
+
+PROTOCOL_WEIGHTS = {"TCP": 0.8, "UDP": 0.17, "ICMP": 0.03}
+
+
+def host_pool(spec, size, rng=random):
+    """`size` distinct addresses drawn at random from a CIDR block, a-b range or single IP."""
+    bounds = parse_ip_spec(spec)
+    if bounds is None:
+        raise ValueError("Host pools need a CIDR block, range or address, not 'any'")
+    start, end = bounds
+    size = min(int(size), end - start + 1)
+    if size < 1:
+        raise ValueError("Host pools need at least one host")
+    return [int_to_ip(start + offset) for offset in rng.sample(range(end - start + 1), size)]
+
+
+def zipf_cum_weights(n, skew):
+    """Cumulative Zipf weights for n ranks: rank k is drawn with weight 1/k**skew (0 = uniform)."""
+    total = 0.0
+    cum_weights = []
+    for rank in range(1, n + 1):
+        total += 1.0 / rank ** skew
+        cum_weights.append(total)
+    return cum_weights
+
+
+class TrafficMix:
+    """
+    Packets whose sources, destinations and ports follow a Zipf distribution
+    over configurable pools, so a few heavy hitters carry most of the traffic
+    while a long tail shows up now and then. Seeded mixes are reproducible.
+    """
+
+    def __init__(self, src_pool="192.168.0.0/16", src_hosts=1000, dest_pool="10.0.0.0/16",
+                 dest_hosts=200, ports=None, protocols=None, skew=1.1, seed=None):
+        if skew < 0:
+            raise ValueError("skew must be >= 0")
+        self.rng = random.Random(seed)
+        self.skew = skew
+        self.src_pool = src_pool
+        self.dest_pool = dest_pool
+        self.src = host_pool(src_pool, src_hosts, self.rng)
+        self.dest = host_pool(dest_pool, dest_hosts, self.rng)
+        self.ports = list(ports or DEFAULT_PORTS)
+        if any(not 0 <= port <= 65535 for port in self.ports):
+            raise ValueError("Ports must be between 0 and 65535")
+        weights = protocols or PROTOCOL_WEIGHTS
+        if isinstance(weights, (list, tuple)):
+            weights = dict.fromkeys(weights, 1.0)
+        self.protocols = [protocol.upper() for protocol in weights]
+        if any(protocol not in PROTOCOLS for protocol in self.protocols):
+            raise ValueError(f"Protocols must be among {', '.join(PROTOCOLS)}")
+        self.protocol_weights = list(weights.values())
+
+        self._src_cum = zipf_cum_weights(len(self.src), skew)
+        self._dest_cum = zipf_cum_weights(len(self.dest), skew)
+        self._port_cum = zipf_cum_weights(len(self.ports), skew)
+
+    def packets(self, n):
+        rng = self.rng
+        return [
+            {"src_ip": src, "dest_ip": dest, "port": port, "protocol": protocol}
+            for src, dest, port, protocol in zip(
+                rng.choices(self.src, cum_weights=self._src_cum, k=n),
+                rng.choices(self.dest, cum_weights=self._dest_cum, k=n),
+                rng.choices(self.ports, cum_weights=self._port_cum, k=n),
+                rng.choices(self.protocols, weights=self.protocol_weights, k=n),
+            )
+        ]
+
+    def describe(self):
+        return {
+            "src_pool": self.src_pool,
+            "src_hosts": len(self.src),
+            "dest_pool": self.dest_pool,
+            "dest_hosts": len(self.dest),
+            "ports": self.ports,
+            "protocols": dict(zip(self.protocols, self.protocol_weights)),
+            "skew": self.skew,
+            # Share of the busiest source: how heavy the heaviest hitter is
+            "top_src_share": round(self._src_cum[0] / self._src_cum[-1], 4),
+        }
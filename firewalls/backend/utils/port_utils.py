@@ -0,0 +1,74 @@
+"""
+Port spec helpers: single ports, ranges and comma-separated sets
+"""
+
+MIN_PORT = 0
+MAX_PORT = 65535
+
+
+def _parse_port(value):
+    port = int(str(value).strip())
+    if port < MIN_PORT or port > MAX_PORT:
+        raise ValueError(f"Port out of range (0–65535): {value}")
+    return port
+
+
+def _parse_piece(piece):
+    if isinstance(piece, int) and not isinstance(piece, bool):
+        port = _parse_port(piece)
+        return port, port
+    text = str(piece).strip()
+    if "-" in text:
+        first, last = text.split("-", 1)
+        lo, hi = _parse_port(first), _parse_port(last)
+        if lo > hi:
+            raise ValueError(f"Port range start is after end: {text}")
+        return lo, hi
+    port = _parse_port(text)
+    return port, port
+
+
+def parse_port_spec(spec):
+    """
+    Parse a rule port spec into a sorted tuple of inclusive (lo, hi) ranges.
+      None / "" / "any" / "*" -> None (wildcard)
+      443 / "443"             -> ((443, 443),)
+      "1024-65535"            -> ((1024, 65535),)
+      "80,443,8000-8100"      -> ((80, 80), (443, 443), (8000, 8100))
+      [80, "8000-8100"]       -> same as above
+    Overlapping and adjacent ranges are merged; 0-65535 collapses to None.
+    Raises ValueError if the spec is malformed, including a list with no
+    ports in it ("," or []): that must never widen to "all ports".
+    """
+    if spec is None:
+        return None
+    if isinstance(spec, bool):
+        raise ValueError("Port must be an integer, range or list")
+    if isinstance(spec, str):
+        text = spec.strip()
+        if text == "" or text.lower() in ("any", "*"):
+            return None
+        pieces = [p for p in text.split(",") if p.strip()]
+    elif isinstance(spec, (list, tuple)):
+        pieces = list(spec)
+    else:
+        pieces = [spec]
+    if not pieces:
+        raise ValueError("Port list is empty")
+
+    merged = []
+    for lo, hi in sorted(_parse_piece(p) for p in pieces):
+        if merged and lo <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], hi))
+        else:
+            merged.append((lo, hi))
+    if merged == [(MIN_PORT, MAX_PORT)]:
+        return None
+    return tuple(merged)
+
+
+def format_port_ranges(ranges):
+    """Inverse of parse_port_spec: ((80, 80), (1000, 2000)) -> "80,1000-2000"."""
+    if ranges is None:
+        return "any"
+    return ",".join(str(lo) if lo == hi else f"{lo}-{hi}" for lo, hi in ranges)
@@ -5,8 +5,11 @@ Unified API response helper
 from flask import jsonify
 
 
-def success_response(message: str, data=None, code=200):
-    return jsonify({"status": "success", "message": message, "data": data}), code
+def success_response(message: str, data=None, code=200, meta=None):
+    body = {"status": "success", "message": message, "data": data}
+    if meta is not None:
+        body["meta"] = meta
+    return jsonify(body), code
 
 
 def error_response(message: str, code=400, error=None):
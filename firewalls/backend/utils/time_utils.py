@@ -0,0 +1,19 @@
+"""
+Timestamp helpers for query parameters
+"""
+from datetime import datetime, timezone
+
+
+def parse_time(value, name):
+    """
+    ISO 8601 -> naive UTC datetime, the form timestamps are stored in.
+    A UTC offset ("Z", "+05:00") is converted, not dropped; naive values
+    are taken as UTC. Raises ValueError naming the parameter on bad input.
+    """
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError(f"Invalid '{name}' timestamp, expected ISO 8601")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
@@ -0,0 +1,328 @@
+"""
+Compact binary encoding for packet results (the JSON alternative)
+
+Every frame starts with the same header, then a kind-specific header, a
+string table and fixed-size records. All integers are big-endian:
+
+    header    "FX", version u8, kind u8, record count u32
+    kind 1    PACKET_RESULT   (no extra header, one result record)
+    kind 2    PACKET_BATCH    window start i64, window end i64 (epoch µs)
+    kind 3    BATCH_RESPONSE  rule_version u32, received u32, errors u32, elapsed µs u64
+    strings   count u16, then per string: length u16 + UTF-8 bytes
+    records   result records (kinds 1, 2) or batch records then error records (kind 3)
+
+    result record (56 bytes)
+        ticket i64, packet_id i64, log_id i64, timestamp i64 (epoch µs), rule_version u32,
+        src_ip u32, dest_ip u32, rule_id i32, reason u16, port u16,
+        protocol u8, decision u8, flow_state u8, flags u8
+    batch record (20 bytes)
+        index u32, packet_id i64, rule_id i32, reason u16, decision u8, flow_state u8
+    error record (6 bytes)
+        index u32, message u16
+
+Missing ids are -1 (rule_version 0xFFFFFFFF, reason 0xFFFF). Addresses are
+IPv4 integers; flags bit 0/1 mark a source/destination of "any". protocol,
+flow_state and decision are indexes into PROTOCOLS, FLOW_STATES and
+DECISIONS; a decision outside DECISIONS (a custom rule action) is encoded
+as len(DECISIONS) + its index in the frame's string table. Reasons and error
+messages are string-table indexes, so a frame spells each distinct text once.
+
+PACKET_BATCH frames don't carry the JSON counters; they are derivable from
+the records. decode() turns any frame back into the dicts the JSON encoding
+sends.
+"""
+import json
+import struct
+from datetime import datetime, timedelta
+
+from utils.ip_utils import int_to_ip, ip_to_int
+
+ENCODINGS = ("json", "binary")
+BINARY_MIMETYPE = "application/vnd.firewallx.packets"
+
+MAGIC = b"FX"
+VERSION = 1
+KIND_RESULT, KIND_BATCH, KIND_BATCH_RESPONSE = 1, 2, 3
+
+PROTOCOLS = ("TCP", "UDP", "ICMP", "ANY")
+DECISIONS = ("ALLOW", "BLOCK", "RATE_LIMITED")
+FLOW_STATES = (None, "NEW", "ESTABLISHED")
+
+FLAG_SRC_ANY = 0x01
+FLAG_DEST_ANY = 0x02
+
+NO_ID = -1
+NO_VERSION = 0xFFFFFFFF
+NO_STRING = 0xFFFF
+
+HEADER = struct.Struct("!2sBBI")
+BATCH_HEADER = struct.Struct("!qq")
+BATCH_RESPONSE_HEADER = struct.Struct("!IIIQ")
+RESULT_RECORD = struct.Struct("!qqqqIIIiHHBBBB")
+BATCH_RECORD = struct.Struct("!IqiHBB")
+ERROR_RECORD = struct.Struct("!IH")
+STRING_LENGTH = struct.Struct("!H")
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+_PROTOCOL_CODES = {name: code for code, name in enumerate(PROTOCOLS)}
+_DECISION_CODES = {name: code for code, name in enumerate(DECISIONS)}
+_FLOW_STATE_CODES = {name: code for code, name in enumerate(FLOW_STATES)}
+
+
+class _StringTable:
+    """Per-frame deduplicated strings, referenced by index."""
+
+    def __init__(self):
+        self.index = {}
+
+    def add(self, text):
+        if text is None:
+            return NO_STRING
+        code = self.index.get(text)
+        if code is None:
+            code = len(self.index)
+            if code >= NO_STRING:
+                raise ValueError("Too many distinct strings in one frame")
+            self.index[text] = code
+        return code
+
+    def pack(self):
+        parts = [STRING_LENGTH.pack(len(self.index))]
+        for text in self.index:
+            data = text.encode("utf-8")
+            parts.append(STRING_LENGTH.pack(len(data)))
+            parts.append(data)
+        return b"".join(parts)
+
+
+def _micros(timestamp):
+    """ISO timestamp (naive UTC, as the engine emits it) -> epoch µs."""
+    return (datetime.fromisoformat(timestamp) - _EPOCH) // _MICROSECOND
+
+
+def _isoformat(micros):
+    return (_EPOCH + timedelta(microseconds=micros)).isoformat()
+
+
+def _address(ip):
+    return (0, True) if ip == "any" else (ip_to_int(ip), False)
+
+
+def _id(value):
+    return NO_ID if value is None else value
+
+
+def _decision_code(decision, strings):
+    code = _DECISION_CODES.get(decision)
+    if code is None:
+        code = len(DECISIONS) + strings.add(decision)
+        if code > 0xFF:
+            raise ValueError("Too many custom decisions in one frame")
+    return code
+
+
+def _pack_result(result, strings):
+    packet, log = result["packet"], result["log"]
+    src, src_any = _address(packet["src_ip"])
+    dest, dest_any = _address(packet["dest_ip"])
+    version = result.get("rule_version")
+    return RESULT_RECORD.pack(
+        _id(result.get("ticket")),
+        _id(packet.get("id")),
+        _id(log.get("id")),
+        _micros(packet["timestamp"]),
+        NO_VERSION if version is None else version,
+        src,
+        dest,
+        _id(log.get("rule_id")),
+        strings.add(log.get("reason")),
+        packet["port"],
+        _PROTOCOL_CODES[packet["protocol"]],
+        _decision_code(log["decision"], strings),
+        _FLOW_STATE_CODES[packet.get("flow_state")],
+        (FLAG_SRC_ANY if src_any else 0) | (FLAG_DEST_ANY if dest_any else 0),
+    )
+
+
+def _frame(kind, count, kind_header, strings, records):
+    return b"".join((HEADER.pack(MAGIC, VERSION, kind, count), kind_header, strings.pack(), *records))
+
+
+def encode_result(result):
+    """One PACKET_RESULT message (as built by process_packet)."""
+    strings = _StringTable()
+    record = _pack_result(result, strings)
+    return _frame(KIND_RESULT, 1, b"", strings, (record,))
+
+
+def encode_batch(message):
+    """One PACKET_BATCH message (as built by services.ws_batcher)."""
+    strings = _StringTable()
+    records = [_pack_result(result, strings) for result in message["results"]]
+    window = message["window"]
+    kind_header = BATCH_HEADER.pack(_micros(window["start"]), _micros(window["end"]))
+    return _frame(KIND_BATCH, len(records), kind_header, strings, records)
+
+
+def encode_batch_response(rule_version, received, results, errors, elapsed):
+    """The /simulate-batch response: per-packet decisions plus rejected entries."""
+    strings = _StringTable()
+    records = [
+        BATCH_RECORD.pack(
+            result["index"],
+            _id(result["packet_id"]),
+            _id(result["rule_id"]),
+            strings.add(result["reason"]),
+            _decision_code(result["decision"], strings),
+            _FLOW_STATE_CODES[result["flow_state"]],
+        )
+        for result in results
+    ]
+    records.extend(
+        ERROR_RECORD.pack(error["index"], strings.add(error["message"])) for error in errors
+    )
+    kind_header = BATCH_RESPONSE_HEADER.pack(
+        NO_VERSION if rule_version is None else rule_version,
+        received,
+        len(errors),
+        round(elapsed * 1_000_000),
+    )
+    return _frame(KIND_BATCH_RESPONSE, len(results), kind_header, strings, records)
+
+
+def encode_message(message, encoding="json"):
+    """
+    Serialize a WebSocket message. Packet data (PACKET_RESULT/PACKET_BATCH)
+    honours the encoding; everything else is always JSON text.
+    """
+    if isinstance(message, (str, bytes)):
+        return message
+    if encoding == "binary":
+        kind = message.get("type")
+        if kind == "PACKET_RESULT":
+            return encode_result(message)
+        if kind == "PACKET_BATCH":
+            return encode_batch(message)
+    return json.dumps(message)
+
+
+# -------------------------------------------------------------
+# Decoding (round trips, benchmarks and Python clients)
+# -------------------------------------------------------------
+def _unpack_strings(data, offset):
+    (count,) = STRING_LENGTH.unpack_from(data, offset)
+    offset += STRING_LENGTH.size
+    strings = []
+    for _ in range(count):
+        (length,) = STRING_LENGTH.unpack_from(data, offset)
+        offset += STRING_LENGTH.size
+        strings.append(data[offset:offset + length].decode("utf-8"))
+        offset += length
+    return strings, offset
+
+
+def _string(strings, code):
+    return None if code == NO_STRING else strings[code]
+
+
+def _decision(strings, code):
+    return DECISIONS[code] if code < len(DECISIONS) else strings[code - len(DECISIONS)]
+
+
+def _optional(value, missing=NO_ID):
+    return None if value == missing else value
+
+
+def _unpack_result(strings, fields):
+    (ticket, packet_id, log_id, micros, version, src, dest, rule_id, reason,
+     port, protocol, decision, flow_state, flags) = fields
+    timestamp = _isoformat(micros)
+    packet_id = _optional(packet_id)
+    decision = _decision(strings, decision)
+    return {
+        "ticket": _optional(ticket),
+        "rule_version": _optional(version, NO_VERSION),
+        "packet": {
+            "id": packet_id,
+            "src_ip": "any" if flags & FLAG_SRC_ANY else int_to_ip(src),
+            "dest_ip": "any" if flags & FLAG_DEST_ANY else int_to_ip(dest),
+            "port": port,
+            "protocol": PROTOCOLS[protocol],
+            "status": decision,
+            "flow_state": FLOW_STATES[flow_state],
+            "timestamp": timestamp,
+        },
+        "log": {
+            "id": _optional(log_id),
+            "packet_id": packet_id,
+            "rule_id": _optional(rule_id),
+            "decision": decision,
+            "reason": _string(strings, reason),
+            "timestamp": timestamp,
+        },
+    }
+
+
+def decode(data):
+    """Binary frame -> the message dict the JSON encoding would have sent."""
+    magic, version, kind, count = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a FirewallX binary frame (or unsupported version)")
+    offset = HEADER.size
+
+    if kind == KIND_BATCH:
+        start, end = BATCH_HEADER.unpack_from(data, offset)
+        offset += BATCH_HEADER.size
+    elif kind == KIND_BATCH_RESPONSE:
+        rule_version, received, error_count, elapsed = BATCH_RESPONSE_HEADER.unpack_from(data, offset)
+        offset += BATCH_RESPONSE_HEADER.size
+    elif kind != KIND_RESULT:
+        raise ValueError(f"Unknown frame kind {kind}")
+    strings, offset = _unpack_strings(data, offset)
+
+    if kind == KIND_BATCH_RESPONSE:
+        results = []
+        for fields in BATCH_RECORD.iter_unpack(data[offset:offset + count * BATCH_RECORD.size]):
+            index, packet_id, rule_id, reason, decision, flow_state = fields
+            results.append({
+                "index": index,
+                "packet_id": _optional(packet_id),
+                "decision": _decision(strings, decision),
+                "rule_id": _optional(rule_id),
+                "reason": _string(strings, reason),
+                "flow_state": FLOW_STATES[flow_state],
+            })
+        offset += count * BATCH_RECORD.size
+        errors = [
+            {"index": index, "message": _string(strings, message)}
+            for index, message in ERROR_RECORD.iter_unpack(
+                data[offset:offset + error_count * ERROR_RECORD.size]
+            )
+        ]
+        return {
+            "rule_version": _optional(rule_version, NO_VERSION),
+            "received": received,
+            "accepted": count,
+            "rejected": error_count,
+            "elapsed_ms": round(elapsed / 1000, 2),
+            "results": results,
+            "errors": errors,
+        }
+
+    results = [
+        _unpack_result(strings, fields)
+        for fields in RESULT_RECORD.iter_unpack(data[offset:offset + count * RESULT_RECORD.size])
+    ]
+    if kind == KIND_RESULT:
+        return dict(results[0], type="PACKET_RESULT")
+    return {
+        "type": "PACKET_BATCH",
+        "window": {
+            "start": _isoformat(start),
+            "end": _isoformat(end),
+            "duration_ms": round((end - start) / 1000, 1),
+        },
+        "count": count,
+        "results": results,
+    }